@@ -17,10 +17,53 @@ import type {
 } from './types';
 
 
+// Column order of the binary sidecar after the day number (frontend/tmp/indicator_dataset.py)
+const SIDECAR_COLUMNS = ['btc_price', 'eth_price', 'btc_rsi', 'eth_rsi', 'btc_sma', 'eth_btc_rsi'] as const;
+
+/**
+ * Decode backtest_data_with_indicators.bin: a 16-byte header ("PWID", then
+ * uint32 version, rows, columns) and rows x columns little-endian float64,
+ * row-major, column 0 being days since 1970-01-01. NaN stands for null.
+ */
+function decodeIndicatorSidecar(buffer: ArrayBuffer): any[] | null {
+  if (buffer.byteLength < 16) return null;
+  const header = new DataView(buffer, 0, 16);
+  const magic = String.fromCharCode(header.getUint8(0), header.getUint8(1), header.getUint8(2), header.getUint8(3));
+  const version = header.getUint32(4, true);
+  const rows = header.getUint32(8, true);
+  const cols = header.getUint32(12, true);
+  if (magic !== 'PWID' || version !== 1 || cols !== SIDECAR_COLUMNS.length + 1) return null;
+  if (buffer.byteLength < 16 + rows * cols * 8) return null;
+  const values = new Float64Array(buffer, 16, rows * cols);
+  const out = new Array(rows);
+  for (let i = 0; i < rows; i++) {
+    const base = i * cols;
+    const row: Record<string, string | number | null> = {
+      date: new Date(values[base] * 86_400_000).toISOString().slice(0, 10),
+    };
+    for (let j = 0; j < SIDECAR_COLUMNS.length; j++) {
+      const v = values[base + 1 + j];
+      row[SIDECAR_COLUMNS[j]] = Number.isNaN(v) ? null : v;
+    }
+    out[i] = row;
+  }
+  return out;
+}
+
 /**
- * Load pre-calculated data from Python (with indicators already computed)
+ * Load pre-calculated data from Python (with indicators already computed).
+ * Prefers the typed-array sidecar and falls back to the JSON.
  */
 export async function loadPythonData(): Promise<any[]> {
+  try {
+    const sidecar = await fetch('/data/backtest_data_with_indicators.bin');
+    if (sidecar.ok) {
+      const rows = decodeIndicatorSidecar(await sidecar.arrayBuffer());
+      if (rows) return rows;
+    }
+  } catch {
+    // fall back to the JSON
+  }
   const response = await fetch('/data/backtest_data_with_indicators.json');
   if (!response.ok) {
     throw new Error(`Failed to load Python data: ${response.statusText}`);
@@ -1,96 +1,93 @@
 #!/usr/bin/env python3
 import argparse
-import datetime as dt
-import math
-import time
-from collections import deque
-from typing import Deque, Tuple
+import contextlib
+import itertools
+from typing import Dict, Iterator, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
-import requests
 
-# ------------------------------
-# Binance candle downloader
-# ------------------------------
-BINANCE_URL = "https://api.binance.com/api/v3/klines"
-
-def fetch_binance_klines(symbol: str, interval: str, start: dt.datetime, end: dt.datetime) -> pd.DataFrame:
-    """Fetch daily OHLCV from Binance with pagination (limit 1000)."""
-    limit = 1000
-    start_ms = int(start.timestamp() * 1000)
-    end_ms   = int(end.timestamp()   * 1000)
-    frames = []
-    while start_ms < end_ms:
-        params = dict(symbol=symbol, interval=interval, limit=limit, startTime=start_ms, endTime=end_ms)
-        r = requests.get(BINANCE_URL, params=params, timeout=30)
-        r.raise_for_status()
-        data = r.json()
-        if not data:
-            break
-        # Binance kline fields
-        # 0 open time, 1 open, 2 high, 3 low, 4 close, 5 volume, 6 close time, ...
-        df = pd.DataFrame(data, columns=[
-            "open_time","open","high","low","close","volume","close_time",
-            "qav","num_trades","tbbav","tbqav","ignore"
-        ])
-        df["open_time"] = pd.to_datetime(df["open_time"], unit="ms", utc=True)
-        df["close_time"] = pd.to_datetime(df["close_time"], unit="ms", utc=True)
-        df[["open","high","low","close","volume"]] = df[["open","high","low","close","volume"]].astype(float)
-        frames.append(df[["close_time","close"]].rename(columns={"close_time": "time", "close":"close"}))
-        # advance
-        last_close = data[-1][6]
-        start_ms = int(last_close) + 1  # move cursor one ms after last close
-        time.sleep(0.2)  # polite pause
-    if not frames:
-        raise RuntimeError(f"No data returned for {symbol}")
-    out = pd.concat(frames, ignore_index=True)
-    out = out.drop_duplicates(subset=["time"]).sort_values("time").reset_index(drop=True)
-    out["time"] = out["time"].dt.tz_convert("UTC")
-    return out
+import indicator_cache
+import instrument
+from dca_engine import (SIDE_SELL, hodl_holdings, nav_series, simple_dca_holdings, simulate_adaptive_dca,
+                        simulate_adaptive_dca_batch, summarize_batch)
+from bars import DAY_MS, Bars, date_str, to_ms
+from indicators import AdaptiveSigmaStream, periods_per_year
+from kline_cache import INTERVAL_MS, KlineCache, default_cache, fetch_binance_bars
+from price_store import PriceStore
+from trade_sink import ConsoleSink, QuietSink, TradeSink, open_sink
 
 # ------------------------------
 # Strategy helpers
 # ------------------------------
 
-def annualize_from_window(sum_r2_window: float, window_len_days: int) -> float:
-    """Annualized vol from rolling realized variance over N daily returns."""
-    if window_len_days <= 0 or sum_r2_window < 0:
-        return 0.0
-    return math.sqrt(sum_r2_window * (365.0 / window_len_days))
+# run_backtest defaults of the parameters that are denominated in days
+DAILY_DEFAULTS = {"lookback_days": 30, "ewma_lambda_daily": 0.94}
 
-def ewma_update_sigma2(prev_sigma2: float, r: float, lam: float) -> float:
-    """EWMA variance update: sigma2_t = lam*sigma2_{t-1} + (1-lam)*r^2"""
-    return lam * prev_sigma2 + (1.0 - lam) * (r * r)
+def _scaled(value, fn):
+    out = fn(np.asarray(value, dtype=np.float64))
+    return out.item() if np.ndim(out) == 0 else out
 
-def fmt_date(ts: pd.Timestamp) -> str:
-    return ts.tz_convert("UTC").strftime("%Y-%m-%d")
+def per_bar_params(interval: str, **daily) -> dict:
+    """
+    Re-express the day-denominated indicator parameters for bars of
+    `interval`: lookback_days and the EWMA memory keep their length in days,
+    and periods_per_year is added for annualization. The DCA amounts stay
+    daily, because intraday runs make one DCA decision per day (see
+    day_close_bars). Values may be scalars or arrays; other keywords pass
+    through, and "1d" leaves everything unchanged.
+    """
+    if interval not in INTERVAL_MS:
+        raise ValueError(f"Unsupported interval {interval!r}")
+    bars_per_day = INTERVAL_MS["1d"] / INTERVAL_MS[interval]
+    out = dict(daily)
+    out["periods_per_year"] = periods_per_year(INTERVAL_MS[interval])
+    if bars_per_day == 1.0:
+        return out
+    if "lookback_days" in out:
+        out["lookback_days"] = _scaled(out["lookback_days"],
+                                       lambda v: np.maximum(1, np.rint(v * bars_per_day)).astype(np.int64))
+    if "ewma_lambda_daily" in out:
+        out["ewma_lambda_daily"] = _scaled(out["ewma_lambda_daily"], lambda v: v ** (1.0 / bars_per_day))
+    return out
+
+def day_close_bars(close_time_ms: np.ndarray, interval: str) -> Optional[np.ndarray]:
+    """
+    Bars on which an intraday run makes its daily DCA decision: those closing
+    a UTC day (None for "1d", i.e. every bar). Per-bar slices of the daily
+    budget would fall below min_trade_usd on short bars and never trade.
+    """
+    if INTERVAL_MS[interval] >= DAY_MS:
+        return None
+    return (np.asarray(close_time_ms, dtype=np.int64) + 1) % DAY_MS == 0
 
 # ------------------------------
-# SIMPLE DCA benchmark
+# Benchmarks (simple DCA, BTC HODL)
 # ------------------------------
 
-def simulate_simple_dca(px: pd.DataFrame, initial_capital: float, base_dca_usdc: float, min_trade_usd: float) -> dict:
+def simulate_simple_dca(bars: Bars, initial_capital: float, base_dca_usdc: float, min_trade_usd: float,
+                        dca_bars: Optional[np.ndarray] = None) -> dict:
     """Buy base_dca_usdc in BTC every day (if cash available)."""
-    usdc = float(initial_capital)
-    btc = 0.0
-    trades = 0
-    for _, row in px.iterrows():
-        price = float(row["close"])
-        buy_usd = min(usdc, base_dca_usdc)
-        if buy_usd >= min_trade_usd and price > 0:
-            btc += buy_usd / price
-            usdc -= buy_usd
-            trades += 1
-
-    final_price = float(px.iloc[-1]["close"])
+    close = np.asarray(bars.close, dtype=np.float64)
+    usdc, btc, trades = simple_dca_holdings(close, initial_capital, base_dca_usdc, min_trade_usd,
+                                            dca_bars=dca_bars)
+    return simple_dca_summary(initial_capital, float(usdc[-1]), float(btc[-1]), trades,
+                              float(close[-1]), bar_period_days(bars))
+
+def period_days(first_ms: int, last_ms: int) -> int:
+    """Whole days between two epoch-ms instants (at least 1)."""
+    return max(1, (int(last_ms) - int(first_ms)) // DAY_MS)
+
+def bar_period_days(bars: Bars) -> int:
+    return period_days(bars.close_time[0], bars.close_time[-1])
+
+def roi_summary(initial_capital: float, usdc: float, btc: float, final_price: float, days: int) -> dict:
+    """ROI figures shared by the strategy and benchmark summaries."""
     final_nav = usdc + btc * final_price
     returns_abs = final_nav - initial_capital
     roi = returns_abs / initial_capital if initial_capital > 0 else 0.0
-    days = max(1, (px.iloc[-1]["time"] - px.iloc[0]["time"]).days)
     years = days / 365.0
     ann_roi = (1.0 + roi) ** (1.0 / years) - 1.0 if years > 0 else roi
-
     return {
         "ROI_%": roi * 100.0,
         "Annualized_ROI_%": ann_roi * 100.0,
@@ -98,13 +95,109 @@ def simulate_simple_dca(px: pd.DataFrame, initial_capital: float, base_dca_usdc:
         "Final_Portfolio_$": final_nav,
         "Final_BTC": btc,
         "Final_USDC": usdc,
-        "Trades": trades,
     }
 
+def simple_dca_summary(initial_capital: float, usdc: float, btc: float, trades: int,
+                       final_price: float, days: int) -> dict:
+    """Summary figures of the simple DCA benchmark from its final balances."""
+    return {**roi_summary(initial_capital, usdc, btc, final_price, days), "Trades": trades}
+
+def benchmark_series(bars: Bars, res, initial_capital: float, base_dca_usdc: float,
+                     min_trade_usd: float, dca_bars: Optional[np.ndarray] = None) -> Tuple[Dict[str, np.ndarray], dict]:
+    """
+    Daily end-of-bar portfolio values of the strategy (`nav`), the simple DCA
+    benchmark (`simple_dca_nav`) and a lump-sum BTC buy on the first bar
+    (`hodl_nav`), plus the simple DCA summary. All three come from cumulative
+    sums over the close column, without a second pass over the bars.
+    """
+    close = np.asarray(bars.close, dtype=np.float64)
+    dca_usdc, dca_btc, dca_trades = simple_dca_holdings(close, initial_capital, base_dca_usdc, min_trade_usd,
+                                                        dca_bars=dca_bars)
+    hodl_usdc, hodl_btc = hodl_holdings(close, initial_capital)
+    series = {
+        "nav": nav_series(close, res, initial_capital),
+        "simple_dca_nav": dca_usdc + dca_btc * close,
+        "hodl_nav": hodl_usdc + hodl_btc * close,
+    }
+    days = bar_period_days(bars)
+    return series, simple_dca_summary(initial_capital, float(dca_usdc[-1]), float(dca_btc[-1]), dca_trades,
+                                      float(close[-1]), days)
+
+# ------------------------------
+# Trade log
+# ------------------------------
+
+TRADE_HEADER = "date, side, asset, amount, price, usd_value, usdc_value, btc_value, nav, w_minus, w_plus"
+
+def trade_columns(times_ms: np.ndarray, res, w_minus: float, w_plus: float) -> Dict[str, np.ndarray]:
+    """Trade log of an engine result as columns; time is the bar's close time in epoch ms."""
+    t = res.trades
+    n = res.trades_count
+    idx = t["index"][:n]
+    return {
+        "time": np.asarray(times_ms)[idx],
+        "side": np.where(t["side"][:n] == SIDE_SELL, "SELL", "BUY"),
+        "asset": np.full(n, "BTC"),
+        **{k: t[k][:n] for k in ("amount", "price", "usd_value", "usdc_value", "btc_value", "nav")},
+        "w_minus": np.full(n, w_minus),
+        "w_plus": np.full(n, w_plus),
+    }
+
+def format_trade_lines(cols: Dict[str, np.ndarray]) -> list:
+    """Console lines for a batch of trades (SELL rows show the band in percent)."""
+    lines = []
+    rows = zip(*(np.asarray(cols[k]).tolist() for k in ("time", "side", "amount", "price", "usd_value",
+                                                        "usdc_value", "btc_value", "nav", "w_minus", "w_plus")))
+    for date, side, amount, price, usd, usdc_v, btc_v, nav, wm, wp in rows:
+        band = f"{wm*100:.2f}%, {wp*100:.2f}%" if side == "SELL" else f"{wm:.4f}, {wp:.4f}"
+        lines.append(f"{date}, {side}, BTC, {amount:.8f}, {price:.2f}, {usd:.2f}, "
+                     f"{usdc_v:.2f}, {btc_v:.2f}, {nav:.2f}, {band}")
+    return lines
+
+def print_summaries(summary: dict, dca_summary: dict) -> None:
+    print("\n--- SUMMARY ---")
+    print(f"Period: {summary['Start']} → {summary['End']}  ({summary['Days']} days)")
+    print(f"Trades: {summary['Trades']}")
+    print(f"Final portfolio value: ${summary['Final_Portfolio_$']:.2f}")
+    print(f"Returns ($): ${summary['Returns_$']:.2f}")
+    print(f"ROI %: {summary['ROI_%']:.2f}%")
+    print(f"Annualized ROI %: {summary['Annualized_ROI_%']:.2f}%")
+    print(f"Final BTC balance: {summary['Final_BTC']:.8f}")
+    print(f"Final USDC balance: ${summary['Final_USDC']:.2f}")
+
+    print("\n--- SIMPLE DCA SUMMARY ---")
+    print(f"Trades: {dca_summary['Trades']}")
+    print(f"Final portfolio value: ${dca_summary['Final_Portfolio_$']:.2f}")
+    print(f"Returns ($): ${dca_summary['Returns_$']:.2f}")
+    print(f"ROI %: {dca_summary['ROI_%']:.2f}%")
+    print(f"Annualized ROI %: {dca_summary['Annualized_ROI_%']:.2f}%")
+    print(f"Final BTC balance: {dca_summary['Final_BTC']:.8f}")
+    print(f"Final USDC balance: ${dca_summary['Final_USDC']:.2f}")
+
 # ------------------------------
 # Backtest core
 # ------------------------------
 
+def load_bars(start_date: str, end_date: str, symbol: str = "BTCUSDT", interval: str = "1d",
+              store: Optional[PriceStore] = None) -> Bars:
+    """Bars with start_date <= close time <= end_date, from Binance or the offline store."""
+    # Parse dates (naive -> UTC)
+    start_ms, end_ms = to_ms(start_date), to_ms(end_date)
+
+    # Fetch prices
+    if store is not None:
+        if interval != "1d":
+            raise ValueError("The offline price store only holds daily closes.")
+        return store.bars(symbol, start_date, end_date).between(start_ms, end_ms)
+    bars = fetch_binance_bars(symbol, interval, pd.Timestamp(start_ms, unit="ms", tz="UTC"),
+                              pd.Timestamp(end_ms, unit="ms", tz="UTC"))
+    return bars.between(start_ms, end_ms)
+
+def load_prices(start_date: str, end_date: str, symbol: str = "BTCUSDT", interval: str = "1d",
+                store: Optional[PriceStore] = None) -> pd.DataFrame:
+    """load_bars as a (time, close) DataFrame; time is the candle close time (UTC)."""
+    return load_bars(start_date, end_date, symbol, interval, store).frame()
+
 def run_backtest(
     initial_capital_usdc: float,
     start_date: str,
@@ -122,233 +215,288 @@ def run_backtest(
     min_trade_usd: float = 5.0,    # don't print dust trades
     winsorize_abs_ret: float = 0.20, # clip daily return to ±20% to avoid data glitches
     threshold_mode: bool = False,
-    rebalance_cap_frac: float = 0.25  # cap any single rebalance trade to 25% of NAV
+    rebalance_cap_frac: float = 0.25, # cap any single rebalance trade to 25% of NAV
+    store: Optional[PriceStore] = None,  # read daily closes from the offline price store instead of Binance
+    sink: Optional[TradeSink] = None,    # where trades go (default: console if verbose, else dropped)
+    verbose: bool = True,                # print the summaries
 ) -> Tuple[pd.DataFrame, dict, dict]:
     """
     Executes:
       - Buy-only Adaptive DCA + Bands when inside the band (and always if threshold_mode=False)
       - True threshold rebalancing to the band boundary when outside the band (if threshold_mode=True).
-    Prints trades with header and returns (price_df, summary, simple_dca_summary).
+    Intraday intervals convert the indicator windows per bar and buy the
+    daily DCA on the bar closing each day (see per_bar_params). Writes trades
+    to `sink` (printed with a header by default), prints the summaries if
+    `verbose` and returns
+    (price_df, summary, simple_dca_summary); price_df carries the per-bar nav,
+    simple_dca_nav and hodl_nav columns.
     """
-    # Parse dates (naive -> UTC)
-    start_dt = pd.Timestamp(start_date, tz="UTC")
-    end_dt   = pd.Timestamp(end_date,   tz="UTC")
+    inst = instrument.active()
+    bar = per_bar_params(interval, lookback_days=lookback_days, ewma_lambda_daily=ewma_lambda_daily)
+    with inst.phase("load"):
+        bars = load_bars(start_date, end_date, symbol, interval, store)
 
-    # Fetch prices
-    px = fetch_binance_klines(symbol, interval, start_dt, end_dt)
-    px = px[(px["time"] >= start_dt) & (px["time"] <= end_dt)].reset_index(drop=True)
-
-    if len(px) < lookback_days + 5:
+    if len(bars) < bar["lookback_days"] + 5:
         raise RuntimeError("Not enough data for the requested period.")
 
-    # Initialize portfolio
-    usdc = float(initial_capital_usdc)
-    btc  = 0.0
-
-    # Rolling RV state: ring buffer (deque) of r^2
-    buf: Deque[float] = deque(maxlen=lookback_days)
-    sum_r2 = 0.0
-
-    # EWMA state (daily)
-    ewma_sigma2 = 0.0
-
-    # Buffer target
-    buffer_target = buffer_mult * base_dca_usdc
-
-    # Running peak for drawdown
-    running_peak = float(px.loc[0, "close"])
-
-    prev_close = None
-    warmup_returns = []
-
-    trades_count = 0
-    printed_header = False
-
-    for _, row in px.iterrows():
-        date = row["time"]
-        price = float(row["close"])
-
-        # Update running peak / drawdown
-        running_peak = max(running_peak, price)
-        drawdown = 0.0 if running_peak <= 0 else max(0.0, 1.0 - price / running_peak)
-
-        # Return
-        if prev_close is None:
-            r = 0.0
-        else:
-            r = math.log(price / prev_close) if prev_close > 0 else 0.0
-            r = max(-winsorize_abs_ret, min(winsorize_abs_ret, r))
-        prev_close = price
-
-        # Rolling RV update
-        r2 = r * r
-        if len(buf) == lookback_days:
-            # about to overwrite left-most; remove it from sum first
-            sum_r2 -= buf[0]
-        buf.append(r2)
-        sum_r2 += r2
-
-        # EWMA update (after warmup)
-        if len(warmup_returns) < min(10, lookback_days//3):
-            warmup_returns.append(r2)
-            if len(warmup_returns) == min(10, lookback_days//3):
-                ewma_sigma2 = float(np.mean(warmup_returns))
-        else:
-            lam = ewma_lambda_daily
-            ewma_sigma2 = ewma_update_sigma2(ewma_sigma2, r, lam)
-
-        # Compute vols (annualized)
-        rv_ann = annualize_from_window(sum_r2, len(buf)) if len(buf) > 0 else 0.0
-        ewma_ann = math.sqrt(ewma_sigma2 * 365.0) if ewma_sigma2 > 0 else 0.0
-        sigma_ann = max(rv_ann, ewma_ann)
-
-        # Portfolio stats BEFORE trading today
-        nav = usdc + btc * price
-        btc_value = btc * price
-        w_btc = 0.0 if nav <= 0 else (btc_value / nav)
-
-        # Band
-        w_minus = max(0.0, target_btc_weight - band_delta)
-        w_plus  = min(1.0, target_btc_weight + band_delta)
-
-        # --------------------------
-        # Threshold-mode branch
-        # --------------------------
-        if threshold_mode and nav > 0:
-            # If outside band → rebalance to boundary (single trade), else run normal buy logic
-            if w_btc > w_plus:
-                # SELL BTC down to w_plus
-                target_btc_value = w_plus * nav
-                excess_usd = max(0.0, btc_value - target_btc_value)
-                # Cap by rebalance_cap_frac * NAV
-                trade_usd = min(excess_usd, rebalance_cap_frac * nav)
-                if trade_usd >= min_trade_usd and price > 0:
-                    btc_to_sell = trade_usd / price
-                    # Execute sell
-                    btc_to_sell = min(btc_to_sell, btc)  # cannot sell more than we have
-                    trade_usd = btc_to_sell * price      # recompute in case of cap by holdings
-                    btc -= btc_to_sell
-                    usdc += trade_usd
-                    trades_count += 1
-                    # Post-trade portfolio values
-                    nav_after = usdc + btc * price
-                    btc_value_after = btc * price
-                    usdc_value_after = usdc
-                    if not printed_header:
-                        print("date, side, asset, amount, price, usd_value, usdc_value, btc_value, nav, w_minus, w_plus")
-                        printed_header = True
-                    print(f"{fmt_date(date)}, SELL, BTC, {btc_to_sell:.8f}, {price:.2f}, {trade_usd:.2f}, "
-                          f"{usdc_value_after:.2f}, {btc_value_after:.2f}, {nav_after:.2f}, {w_minus*100:.2f}%, {w_plus*100:.2f}%")
-                # If we didn't trade (too small), we fall through and do nothing else today
-                continue
-
-            elif w_btc < w_minus:
-                # BUY BTC up to w_minus
-                target_btc_value = w_minus * nav
-                shortfall_usd = max(0.0, target_btc_value - btc_value)
-                # Cap by cash and rebalance cap
-                trade_usd = min(shortfall_usd, usdc, rebalance_cap_frac * nav)
-                if trade_usd >= min_trade_usd and price > 0:
-                    btc_to_buy = trade_usd / price
-                    # Execute buy
-                    btc += btc_to_buy
-                    usdc -= trade_usd
-                    trades_count += 1
-                    nav_after = usdc + btc * price
-                    btc_value_after = btc * price
-                    usdc_value_after = usdc
-                    if not printed_header:
-                        print("date, side, asset, amount, price, usd_value, usdc_value, btc_value, nav, w_minus, w_plus")
-                        printed_header = True
-                    print(f"{fmt_date(date)}, BUY, BTC, {btc_to_buy:.8f}, {price:.2f}, {trade_usd:.2f}, "
-                          f"{usdc_value_after:.2f}, {btc_value_after:.2f}, {nav_after:.2f}, {w_minus:.4f}, {w_plus:.4f}")
-                # Regardless, if we were outside band we don't also run base DCA/kicker today.
-                continue
-            # else: inside band → fall through to normal buy-only logic
-
-        # --------------------------
-        # Buy-only logic (inside band or threshold_mode disabled)
-        # --------------------------
-        buy_budget = 0.0
-
-        # 1) Base DCA
-        available_to_spend = max(0.0, usdc - buffer_target)
-        base_buy = min(base_dca_usdc, usdc)  # spend from cash by default
-        # Strict buffer option would be:
-        # base_buy = min(base_dca_usdc, available_to_spend)
-        buy_budget += base_buy
-
-        # 2) Volatility-scaled kicker
-        extra_buy = k_kicker * sigma_ann * drawdown * nav
-        extra_cap = cmax_mult * base_dca_usdc
-        extra_buy = min(extra_buy, extra_cap)
-        extra_buy = min(extra_buy, available_to_spend)
-        buy_budget += max(0.0, extra_buy)
-
-        # Final cap by available USDC
-        buy_usd = min(usdc, buy_budget)
-
-        # Execute buy
-        if buy_usd >= min_trade_usd and price > 0:
-            btc_bought = buy_usd / price
-            btc += btc_bought
-            usdc -= buy_usd
-            trades_count += 1
-            nav_after = usdc + btc * price
-            btc_value_after = btc * price
-            usdc_value_after = usdc
-            if not printed_header:
-                print("date, side, asset, amount, price, usd_value, usdc_value, btc_value, nav, w_minus, w_plus")
-                printed_header = True
-            print(f"{fmt_date(date)}, BUY, BTC, {btc_bought:.8f}, {price:.2f}, {buy_usd:.2f}, "
-                  f"{usdc_value_after:.2f}, {btc_value_after:.2f}, {nav_after:.2f}, {w_minus:.4f}, {w_plus:.4f}")
+    # Indicators (annualized sigma, running-peak drawdown) as contiguous arrays
+    with inst.phase("indicators"):
+        close = np.ascontiguousarray(bars.close, dtype=np.float64)
+        sigma, drawdown = indicator_cache.default_cache().adaptive_sigma_drawdown(
+            close, bar["lookback_days"], bar["ewma_lambda_daily"], winsorize_abs_ret, bar["periods_per_year"],
+            asset=symbol, exact=True)
+
+    # Path-dependent state machine
+    with inst.phase("simulate"), inst.profile():
+        dca_bars = day_close_bars(bars.close_time, interval)
+        res = simulate_adaptive_dca(
+            close, sigma, drawdown,
+            initial_capital_usdc=initial_capital_usdc,
+            base_dca_usdc=base_dca_usdc,
+            target_btc_weight=target_btc_weight,
+            band_delta=band_delta,
+            k_kicker=k_kicker,
+            cmax_mult=cmax_mult,
+            buffer_mult=buffer_mult,
+            min_trade_usd=min_trade_usd,
+            threshold_mode=threshold_mode,
+            rebalance_cap_frac=rebalance_cap_frac,
+            dca_bars=dca_bars,
+        )
+    usdc, btc, trades_count = res.usdc, res.btc, res.trades_count
+    inst.count("bars", len(close))
+    inst.count("trades", trades_count)
+
+    # Trade log
+    w_minus = max(0.0, target_btc_weight - band_delta)
+    w_plus  = min(1.0, target_btc_weight + band_delta)
+    if sink is None:
+        sink = ConsoleSink(header=TRADE_HEADER, formatter=format_trade_lines) if verbose else QuietSink()
+    with inst.phase("trades"):
+        sink.write(trade_columns(bars.close_time, res, w_minus, w_plus))
+        sink.flush()
 
     # Summary for strategy
-    last_price = float(px.iloc[-1]["close"])
-    final_nav = usdc + btc * last_price
-    returns_abs = final_nav - initial_capital_usdc
-    roi = 0.0 if initial_capital_usdc <= 0 else returns_abs / initial_capital_usdc
-    days = max(1, (px.iloc[-1]["time"] - px.iloc[0]["time"]).days)
-    years = days / 365.0
-    ann_roi = (1.0 + roi) ** (1.0 / years) - 1.0 if years > 0 else roi
+    days = bar_period_days(bars)
+    summary = {
+        **roi_summary(initial_capital_usdc, usdc, btc, float(close[-1]), days),
+        "Start": date_str(bars.close_time[0]),
+        "End": date_str(bars.close_time[-1]),
+        "Days": days,
+        "Trades": trades_count,
+    }
+
+    # Benchmarks as per-bar series
+    with inst.phase("benchmarks"):
+        series, dca_summary = benchmark_series(bars, res, initial_capital_usdc, base_dca_usdc, min_trade_usd,
+                                               dca_bars)
+        px = bars.frame().assign(**series)
+    inst.snapshot("end")
+
+    if verbose:
+        print_summaries(summary, dca_summary)
+
+    return px, summary, dca_summary
+
+# ------------------------------
+# Streaming backtest
+# ------------------------------
 
+def stream_closes(start_date: str, end_date: str, symbol: str = "BTCUSDT", interval: str = "1d",
+                  store: Optional[PriceStore] = None, cache: Optional[KlineCache] = None,
+                  chunk_rows: int = 100_000) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    load_bars as a generator of (close_time_ms, close) chunks. Candles are
+    read from the memory-mapped kline cache one chunk at a time (or sliced from
+    the offline daily store), so the full series is never held in memory.
+    """
+    start_ms, end_ms = to_ms(start_date), to_ms(end_date)
+    if store is not None:
+        bars = load_bars(start_date, end_date, symbol, interval, store)
+        for a in range(0, len(bars), chunk_rows):
+            yield bars.close_time[a:a + chunk_rows], bars.close[a:a + chunk_rows]
+        return
+    for candles in (cache or default_cache()).iter_candles(symbol, interval, start_ms, end_ms, chunk_rows):
+        # same close-time window as load_bars
+        keep = (candles["close_time"] >= start_ms) & (candles["close_time"] <= end_ms)
+        if keep.any():
+            yield candles["close_time"][keep], candles["close"][keep]
+
+def run_backtest_stream(
+    initial_capital_usdc: float,
+    start_date: str,
+    end_date: str,
+    symbol: str = "BTCUSDT",
+    interval: str = "1d",
+    lookback_days: int = 30,
+    ewma_lambda_daily: float = 0.94,
+    base_dca_usdc: float = 50.0,
+    target_btc_weight: float = 0.70,
+    band_delta: float = 0.10,
+    k_kicker: float = 0.05,
+    cmax_mult: float = 3.0,
+    buffer_mult: float = 9.0,
+    min_trade_usd: float = 5.0,
+    winsorize_abs_ret: float = 0.20,
+    threshold_mode: bool = False,
+    rebalance_cap_frac: float = 0.25,
+    store: Optional[PriceStore] = None,
+    cache: Optional[KlineCache] = None,
+    chunk_rows: int = 100_000,
+    sink: Optional[TradeSink] = None,
+    verbose: bool = True,
+) -> Tuple[dict, dict]:
+    """
+    run_backtest in bounded memory: candle chunks flow from the cache through
+    the carried-state indicators (AdaptiveSigmaStream) into the state machine
+    and the simple DCA benchmark, and trades go to `sink` chunk by chunk.
+    Memory is O(chunk_rows + lookback) whatever the number of bars. The
+    window is checked for enough bars before anything reaches the sink.
+    Returns (summary, simple_dca_summary); sigma is identical to run_backtest's.
+    """
+    inst = instrument.active()
+    bar = per_bar_params(interval, lookback_days=lookback_days, ewma_lambda_daily=ewma_lambda_daily)
+    indicators = AdaptiveSigmaStream(bar["lookback_days"], bar["ewma_lambda_daily"], winsorize_abs_ret,
+                                     bar["periods_per_year"], exact=True)
+    sizing = dict(
+        base_dca_usdc=base_dca_usdc,
+        target_btc_weight=target_btc_weight,
+        band_delta=band_delta,
+        k_kicker=k_kicker,
+        cmax_mult=cmax_mult,
+        buffer_mult=buffer_mult,
+        min_trade_usd=min_trade_usd,
+        threshold_mode=threshold_mode,
+        rebalance_cap_frac=rebalance_cap_frac,
+    )
+    w_minus = max(0.0, target_btc_weight - band_delta)
+    w_plus  = min(1.0, target_btc_weight + band_delta)
+    if sink is None:
+        sink = ConsoleSink(header=TRADE_HEADER, formatter=format_trade_lines) if verbose else QuietSink()
+
+    usdc, btc, trades_count = float(initial_capital_usdc), 0.0, 0
+    dca_usdc, dca_btc, dca_trades = float(initial_capital_usdc), 0.0, 0
+    bars = 0
+    first_ms = last_ms = None
+    last_price = 0.0
+    chunks = stream_closes(start_date, end_date, symbol, interval, store, cache, chunk_rows)
+
+    # Hold back the leading chunks until the window is known to be long enough
+    need = bar["lookback_days"] + 5
+    head, head_bars = [], 0
+    with inst.phase("load"):
+        while head_bars < need:
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise RuntimeError("Not enough data for the requested period.")
+            head.append(chunk)
+            head_bars += len(chunk[1])
+    chunks = itertools.chain(head, chunks)
+    del head
+
+    while True:
+        with inst.phase("load"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        times_ms, close = chunk
+        dca_bars = day_close_bars(times_ms, interval)
+        with inst.phase("indicators"):
+            sigma, drawdown = indicators.update(close)
+        with inst.phase("simulate"), inst.profile():
+            res = simulate_adaptive_dca(close, sigma, drawdown, usdc, initial_btc=btc, dca_bars=dca_bars, **sizing)
+        usdc, btc = res.usdc, res.btc
+        trades_count += res.trades_count
+        with inst.phase("trades"):
+            sink.write(trade_columns(times_ms, res, w_minus, w_plus))
+        with inst.phase("benchmarks"):
+            u, b, t = simple_dca_holdings(close, dca_usdc, base_dca_usdc, min_trade_usd, initial_btc=dca_btc,
+                                          dca_bars=dca_bars)
+            dca_usdc, dca_btc, dca_trades = float(u[-1]), float(b[-1]), dca_trades + t
+        if first_ms is None:
+            first_ms = int(times_ms[0])
+        last_ms, last_price = int(times_ms[-1]), float(close[-1])
+        bars += len(close)
+    sink.flush()
+    inst.count("bars", bars)
+    inst.count("trades", trades_count)
+
+    days = period_days(first_ms, last_ms)
     summary = {
-        "ROI_%": roi * 100.0,
-        "Annualized_ROI_%": ann_roi * 100.0,
-        "Returns_$": returns_abs,
-        "Final_Portfolio_$": final_nav,
-        "Final_BTC": btc,
-        "Final_USDC": usdc,
-        "Start": fmt_date(px.iloc[0]["time"]),
-        "End": fmt_date(px.iloc[-1]["time"]),
+        **roi_summary(initial_capital_usdc, usdc, btc, last_price, days),
+        "Start": date_str(first_ms),
+        "End": date_str(last_ms),
         "Days": days,
         "Trades": trades_count,
     }
+    dca_summary = simple_dca_summary(initial_capital_usdc, dca_usdc, dca_btc, dca_trades, last_price, days)
+    inst.snapshot("end")
 
-    # SIMPLE DCA benchmark
-    dca_summary = simulate_simple_dca(px, initial_capital_usdc, base_dca_usdc, min_trade_usd)
+    if verbose:
+        print_summaries(summary, dca_summary)
 
-    # Print summaries
-    print("\n--- SUMMARY ---")
-    print(f"Period: {summary['Start']} → {summary['End']}  ({summary['Days']} days)")
-    print(f"Trades: {summary['Trades']}")
-    print(f"Final portfolio value: ${summary['Final_Portfolio_$']:.2f}")
-    print(f"Returns ($): ${summary['Returns_$']:.2f}")
-    print(f"ROI %: {summary['ROI_%']:.2f}%")
-    print(f"Annualized ROI %: {summary['Annualized_ROI_%']:.2f}%")
-    print(f"Final BTC balance: {summary['Final_BTC']:.8f}")
-    print(f"Final USDC balance: ${summary['Final_USDC']:.2f}")
+    return summary, dca_summary
 
-    print("\n--- SIMPLE DCA SUMMARY ---")
-    print(f"Trades: {dca_summary['Trades']}")
-    print(f"Final portfolio value: ${dca_summary['Final_Portfolio_$']:.2f}")
-    print(f"Returns ($): ${dca_summary['Returns_$']:.2f}")
-    print(f"ROI %: {dca_summary['ROI_%']:.2f}%")
-    print(f"Annualized ROI %: {dca_summary['Annualized_ROI_%']:.2f}%")
-    print(f"Final BTC balance: {dca_summary['Final_BTC']:.8f}")
-    print(f"Final USDC balance: ${dca_summary['Final_USDC']:.2f}")
+# Keywords that only change the indicator pass; columns sharing them share one sigma series
+INDICATOR_PARAMS = ("lookback_days", "ewma_lambda_daily", "winsorize_abs_ret")
 
-    return px, summary, dca_summary
+def run_backtest_batch(
+    initial_capital_usdc: float,
+    start_date: str,
+    end_date: str,
+    params: Dict[str, Sequence],
+    symbol: str = "BTCUSDT",
+    interval: str = "1d",
+    store: Optional[PriceStore] = None,
+) -> pd.DataFrame:
+    """
+    run_backtest for N parameter vectors at once. `params` maps run_backtest
+    keywords to length-N sequences (or scalars); columns are simulated
+    together, one vectorized pass per distinct (lookback, lambda, winsor).
+    Returns one summary row per column, without printing trades.
+    """
+    bars = load_bars(start_date, end_date, symbol, interval, store)
+    cols = {k: np.atleast_1d(np.asarray(v)) for k, v in params.items()}
+    n = max([len(v) for v in cols.values()] or [1])
+    cols = {k: np.broadcast_to(v, (n,)) for k, v in cols.items()}
+    scaled = dict(cols)
+    if interval != "1d":
+        scaled = {**{k: np.full(n, v) for k, v in DAILY_DEFAULTS.items()}, **scaled}
+    scaled = per_bar_params(interval, **scaled)
+    ppy = scaled.pop("periods_per_year")
+    defaults = {"lookback_days": 30, "ewma_lambda_daily": 0.94, "winsorize_abs_ret": 0.20}
+    ind = [scaled.get(k, np.full(n, defaults[k])) for k in INDICATOR_PARAMS]
+    sizing = {k: v for k, v in scaled.items() if k not in INDICATOR_PARAMS}
+
+    if len(bars) < int(ind[0].max()) + 5:
+        raise RuntimeError("Not enough data for the requested period.")
+
+    close = np.ascontiguousarray(bars.close, dtype=np.float64)
+    days = bar_period_days(bars)
+    dca_bars = day_close_bars(bars.close_time, interval)
+    keys = list(zip(*(v.tolist() for v in ind)))
+    cache, version = indicator_cache.default_cache(), indicator_cache.data_version(close)
+    out: Dict[str, np.ndarray] = {}
+    for key in dict.fromkeys(keys):
+        idx = np.array([j for j, kk in enumerate(keys) if kk == key])
+        sigma, drawdown = cache.adaptive_sigma_drawdown(close, int(key[0]), key[1], key[2], ppy,
+                                                        asset=symbol, version=version, exact=True)
+        res = simulate_adaptive_dca_batch(
+            close, sigma, drawdown, initial_capital_usdc,
+            **{k: v[idx] for k, v in sizing.items()}, dca_bars=dca_bars,
+        )
+        for name, values in summarize_batch(close, res, initial_capital_usdc, days).items():
+            if name not in out:
+                out[name] = np.empty(n, dtype=values.dtype)
+            out[name][idx] = values
+
+    summary = pd.DataFrame({k: v for k, v in cols.items()})
+    for name, values in out.items():
+        summary[name] = values
+    summary["Start"] = date_str(bars.close_time[0])
+    summary["End"] = date_str(bars.close_time[-1])
+    summary["Days"] = days
+    return summary
 
 # ------------------------------
 # CLI
@@ -373,27 +521,54 @@ def parse_args():
     p.add_argument("--winsor", type=float, default=0.20, help="Winsorize absolute daily log-return (default 0.20)")
     p.add_argument("--threshold-mode", action="store_true", help="Enable true threshold rebalancing to band boundary.")
     p.add_argument("--rebalance-cap", type=float, default=0.25, help="Max fraction of NAV per single rebalance trade (default 0.25)")
+    p.add_argument("--interval", type=str, default="1d",
+                   help="Bar interval, e.g. 1d, 1h, 15m or 1m (default 1d). Indicator windows keep their length in days; DCA buys once per day.")
+    p.add_argument("--stream", action="store_true",
+                   help="Stream candles from the kline cache in chunks (flat memory for long intraday runs).")
+    p.add_argument("--chunk-rows", type=int, default=100_000, help="Candles per chunk with --stream (default 100000)")
+    p.add_argument("--offline", action="store_true", help="Use the bundled public/data daily closes instead of Binance.")
+    p.add_argument("--trades", type=str, default="console",
+                   help="Trade sink: console, quiet, csv:<path>, jsonl:<path> or parquet:<path> (default console)")
+    p.add_argument("--instrument", type=str, default=None, metavar="REPORT_JSON",
+                   help="Write phase timings, counters and allocation stats to this JSON file.")
+    p.add_argument("--trace-alloc", action="store_true",
+                   help="With --instrument, also track allocations with tracemalloc (slower).")
+    p.add_argument("--profile", type=str, default=None, metavar="PSTATS",
+                   help="cProfile the simulation loop and dump pstats here (implies instrumentation).")
     return p.parse_args()
 
 def main():
     args = parse_args()
-    run_backtest(
-        initial_capital_usdc=args.initial_capital,
-        start_date=args.start,
-        end_date=args.end,
-        base_dca_usdc=args.base_dca,
-        lookback_days=args.lookback,
-        ewma_lambda_daily=args.lambda_daily,
-        target_btc_weight=args.w_target,
-        band_delta=args.band,
-        k_kicker=args.k,
-        cmax_mult=args.cmax,
-        buffer_mult=args.buffer_mult,
-        min_trade_usd=args.min_trade,
-        winsorize_abs_ret=args.winsor,
-        threshold_mode=args.threshold_mode,
-        rebalance_cap_frac=args.rebalance_cap,
-    )
+    if args.trades == "console":
+        sink = ConsoleSink(header=TRADE_HEADER, formatter=format_trade_lines)
+    else:
+        sink = open_sink(args.trades)
+    instrumented = args.instrument is not None or args.profile is not None
+    session = (instrument.session(args.instrument, trace_alloc=args.trace_alloc, profile_path=args.profile)
+               if instrumented else contextlib.nullcontext(instrument.NULL))
+    kwargs = dict(chunk_rows=args.chunk_rows) if args.stream else {}
+    with session as inst, sink, inst.phase("run_backtest"):
+        (run_backtest_stream if args.stream else run_backtest)(
+            initial_capital_usdc=args.initial_capital,
+            start_date=args.start,
+            end_date=args.end,
+            interval=args.interval,
+            base_dca_usdc=args.base_dca,
+            lookback_days=args.lookback,
+            ewma_lambda_daily=args.lambda_daily,
+            target_btc_weight=args.w_target,
+            band_delta=args.band,
+            k_kicker=args.k,
+            cmax_mult=args.cmax,
+            buffer_mult=args.buffer_mult,
+            min_trade_usd=args.min_trade,
+            winsorize_abs_ret=args.winsor,
+            threshold_mode=args.threshold_mode,
+            rebalance_cap_frac=args.rebalance_cap,
+            store=PriceStore() if args.offline else None,
+            sink=sink,
+            **kwargs,
+        )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Local HTTP/JSON backtest service for the web simulator.
+
+Runs the strategy ports (strategies/) behind a small asyncio HTTP/1.1
+server. Simulations execute in a process pool, so the event loop only
+parses requests and writes responses. Every worker keeps the last few
+Sessions, so runs over the same window reuse its prices and indicators.
+
+Results are cached as encoded response bodies in an LRU, bounded by entry
+count and total bytes. The key is the SHA-256 of a canonical request:
+- the strategy id;
+- the full parameter set, after the TS-style option names are resolved and
+  the defaults filled in;
+- the normalized dates and deposit settings;
+- the output sections asked for;
+- the data version: the size and mtime of the bundled price files, plus the
+  last closed day when Binance tops up the history.
+
+Requests that differ only in spelling (camelCase or snake_case, omitted
+defaults, date format) therefore share an entry. Identical requests already
+in flight wait for the same run instead of starting another.
+
+Endpoints:
+  GET  /health        liveness and cache statistics
+  GET  /strategies    registered ids with their default parameters
+  POST /backtest      {"strategy": "smart-btc-dca", "start": "2021-01-01", "end": "2024-12-31",
+                       "deposit_amount": 1000, "deposit_interval_days": 0, "initial_capital": null,
+                       "params": {"kKicker": 0.1}, "include": ["daily", "trades"]}
+
+The response has the run's summary, plus the daily columns and the trade rows
+if asked for, with NaN as null. X-Cache tells whether it came from the cache.
+
+Example:
+  python backtest_service.py --offline --port 8765 --workers 4
+  curl -s localhost:8765/backtest -d '{"strategy": "smart-btc-dca", "start": "2022-01-01", "end": "2024-12-31"}'
+"""
+import argparse
+import asyncio
+import dataclasses
+import hashlib
+import json
+import math
+import os
+import signal
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+from price_store import DATA_DIR, SYMBOL_FILES, PriceStore, to_day
+from strategies import STRATEGIES, Session, WindowError, get_strategy, make_params
+
+INCLUDE = ("daily", "trades")
+MAX_BODY = 1 << 20
+SESSIONS_PER_WORKER = 4
+
+
+class RequestError(ValueError):
+    """A request the service rejects with 400."""
+
+
+# ------------------------------
+# Canonical requests
+# ------------------------------
+
+def _date(value: Any, name: str) -> str:
+    try:
+        return pd.Timestamp(value).strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise RequestError(f"{name} is not a date: {value!r}") from None
+
+
+def _coerce(value: Any, default: Any) -> Any:
+    """JSON numbers in the type of the parameter's default, so 1 and 1.0 hash alike."""
+    if isinstance(default, bool) or not isinstance(default, (int, float)):
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise RequestError(f"Expected a number, got {value!r}")
+    if isinstance(default, float):
+        return float(value)
+    if value != int(value):
+        raise RequestError(f"Expected an integer, got {value!r}")
+    return int(value)
+
+
+def _file_stamp(symbol: str) -> str:
+    st = os.stat(os.path.join(DATA_DIR, SYMBOL_FILES[symbol]))
+    return f"{symbol}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def data_version(symbols, end: str, offline: bool) -> str:
+    """Changes whenever the prices a run over [.., end] could see change."""
+    parts = [_file_stamp(symbol) for symbol in symbols]
+    if not offline:
+        # the Binance tail grows by one candle a day until `end` is in the past
+        last_closed = int(time.time() // 86_400) - 1
+        parts.append(f"tail:{min(to_day(end), last_closed)}")
+    return "|".join(parts)
+
+
+def canonical_request(body: Dict[str, Any], offline: bool) -> Dict[str, Any]:
+    """The request with every default filled in and every value in one spelling."""
+    if not isinstance(body, dict):
+        raise RequestError("The request body must be a JSON object.")
+    try:
+        strat = get_strategy(str(body.get("strategy", "")))
+    except KeyError as e:
+        raise RequestError(e.args[0]) from None
+    overrides = body.get("params") or {}
+    if not isinstance(overrides, dict):
+        raise RequestError("params must be a JSON object.")
+    try:
+        params = dataclasses.asdict(make_params(strat.params, overrides))
+    except TypeError as e:
+        raise RequestError(str(e)) from None
+    defaults = dataclasses.asdict(strat.params())
+    params = {k: _coerce(v, defaults[k]) for k, v in params.items()}
+    if "start" not in body or "end" not in body:
+        raise RequestError("start and end are required.")
+    start, end = _date(body["start"], "start"), _date(body["end"], "end")
+    if end < start:
+        raise RequestError("end is before start.")
+    include = body.get("include") or []
+    if isinstance(include, str):
+        include = [include]
+    unknown = set(include) - set(INCLUDE)
+    if unknown:
+        raise RequestError(f"Unknown include: {', '.join(sorted(unknown))} (known: {', '.join(INCLUDE)})")
+    try:
+        deposit_amount = float(body.get("deposit_amount", 1000.0))
+        deposit_interval_days = int(body.get("deposit_interval_days", 0))
+        initial_capital = body.get("initial_capital")
+        initial_capital = None if initial_capital is None else float(initial_capital)
+    except (TypeError, ValueError) as e:
+        raise RequestError(str(e)) from None
+    return {
+        "strategy": strat.id,
+        "params": params,
+        "start": start,
+        "end": end,
+        "deposit_amount": deposit_amount,
+        "deposit_interval_days": deposit_interval_days,
+        "initial_capital": initial_capital,
+        "include": sorted(set(include)),
+        "data_version": data_version(strat.symbols, end, offline),
+    }
+
+
+def cache_key(request: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(request, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+# ------------------------------
+# Result cache
+# ------------------------------
+
+class ResultCache:
+    """LRU of encoded results, bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 256 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.bytes -= len(old)
+        self._items[key] = value
+        self.bytes += len(value)
+        while len(self._items) > self.max_entries or self.bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._items), "bytes": self.bytes, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+
+# ------------------------------
+# Worker processes
+# ------------------------------
+
+_store: Optional[PriceStore] = None
+_store_version: Optional[str] = None
+_offline = False
+_sessions: "OrderedDict[Tuple[str, str, str], Session]" = OrderedDict()
+
+
+def _init_worker(offline: bool) -> None:
+    global _store, _store_version, _offline
+    _store, _store_version, _offline = None, None, offline
+
+
+def _session(start: str, end: str, version: str) -> Session:
+    """
+    The worker's Session for a window at a data version. A new Session gets a
+    fresh PriceStore whenever the bundled files changed since the last one
+    was built, so a new key never sees memoized stale prices.
+    """
+    global _store, _store_version
+    key = (start, end, version)
+    session = _sessions.pop(key, None)
+    if session is None:
+        files = "|".join(_file_stamp(symbol) for symbol in sorted(SYMBOL_FILES))
+        if files != _store_version:
+            _store, _store_version = PriceStore(), files
+        session = Session(start, end, store=_store, offline=_offline)
+    _sessions[key] = session
+    while len(_sessions) > SESSIONS_PER_WORKER:
+        _sessions.popitem(last=False)
+    return session
+
+
+def _json_value(v):
+    if isinstance(v, float) and not math.isfinite(v):
+        return None
+    return v
+
+
+def _columns(df: pd.DataFrame) -> Dict[str, list]:
+    return {c: [_json_value(v) for v in df[c].tolist()] for c in df.columns}
+
+
+def run_request(request: Dict[str, Any]) -> bytes:
+    """Run a canonical request and encode the response body (in a worker)."""
+    t0 = time.perf_counter()
+    try:
+        res = _session(request["start"], request["end"], request["data_version"]).run(
+            request["strategy"], request["deposit_amount"], request["deposit_interval_days"],
+            request["initial_capital"], **request["params"])
+    except WindowError as e:
+        raise RequestError(str(e)) from None
+    out: Dict[str, Any] = {
+        "strategy": request["strategy"],
+        "start": request["start"],
+        "end": request["end"],
+        "params": request["params"],
+        "summary": {k: _json_value(v) for k, v in dataclasses.asdict(res.summary).items()},
+    }
+    if "daily" in request["include"]:
+        out["daily"] = _columns(res.daily_frame())
+    if "trades" in request["include"]:
+        out["trades"] = _columns(res.trades_frame())
+    out["compute_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+    return json.dumps(out, separators=(",", ":")).encode()
+
+
+# ------------------------------
+# HTTP front end
+# ------------------------------
+
+REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class BacktestService:
+    """asyncio HTTP server in front of the worker pool and the result cache."""
+
+    def __init__(self, workers: Optional[int] = None, offline: bool = False,
+                 cache: Optional[ResultCache] = None):
+        self.offline = offline
+        self.cache = cache if cache is not None else ResultCache()
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(offline,))
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.runs = 0
+
+    async def backtest(self, body: Dict[str, Any]) -> Tuple[bytes, str]:
+        """(encoded result, "hit" | "shared" | "miss") for a request body."""
+        request = canonical_request(body, self.offline)
+        key = cache_key(request)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, "hit"
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending), "shared"
+        loop = asyncio.get_running_loop()
+        future = self._inflight[key] = loop.run_in_executor(self.pool, run_request, request)
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+        self.runs += 1
+        self.cache.put(key, result)
+        return result, "miss"
+
+    async def route(self, method: str, path: str, body: bytes) -> Tuple[int, bytes, Dict[str, str]]:
+        path = path.split("?", 1)[0]
+        if path == "/health" and method == "GET":
+            return 200, _encode({"ok": True, "runs": self.runs, "inflight": len(self._inflight),
+                                 "cache": self.cache.stats()}), {}
+        if path == "/strategies" and method == "GET":
+            return 200, _encode({sid: {"name": s.name, "symbols": list(s.symbols),
+                                       "params": dataclasses.asdict(s.params())}
+                                 for sid, s in STRATEGIES.items()}), {}
+        if path == "/backtest":
+            if method != "POST":
+                return 405, _encode({"error": "POST a JSON request to /backtest."}), {}
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError as e:
+                return 400, _encode({"error": f"Invalid JSON: {e}"}), {}
+            t0 = time.perf_counter()
+            try:
+                result, how = await self.backtest(payload)
+            except RequestError as e:
+                return 400, _encode({"error": str(e)}), {}
+            except Exception as e:
+                return 500, _encode({"error": f"{type(e).__name__}: {e}"}), {}
+            return 200, result, {"X-Cache": how, "X-Elapsed-Ms": f"{(time.perf_counter() - t0) * 1000.0:.3f}"}
+        return 404, _encode({"error": f"No route for {method} {path}"}), {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one connection; HTTP/1.1 keep-alive, one request at a time."""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, path, version = lines[0].split(" ", 2)
+                except ValueError:
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, _encode({"error": "Invalid Content-Length."}), {}, False)
+                    return
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, _encode({"error": "Request body too large."}), {}, False)
+                    return
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close")
+                if method == "OPTIONS":
+                    status, payload, extra = 204, b"", {}
+                else:
+                    status, payload, extra = await self.route(method, path, body)
+                await self._respond(writer, status, payload, extra, keep_alive)
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, body: bytes, extra: Dict[str, str],
+                       keep_alive: bool) -> None:
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            # the Next.js dev server runs on another port
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+            "Access-Control-Allow-Headers": "Content-Type",
+            "Access-Control-Expose-Headers": "X-Cache, X-Elapsed-Ms",
+            **extra,
+        }
+        head = f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765) -> None:
+        loop = asyncio.get_running_loop()
+        # start the workers before binding, so they do not inherit the listening socket
+        await loop.run_in_executor(self.pool, os.getpid)
+        server = await asyncio.start_server(self.handle, host, port)
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        print(f"Backtest service on http://{host}:{port} ({self.workers} workers"
+              f"{', offline' if self.offline else ''})")
+        async with server:
+            await stop.wait()
+        self.pool.shutdown(cancel_futures=True)
+
+
+def _encode(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+# ------------------------------
+# CLI
+# ------------------------------
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Serve the strategy backtests over HTTP/JSON with a result cache.")
+    p.add_argument("--host", type=str, default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    p.add_argument("--cache-entries", type=int, default=1024, help="Most results kept in the cache")
+    p.add_argument("--cache-mb", type=float, default=256.0, help="Most megabytes of results kept in the cache")
+    p.add_argument("--offline", action="store_true", help="Only use the bundled frontend/public/data histories")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    cache = ResultCache(args.cache_entries, int(args.cache_mb * (1 << 20)))
+    service = BacktestService(args.workers, args.offline, cache)
+    asyncio.run(service.serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
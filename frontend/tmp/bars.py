@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Compact OHLCV bars.
+
+A Bars object holds one symbol's candles as plain NumPy columns:
+
+    open_time, close_time   int64 epoch ms
+    open ... volume         float64
+
+That is 56 bytes per bar, with no per-row Python objects. Dates are only
+materialized at the edges (date_str for summaries, frame() for callers that
+still want the (time, close) DataFrame layout of fetch_binance_klines).
+"""
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+DAY_MS = 86_400_000
+
+INT_COLUMNS = ("open_time", "close_time")
+FLOAT_COLUMNS = ("open", "high", "low", "close", "volume")
+COLUMNS = INT_COLUMNS + FLOAT_COLUMNS
+
+
+def date_str(ms: int) -> str:
+    """YYYY-MM-DD (UTC) of an epoch-ms instant."""
+    return str(np.datetime64(int(ms), "ms").astype("datetime64[D]"))
+
+
+def to_ms(d) -> int:
+    """Epoch ms of a date string / date / timestamp (naive values are UTC)."""
+    ts = pd.Timestamp(d)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return int(ts.value // 1_000_000)
+
+
+class Bars:
+    """OHLCV candles of one symbol as int64 epoch-ms and float64 columns, sorted by time."""
+
+    __slots__ = ("symbol",) + COLUMNS
+
+    def __init__(self, symbol: str, open_time: np.ndarray, close_time: np.ndarray,
+                 open: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                 volume: np.ndarray):
+        self.symbol = symbol
+        self.open_time = open_time
+        self.close_time = close_time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def from_columns(cls, symbol: str, columns: Dict[str, np.ndarray]) -> "Bars":
+        """Wrap a dict of column arrays (the kline_cache Candles layout) without copying."""
+        return cls(symbol, *(columns[c] for c in COLUMNS))
+
+    @classmethod
+    def from_closes(cls, symbol: str, open_time: np.ndarray, close_time: np.ndarray,
+                    close: np.ndarray) -> "Bars":
+        """Close-only bars (e.g. the offline daily store); open/high/low/volume are NaN."""
+        nan = np.full(len(close), np.nan)
+        return cls(symbol, np.asarray(open_time, dtype=np.int64), np.asarray(close_time, dtype=np.int64),
+                   nan, nan, nan, np.asarray(close, dtype=np.float64), nan)
+
+    def __len__(self) -> int:
+        return len(self.close_time)
+
+    def __getitem__(self, key) -> "Bars":
+        """Rows selected by a slice or a boolean / index array, as a new Bars."""
+        return Bars(self.symbol, *(getattr(self, c)[key] for c in COLUMNS))
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {c: getattr(self, c) for c in COLUMNS}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, c).nbytes for c in COLUMNS)
+
+    @property
+    def days(self) -> np.ndarray:
+        """int32 day index (days since epoch, UTC) of every bar's open time."""
+        return (self.open_time // DAY_MS).astype(np.int32)
+
+    def between(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> "Bars":
+        """Zero-copy view of the bars with start_ms <= close_time <= end_ms."""
+        ct = self.close_time
+        lo = 0 if start_ms is None else int(np.searchsorted(ct, start_ms, side="left"))
+        hi = len(ct) if end_ms is None else int(np.searchsorted(ct, end_ms, side="right"))
+        return self[lo:max(lo, hi)]
+
+    def frame(self) -> pd.DataFrame:
+        """(time, close) DataFrame in the fetch_binance_klines layout; time is the close time (UTC)."""
+        return pd.DataFrame({
+            "time": pd.to_datetime(self.close_time, unit="ms", utc=True),
+            "close": np.asarray(self.close),
+        })
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the backtest hot paths.
+
+Every benchmark runs in a fresh child process (so its peak RSS is its own)
+against the bundled public/data histories or seeded synthetic 1-minute data,
+and reports wall time, bars per second, peak RSS and the time spent in each
+phase. The wall time is the sum of the timed phases (building synthetic inputs
+is excluded). Each repeat starts with an empty, memory-only indicator cache,
+so repeats measure the computation rather than cache hits. Results are written as JSON; `--save` stores them as a baseline
+and `--compare` exits non-zero when a benchmark got slower than the baseline
+by more than `--threshold`.
+
+Examples:
+  python bench.py --save bench_baseline.json
+  python bench.py --compare bench_baseline.json --threshold 0.25
+  python bench.py --only indicators_1m,kline_parse --repeat 5
+"""
+import argparse
+import contextlib
+import datetime as dt
+import json
+import multiprocessing as mp
+import os
+import platform
+import queue as queue_mod
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+import indicator_cache
+import indicators
+from adaptive_dca_btc import load_bars, run_backtest, simulate_simple_dca
+from dca_engine import adaptive_sigma_drawdown, simulate_adaptive_dca, simulate_adaptive_dca_batch
+from kline_cache import parse_bars
+from price_store import PriceStore
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+DEFAULT_TIMEOUT_S = 600.0
+MINUTE_MS = 60_000
+
+
+class Phases:
+    """Accumulates wall time per named phase."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def __call__(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - t0
+
+
+def synthetic_minutes(n: int, seed: int = 0, start_price: float = 30_000.0) -> pd.DataFrame:
+    """Seeded random-walk 1-minute closes in the (time, close) layout of fetch_binance_klines."""
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0.0, 0.0008, n)))
+    t0 = 1_600_000_000_000 - 1_600_000_000_000 % MINUTE_MS
+    times = pd.to_datetime(t0 + (np.arange(n) + 1) * MINUTE_MS - 1, unit="ms", utc=True)
+    return pd.DataFrame({"time": times, "close": close})
+
+
+def synthetic_kline_rows(n: int, seed: int = 0) -> List[list]:
+    """Binance /api/v3/klines rows (prices as strings) for n 1-minute candles."""
+    px = synthetic_minutes(n, seed)["close"].to_numpy()
+    t0 = 1_600_000_000_000
+    return [[t0 + i * MINUTE_MS, f"{p:.2f}", f"{p * 1.001:.2f}", f"{p * 0.999:.2f}", f"{p:.2f}", "12.5",
+             t0 + (i + 1) * MINUTE_MS - 1, "0", 10, "0", "0", "0"] for i, p in enumerate(px.tolist())]
+
+
+# ------------------------------
+# Benchmarks: fn(scale, phases) -> bars processed
+# ------------------------------
+
+BENCHMARKS: Dict[str, Callable[[float, Phases], int]] = {}
+
+
+def benchmark(name: str):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+@benchmark("adaptive_backtest_daily")
+def bench_adaptive_backtest(scale: float, phase: Phases) -> int:
+    """The load / indicators / simulate steps of run_backtest, each on its own."""
+    with phase("load"):
+        bars = load_bars("2013-01-01", "2025-09-01", store=PriceStore())
+    close = np.ascontiguousarray(bars.close)
+    with phase("indicators"):
+        sigma, drawdown = adaptive_sigma_drawdown(close, exact=True)
+    with phase("simulate"):
+        simulate_adaptive_dca(close, sigma, drawdown, 10_000.0, threshold_mode=True)
+    return len(bars)
+
+
+@benchmark("run_backtest_daily")
+def bench_run_backtest(scale: float, phase: Phases) -> int:
+    """run_backtest end to end (including the trade log and the benchmark series)."""
+    store = PriceStore()
+    with phase("run_backtest"):
+        px, _, _ = run_backtest(10_000.0, "2013-01-01", "2025-09-01", threshold_mode=True, store=store,
+                                verbose=False)
+    return len(px)
+
+
+@benchmark("simple_dca_daily")
+def bench_simple_dca(scale: float, phase: Phases) -> int:
+    with phase("load"):
+        bars = load_bars("2013-01-01", "2025-09-01", store=PriceStore())
+    with phase("simulate"):
+        simulate_simple_dca(bars, 10_000.0, 50.0, 5.0)
+    return len(bars)
+
+
+@benchmark("kline_parse")
+def bench_kline_parse(scale: float, phase: Phases) -> int:
+    n = int(200_000 * scale)
+    body = json.dumps(synthetic_kline_rows(n))
+    with phase("json"):
+        rows = json.loads(body)
+    with phase("parse"):
+        bars = parse_bars("BTCUSDT", rows)
+    with phase("frame"):
+        bars.frame()
+    return n
+
+
+@benchmark("archive_import_1m")
+def bench_archive_import(scale: float, phase: Phases) -> int:
+    from kline_archive import ArchiveImporter, month_bounds, write_archive
+    from kline_cache import KlineCache, parse_klines
+    months = np.arange(np.datetime64("2024-01"), np.datetime64("2024-01") + max(1, int(6 * scale)))
+    with tempfile.TemporaryDirectory() as root:
+        n = 0
+        for m in months:
+            a, b = month_bounds(m)
+            candles = parse_klines(synthetic_kline_rows((b - a) // MINUTE_MS, seed=n))
+            candles["open_time"] += a - candles["open_time"][0]
+            candles["close_time"] += a - candles["close_time"][0] + MINUTE_MS - 1
+            write_archive(os.path.join(root, "src"), "BTCUSDT", "1m", str(m), candles)
+            n += len(candles["open_time"])
+        importer = ArchiveImporter(KlineCache(os.path.join(root, "cache")), os.path.join(root, "src"))
+        with phase("import"):
+            importer.import_range("BTCUSDT", "1m", month_bounds(months[0])[0], month_bounds(months[-1])[1] - 1)
+    return n
+
+
+@benchmark("indicators_1m")
+def bench_indicators(scale: float, phase: Phases) -> int:
+    n = int(1_000_000 * scale)
+    close = synthetic_minutes(n)["close"].to_numpy()
+    with phase("adaptive_sigma"):
+        indicators.adaptive_sigma(close, 30 * 1440)
+    with phase("rsi"):
+        indicators.rsi(close, 14)
+    with phase("sma"):
+        indicators.sma(close, 200)
+    with phase("drawdown"):
+        indicators.running_drawdown(close)
+    return n
+
+
+@benchmark("adaptive_engine_1m")
+def bench_adaptive_engine(scale: float, phase: Phases) -> int:
+    n = int(500_000 * scale)
+    close = synthetic_minutes(n, seed=1)["close"].to_numpy()
+    with phase("indicators"):
+        sigma, drawdown = adaptive_sigma_drawdown(close, 30 * 1440)
+    with phase("simulate"):
+        simulate_adaptive_dca(close, sigma, drawdown, 1_000_000.0, base_dca_usdc=1.0, min_trade_usd=0.5,
+                              threshold_mode=True)
+    return n
+
+
+@benchmark("adaptive_batch_daily")
+def bench_adaptive_batch(scale: float, phase: Phases) -> int:
+    n_cfg = max(1, int(256 * scale))
+    with phase("load"):
+        close = np.ascontiguousarray(load_bars("2013-01-01", "2025-09-01", store=PriceStore()).close)
+    with phase("indicators"):
+        sigma, drawdown = adaptive_sigma_drawdown(close)
+    with phase("simulate"):
+        simulate_adaptive_dca_batch(close, sigma, drawdown, 10_000.0, k_kicker=np.linspace(0.0, 0.5, n_cfg),
+                                    threshold_mode=True)
+    return len(close) * n_cfg
+
+
+@benchmark("momentum_backtest_daily")
+def bench_momentum(scale: float, phase: Phases) -> int:
+    from stress_test import momentum
+    with phase("run_backtest"):
+        equity, _ = momentum.run_backtest(store=PriceStore(), verbose=False, save_csv=False)
+    return len(equity)
+
+
+@benchmark("momentum_basket_50")
+def bench_momentum_basket(scale: float, phase: Phases) -> int:
+    from bars import DAY_MS, Bars
+    from momentum_basket import basket_indicators, simulate_basket
+    from panel import PricePanel
+    t, n_assets = max(400, int(3000 * scale)), 50
+    close_time = (19_000 + np.arange(t, dtype=np.int64)) * DAY_MS + DAY_MS - 1
+    bars = []
+    for j in range(n_assets):
+        close = synthetic_minutes(t, seed=10 + j, start_price=100.0)["close"].to_numpy()
+        listed = 0 if j == 0 else (j * 7) % (t // 4)  # staggered listings
+        bars.append(Bars.from_closes(f"A{j}USDT", close_time[listed:] - DAY_MS + 1, close_time[listed:], close[listed:]))
+    with phase("panel"):
+        panel = PricePanel.from_bars(bars)
+    with phase("indicators"):
+        ind = basket_indicators(panel)
+    with phase("simulate"):
+        simulate_basket(ind["close"], panel.valid, ind["rsi"], ind["score"], ind["sma"], 200,
+                        times=panel.close_time, symbols=panel.symbols)
+    return (t - 200) * n_assets
+
+
+@benchmark("onchain_dca_fixed_point")
+def bench_onchain_dca(scale: float, phase: Phases) -> int:
+    from onchain_dca import run_scenarios, sample_params
+    t, n = 730, max(100, int(5_000 * scale))
+    rng = np.random.default_rng(0)
+    price = 30_000.0 * np.exp(np.cumsum(rng.normal(0.0, 0.035, (t, n)), axis=0))
+    params, initial = sample_params(rng, n)
+    with phase("fixed_and_float"):
+        run_scenarios(price, initial, params)
+    return t * n
+
+
+# ------------------------------
+# Runner
+# ------------------------------
+
+def _child(name: str, scale: float, repeat: int, queue) -> None:
+    try:
+        best = None
+        for _ in range(repeat):
+            indicator_cache._default_cache = indicator_cache.IndicatorCache()
+            phases = Phases()
+            bars = BENCHMARKS[name](scale, phases)
+            # only the timed phases count; building synthetic inputs does not
+            seconds = sum(phases.seconds.values())
+            if best is None or seconds < best["seconds"]:
+                best = {"seconds": seconds, "bars": bars, "phases": phases.seconds}
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        best["peak_rss_mb"] = rss / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0)
+        best["bars_per_s"] = best["bars"] / best["seconds"] if best["seconds"] > 0 else float("inf")
+        queue.put(best)
+    except BaseException as exc:  # report instead of hanging the parent
+        queue.put({"error": f"{type(exc).__name__}: {exc}"})
+
+
+def run_benchmark(name: str, scale: float = 1.0, repeat: int = 3, timeout: float = DEFAULT_TIMEOUT_S) -> dict:
+    """Run one benchmark (best of `repeat`) in a fresh process."""
+    ctx = mp.get_context("fork" if sys.platform != "win32" else "spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(name, scale, repeat, queue))
+    proc.start()
+    deadline = time.monotonic() + timeout
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=1.0)
+        except queue_mod.Empty:
+            # a child killed by a signal (e.g. the OOM killer) never reports back
+            if not proc.is_alive():
+                raise RuntimeError(f"Benchmark {name} died with exit code {proc.exitcode}") from None
+            if time.monotonic() > deadline:
+                proc.terminate()
+                proc.join()
+                raise RuntimeError(f"Benchmark {name} timed out after {timeout:.0f}s") from None
+    proc.join()
+    if "error" in result:
+        raise RuntimeError(f"Benchmark {name} failed: {result['error']}")
+    if proc.exitcode != 0:
+        raise RuntimeError(f"Benchmark {name} exited with code {proc.exitcode}")
+    return result
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Names (with details) of benchmarks slower than baseline * (1 + threshold)."""
+    regressions = []
+    for name, res in results["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None or base.get("scale") != res.get("scale"):
+            continue
+        ratio = res["seconds"] / base["seconds"] if base["seconds"] > 0 else 1.0
+        res["vs_baseline"] = ratio
+        if ratio > 1.0 + threshold:
+            regressions.append(f"{name}: {res['seconds']:.3f}s vs baseline {base['seconds']:.3f}s (x{ratio:.2f})")
+    return regressions
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmark the backtest hot paths (offline).")
+    p.add_argument("--only", type=str, default=None, help="Comma-separated benchmark names: " + ", ".join(BENCHMARKS))
+    p.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the fastest counts (default 3)")
+    p.add_argument("--scale", type=float, default=1.0, help="Size multiplier for the synthetic benchmarks (default 1)")
+    p.add_argument("--out", type=str, default=None, help="Write the results JSON here")
+    p.add_argument("--save", type=str, nargs="?", const=DEFAULT_BASELINE, default=None,
+                   help=f"Store the results as the baseline (default path {os.path.basename(DEFAULT_BASELINE)})")
+    p.add_argument("--compare", type=str, nargs="?", const=DEFAULT_BASELINE, default=None,
+                   help="Fail if slower than this baseline by more than --threshold")
+    p.add_argument("--threshold", type=float, default=0.20, help="Allowed slowdown vs the baseline (default 0.20)")
+    p.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_S,
+                   help=f"Seconds per benchmark before it is killed (default {DEFAULT_TIMEOUT_S:.0f})")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    results = {"env": environment(), "results": {}}
+    print(f"{'benchmark':<26}{'seconds':>10}{'bars/s':>14}{'rss MB':>9}  phases")
+    for name in names:
+        res = run_benchmark(name, args.scale, args.repeat, args.timeout)
+        res["scale"] = args.scale
+        results["results"][name] = res
+        phases = ", ".join(f"{k} {v * 1000:.1f}ms" for k, v in res["phases"].items())
+        print(f"{name:<26}{res['seconds']:>10.3f}{res['bars_per_s']:>14,.0f}{res['peak_rss_mb']:>9.1f}  {phases}")
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    for path in filter(None, (args.out, args.save)):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved {path}")
+
+    if regressions:
+        print(f"\nPERFORMANCE REGRESSION (> {args.threshold:.0%} slower than {args.compare}):", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
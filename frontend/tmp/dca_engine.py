@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Array-backed simulation engine for the adaptive DCA + bands strategy.
+
+The path-dependent state machine of adaptive_dca_btc.run_backtest (base DCA,
+volatility kicker, band check and threshold-mode rebalancing) runs over plain
+float64 arrays instead of DataFrame rows. The state machine performs its
+arithmetic in the same order as the original loop, and run_backtest takes
+its sigma/drawdown inputs from the step-by-step (exact=True) indicator pass,
+so it matches that loop bit for bit.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+from indicators import PERIODS_PER_YEAR_DAILY, adaptive_sigma, running_drawdown
+
+SIDE_BUY = 1
+SIDE_SELL = -1
+
+TRADE_COLUMNS = ("index", "side", "amount", "price", "usd_value", "usdc_value", "btc_value", "nav", "btc_balance")
+
+
+@dataclass
+class AdaptiveResult:
+    usdc: float
+    btc: float
+    trades_count: int
+    # columnar trade log; "index" is the bar index into the input arrays
+    trades: Dict[str, np.ndarray] = field(default_factory=dict)
+
+
+# ------------------------------
+# Indicator pass
+# ------------------------------
+
+def adaptive_sigma_drawdown(
+    close: np.ndarray,
+    lookback_days: int = 30,
+    ewma_lambda_daily: float = 0.94,
+    winsorize_abs_ret: float = 0.20,
+    periods_per_year: float = PERIODS_PER_YEAR_DAILY,
+    exact: bool = False,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Annualized sigma (max of rolling RV and EWMA vol) and running-peak
+    drawdown per bar; with exact=True bit for bit as the original per-row
+    loop computed them.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    sigma = adaptive_sigma(close, lookback_days, ewma_lambda_daily, winsorize_abs_ret, periods_per_year, exact)
+    return sigma, running_drawdown(close)
+
+
+# ------------------------------
+# State machine
+# ------------------------------
+
+def simulate_adaptive_dca(
+    close: np.ndarray,
+    sigma: np.ndarray,
+    drawdown: np.ndarray,
+    initial_capital_usdc: float,
+    base_dca_usdc: float = 50.0,
+    target_btc_weight: float = 0.70,
+    band_delta: float = 0.10,
+    k_kicker: float = 0.05,
+    cmax_mult: float = 3.0,
+    buffer_mult: float = 9.0,
+    min_trade_usd: float = 5.0,
+    threshold_mode: bool = False,
+    rebalance_cap_frac: float = 0.25,
+    initial_btc: float = 0.0,
+    dca_bars: Optional[np.ndarray] = None,
+) -> AdaptiveResult:
+    """
+    Run the adaptive DCA state machine over contiguous close/sigma/drawdown
+    arrays. A run continues over the next chunk of bars by passing the
+    previous result's usdc/btc as initial_capital_usdc/initial_btc.
+    `dca_bars` (bool per bar, default all) limits the buy-only DCA to the
+    marked bars; threshold rebalancing still runs on every bar.
+    """
+    prices = np.asarray(close, dtype=np.float64).tolist()
+    sigmas = np.asarray(sigma, dtype=np.float64).tolist()
+    dds = np.asarray(drawdown, dtype=np.float64).tolist()
+    dca = None if dca_bars is None else np.asarray(dca_bars, dtype=bool).tolist()
+
+    usdc = float(initial_capital_usdc)
+    btc = float(initial_btc)
+    buffer_target = buffer_mult * base_dca_usdc
+    extra_cap = cmax_mult * base_dca_usdc
+    w_minus = max(0.0, target_btc_weight - band_delta)
+    w_plus  = min(1.0, target_btc_weight + band_delta)
+
+    t_index: List[int] = []
+    t_side: List[int] = []
+    t_amount: List[float] = []
+    t_price: List[float] = []
+    t_usd: List[float] = []
+    t_usdc: List[float] = []
+    t_btc_value: List[float] = []
+    t_nav: List[float] = []
+    t_btc: List[float] = []
+
+    def record(i, side, amount, price, usd):
+        t_index.append(i)
+        t_side.append(side)
+        t_amount.append(amount)
+        t_price.append(price)
+        t_usd.append(usd)
+        t_usdc.append(usdc)
+        t_btc_value.append(btc * price)
+        t_nav.append(usdc + btc * price)
+        t_btc.append(btc)
+
+    for i, price in enumerate(prices):
+        nav = usdc + btc * price
+        btc_value = btc * price
+        w_btc = 0.0 if nav <= 0 else (btc_value / nav)
+
+        if threshold_mode and nav > 0:
+            if w_btc > w_plus:
+                # SELL BTC down to w_plus, capped by rebalance_cap_frac * NAV
+                target_btc_value = w_plus * nav
+                excess_usd = max(0.0, btc_value - target_btc_value)
+                trade_usd = min(excess_usd, rebalance_cap_frac * nav)
+                if trade_usd >= min_trade_usd and price > 0:
+                    btc_to_sell = trade_usd / price
+                    btc_to_sell = min(btc_to_sell, btc)
+                    trade_usd = btc_to_sell * price
+                    btc -= btc_to_sell
+                    usdc += trade_usd
+                    record(i, SIDE_SELL, btc_to_sell, price, trade_usd)
+                continue
+
+            elif w_btc < w_minus:
+                # BUY BTC up to w_minus, capped by cash and rebalance cap
+                target_btc_value = w_minus * nav
+                shortfall_usd = max(0.0, target_btc_value - btc_value)
+                trade_usd = min(shortfall_usd, usdc, rebalance_cap_frac * nav)
+                if trade_usd >= min_trade_usd and price > 0:
+                    btc_to_buy = trade_usd / price
+                    btc += btc_to_buy
+                    usdc -= trade_usd
+                    record(i, SIDE_BUY, btc_to_buy, price, trade_usd)
+                continue
+
+        if dca is not None and not dca[i]:
+            continue
+
+        # Buy-only logic: base DCA + volatility-scaled kicker
+        buy_budget = 0.0
+        available_to_spend = max(0.0, usdc - buffer_target)
+        base_buy = min(base_dca_usdc, usdc)
+        buy_budget += base_buy
+
+        extra_buy = k_kicker * sigmas[i] * dds[i] * nav
+        extra_buy = min(extra_buy, extra_cap)
+        extra_buy = min(extra_buy, available_to_spend)
+        buy_budget += max(0.0, extra_buy)
+
+        buy_usd = min(usdc, buy_budget)
+        if buy_usd >= min_trade_usd and price > 0:
+            btc_bought = buy_usd / price
+            btc += btc_bought
+            usdc -= buy_usd
+            record(i, SIDE_BUY, btc_bought, price, buy_usd)
+
+    trades = {
+        "index": np.array(t_index, dtype=np.int64),
+        "side": np.array(t_side, dtype=np.int8),
+        "amount": np.array(t_amount, dtype=np.float64),
+        "price": np.array(t_price, dtype=np.float64),
+        "usd_value": np.array(t_usd, dtype=np.float64),
+        "usdc_value": np.array(t_usdc, dtype=np.float64),
+        "btc_value": np.array(t_btc_value, dtype=np.float64),
+        "nav": np.array(t_nav, dtype=np.float64),
+        "btc_balance": np.array(t_btc, dtype=np.float64),
+    }
+    return AdaptiveResult(usdc=usdc, btc=btc, trades_count=len(t_index), trades=trades)
+
+
+def adaptive_trade(
+    price: float,
+    sigma: float,
+    drawdown: float,
+    usdc: float,
+    btc: float,
+    base_dca_usdc: float = 50.0,
+    target_btc_weight: float = 0.70,
+    band_delta: float = 0.10,
+    k_kicker: float = 0.05,
+    cmax_mult: float = 3.0,
+    buffer_mult: float = 9.0,
+    min_trade_usd: float = 5.0,
+    threshold_mode: bool = False,
+    rebalance_cap_frac: float = 0.25,
+) -> Optional[Tuple[int, float, float]]:
+    """
+    One bar of the state machine: (side, btc_amount, usd_value) of the trade
+    to make at `price`, or None. Same arithmetic as the loop in
+    simulate_adaptive_dca (which inlines it for speed).
+    """
+    nav = usdc + btc * price
+    btc_value = btc * price
+    w_btc = 0.0 if nav <= 0 else (btc_value / nav)
+    w_minus = max(0.0, target_btc_weight - band_delta)
+    w_plus  = min(1.0, target_btc_weight + band_delta)
+
+    if threshold_mode and nav > 0:
+        if w_btc > w_plus:
+            excess_usd = max(0.0, btc_value - w_plus * nav)
+            trade_usd = min(excess_usd, rebalance_cap_frac * nav)
+            if trade_usd >= min_trade_usd and price > 0:
+                btc_to_sell = min(trade_usd / price, btc)
+                return SIDE_SELL, btc_to_sell, btc_to_sell * price
+            return None
+        elif w_btc < w_minus:
+            shortfall_usd = max(0.0, w_minus * nav - btc_value)
+            trade_usd = min(shortfall_usd, usdc, rebalance_cap_frac * nav)
+            if trade_usd >= min_trade_usd and price > 0:
+                return SIDE_BUY, trade_usd / price, trade_usd
+            return None
+
+    available_to_spend = max(0.0, usdc - buffer_mult * base_dca_usdc)
+    buy_budget = 0.0 + min(base_dca_usdc, usdc)
+    extra_buy = k_kicker * sigma * drawdown * nav
+    extra_buy = min(extra_buy, cmax_mult * base_dca_usdc)
+    extra_buy = min(extra_buy, available_to_spend)
+    buy_budget += max(0.0, extra_buy)
+
+    buy_usd = min(usdc, buy_budget)
+    if buy_usd >= min_trade_usd and price > 0:
+        return SIDE_BUY, buy_usd / price, buy_usd
+    return None
+
+
+# ------------------------------
+# Batched state machine
+# ------------------------------
+
+@dataclass
+class BatchResult:
+    usdc: np.ndarray
+    btc: np.ndarray
+    trades_count: np.ndarray
+    # most negative nav / running-peak - 1 per configuration (None if not tracked)
+    max_drawdown: Optional[np.ndarray] = None
+    # (T, N) nav and BTC value after every bar (None unless record_nav)
+    nav: Optional[np.ndarray] = None
+    btc_value: Optional[np.ndarray] = None
+
+
+def simulate_adaptive_dca_batch(
+    close: np.ndarray,
+    sigma: np.ndarray,
+    drawdown: np.ndarray,
+    initial_capital_usdc,
+    base_dca_usdc=50.0,
+    target_btc_weight=0.70,
+    band_delta=0.10,
+    k_kicker=0.05,
+    cmax_mult=3.0,
+    buffer_mult=9.0,
+    min_trade_usd=5.0,
+    threshold_mode=False,
+    rebalance_cap_frac=0.25,
+    track_drawdown: bool = True,
+    record_nav: bool = False,
+    dca_bars: Optional[np.ndarray] = None,
+) -> BatchResult:
+    """
+    Run N configurations of the state machine together. Every sizing parameter
+    may be a scalar or a length-N array; close, sigma and drawdown are (T,) or
+    (T, N), so the columns can also be N different price paths. Portfolio
+    state is carried as length-N arrays and advanced bar by bar with NumPy
+    ops, so each column reproduces simulate_adaptive_dca exactly. With
+    record_nav the per-bar nav and BTC value are kept for metrics.summarize.
+    `dca_bars` (bool per bar) limits the buy-only DCA as in simulate_adaptive_dca.
+    """
+    prices = np.asarray(close, dtype=np.float64)
+    dca = None if dca_bars is None else np.asarray(dca_bars, dtype=bool)
+    sigma = np.asarray(sigma, dtype=np.float64)
+    dds = np.asarray(drawdown, dtype=np.float64)
+    params = [np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in (
+        initial_capital_usdc, base_dca_usdc, target_btc_weight, band_delta, k_kicker,
+        cmax_mult, buffer_mult, min_trade_usd, rebalance_cap_frac)]
+    thr = np.atleast_1d(np.asarray(threshold_mode, dtype=bool))
+    n = np.broadcast_shapes(*(p.shape for p in params), thr.shape,
+                            prices.shape[1:], sigma.shape[1:], dds.shape[1:])[0]
+    initial, base, w_target, band, k, cmax, buf_mult, min_trade, cap = (np.broadcast_to(p, (n,)) for p in params)
+    thr = np.broadcast_to(thr, (n,))
+    any_thr = bool(thr.any())
+
+    usdc = initial.copy()
+    btc = np.zeros(n)
+    trades = np.zeros(n, dtype=np.int64)
+    buffer_target = buf_mult * base
+    extra_cap = cmax * base
+    w_minus = np.maximum(0.0, w_target - band)
+    w_plus = np.minimum(1.0, w_target + band)
+    peak = np.full(n, -np.inf)
+    mdd = np.zeros(n)
+    nav_rows = np.empty((len(prices), n)) if record_nav else None
+    btc_rows = np.empty((len(prices), n)) if record_nav else None
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for i in range(len(prices)):
+            price = prices[i]
+            sig = sigma[i]
+            nav = usdc + btc * price
+            btc_value = btc * price
+            normal = np.ones(n, dtype=bool)
+
+            if any_thr:
+                active = thr & (nav > 0)
+                w_btc = np.where(nav <= 0, 0.0, btc_value / nav)
+                sell_zone = active & (w_btc > w_plus)
+                buy_zone = active & ~sell_zone & (w_btc < w_minus)
+                normal = ~(sell_zone | buy_zone)
+                if sell_zone.any():
+                    excess_usd = np.maximum(0.0, btc_value - w_plus * nav)
+                    trade_usd = np.minimum(excess_usd, cap * nav)
+                    do = sell_zone & (trade_usd >= min_trade) & (price > 0)
+                    btc_to_sell = np.minimum(trade_usd / price, btc)
+                    trade_usd = btc_to_sell * price
+                    btc = np.where(do, btc - btc_to_sell, btc)
+                    usdc = np.where(do, usdc + trade_usd, usdc)
+                    trades += do
+                if buy_zone.any():
+                    shortfall_usd = np.maximum(0.0, w_minus * nav - btc_value)
+                    trade_usd = np.minimum(np.minimum(shortfall_usd, usdc), cap * nav)
+                    do = buy_zone & (trade_usd >= min_trade) & (price > 0)
+                    btc = np.where(do, btc + trade_usd / price, btc)
+                    usdc = np.where(do, usdc - trade_usd, usdc)
+                    trades += do
+
+            if dca is not None:
+                normal = normal & dca[i]
+
+            # Buy-only logic: base DCA + volatility-scaled kicker
+            available_to_spend = np.maximum(0.0, usdc - buffer_target)
+            buy_budget = 0.0 + np.minimum(base, usdc)
+            extra_buy = k * sig * dds[i] * nav
+            extra_buy = np.minimum(extra_buy, extra_cap)
+            extra_buy = np.minimum(extra_buy, available_to_spend)
+            buy_budget += np.maximum(0.0, extra_buy)
+            buy_usd = np.minimum(usdc, buy_budget)
+            do = normal & (buy_usd >= min_trade) & (price > 0)
+            btc = np.where(do, btc + buy_usd / price, btc)
+            usdc = np.where(do, usdc - buy_usd, usdc)
+            trades += do
+
+            if track_drawdown:
+                nav_after = usdc + btc * price
+                np.maximum(peak, nav_after, out=peak)
+                np.minimum(mdd, np.where(peak > 0, nav_after / peak - 1.0, 0.0), out=mdd)
+            if record_nav:
+                btc_rows[i] = btc * price
+                nav_rows[i] = usdc + btc_rows[i]
+
+    return BatchResult(usdc=usdc, btc=btc, trades_count=trades,
+                       max_drawdown=mdd if track_drawdown else None, nav=nav_rows, btc_value=btc_rows)
+
+
+# ------------------------------
+# Results
+# ------------------------------
+
+def nav_series(close: np.ndarray, result: AdaptiveResult, initial_capital_usdc: float) -> np.ndarray:
+    """End-of-bar portfolio value, rebuilt from the trade log (holdings only change on trades)."""
+    close = np.asarray(close, dtype=np.float64)
+    t = result.trades
+    # index of the last trade at or before each bar (-1 = none yet)
+    last = np.searchsorted(t["index"], np.arange(len(close)), side="right") - 1
+    has = last >= 0
+    usdc = np.full(len(close), float(initial_capital_usdc))
+    btc = np.zeros(len(close))
+    usdc[has] = t["usdc_value"][last[has]]
+    btc[has] = t["btc_balance"][last[has]]
+    return usdc + btc * close
+
+
+def simple_dca_holdings(
+    close: np.ndarray,
+    initial_capital_usdc: float,
+    base_dca_usdc: float = 50.0,
+    min_trade_usd: float = 5.0,
+    initial_btc: float = 0.0,
+    dca_bars: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    End-of-bar (usdc, btc) of the simple DCA benchmark (buy min(usdc, base)
+    every bar, or every bar marked in `dca_bars`, while it is at least
+    min_trade_usd) and its trade count. The cash path is a subtract.accumulate
+    and the BTC path a cumsum, so both are identical to the sequential loop.
+    A run continues over the next chunk of bars from the last usdc/btc
+    (initial_capital_usdc/initial_btc).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    buys = close > 0
+    if dca_bars is not None:
+        buys &= np.asarray(dca_bars, dtype=bool)
+    valid = np.flatnonzero(buys)
+    m = len(valid)
+    initial = float(initial_capital_usdc)
+    base = float(base_dca_usdc)
+
+    spend = np.zeros(m)
+    usdc_after = np.full(m, initial)
+    trades = 0
+    if m and base >= min_trade_usd:
+        # cash before each buy if every buy were a full `base`
+        steps = np.full(m + 1, base)
+        steps[0] = initial
+        cash = np.subtract.accumulate(steps)
+        short = cash[:m] < base
+        j = int(np.argmax(short)) if short.any() else m   # first buy limited by cash
+        spend[:j] = base
+        usdc_after[:j] = cash[1:j + 1]
+        trades = j
+        if j < m:
+            rem = float(cash[j])
+            if rem >= min_trade_usd:
+                spend[j] = rem
+                usdc_after[j:] = 0.0
+                trades += 1
+                if min_trade_usd <= 0:
+                    # the loop keeps "buying" min(0, base) = 0 on every later bar and counts each one
+                    trades += m - j - 1
+            else:
+                usdc_after[j:] = rem
+    btc_after = np.cumsum(np.concatenate(([float(initial_btc)], spend / close[valid])))[1:]
+
+    last = np.cumsum(buys) - 1   # last valid bar at or before each bar
+    usdc = np.full(n, initial)
+    btc = np.full(n, float(initial_btc))
+    has = last >= 0
+    usdc[has] = usdc_after[last[has]]
+    btc[has] = btc_after[last[has]]
+    return usdc, btc, trades
+
+
+def hodl_holdings(
+    close: np.ndarray,
+    initial_capital_usdc: float,
+    fee: float = 0.0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    End-of-bar (usdc, btc) of the lump-sum benchmark: the whole capital, less
+    `fee`, buys BTC at the first positive close and is held from then on.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    initial = float(initial_capital_usdc)
+    usdc = np.full(n, initial)
+    btc = np.zeros(n)
+    valid = np.flatnonzero(close > 0)
+    if len(valid):
+        first = int(valid[0])
+        usdc[first:] = 0.0
+        btc[first:] = (initial * (1.0 - fee)) / float(close[first])
+    return usdc, btc
+
+
+def max_drawdown(nav: np.ndarray) -> float:
+    """Largest peak-to-trough decline as a (negative) fraction of the peak."""
+    nav = np.asarray(nav, dtype=np.float64)
+    if len(nav) == 0:
+        return 0.0
+    peak = np.maximum.accumulate(nav)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd = np.where(peak > 0, nav / peak - 1.0, 0.0)
+    return float(dd.min())
+
+
+def summarize_batch(close: np.ndarray, result: BatchResult, initial_capital_usdc, days: int) -> Dict[str, np.ndarray]:
+    """
+    run_backtest summary figures (plus max drawdown) for every column of a
+    batch, and the metrics.summarize figures when the batch recorded its nav.
+    """
+    initial = np.broadcast_to(np.asarray(initial_capital_usdc, dtype=np.float64), result.usdc.shape)
+    final_nav = result.usdc + result.btc * float(close[-1])
+    returns_abs = final_nav - initial
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roi = np.where(initial <= 0, 0.0, returns_abs / initial)
+    years = days / 365.0
+    # Python's float pow (not np.power) so every column equals run_backtest exactly
+    ann_roi = np.array([(1.0 + r) ** (1.0 / years) - 1.0 for r in roi.tolist()]) if years > 0 else roi
+    out = {
+        "ROI_%": roi * 100.0,
+        "Annualized_ROI_%": ann_roi * 100.0,
+        "Returns_$": returns_abs,
+        "Final_Portfolio_$": final_nav,
+        "Final_BTC": result.btc,
+        "Final_USDC": result.usdc,
+        "Trades": result.trades_count,
+    }
+    if result.max_drawdown is not None:
+        out["Max_DD_%"] = result.max_drawdown * 100.0
+    if result.nav is not None:
+        risk = metrics.summarize(result.nav, days, initial, exposure=result.btc_value, axis=0)
+        out.update({k: v for k, v in risk.items() if k not in out})
+    return out
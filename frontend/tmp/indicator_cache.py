@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Memoized indicator series shared across backtest runs and sweep workers.
+
+An indicator series is looked up by (asset, data version, indicator, params)
+and indicators.VERSION. The data version is a BLAKE2 digest of the input
+array, so a series is reused whenever the same prices come back, whichever
+path loaded them; indicators.VERSION retires every cached series when the
+indicator code changes. Lookups go
+through two tiers:
+
+    memory  a per-process LRU bounded by bytes
+    disk    optional; one .npy file per series, loaded memory-mapped, so
+            every process that reads a series shares its pages
+
+Cached arrays are read-only: a caller that modified one in place would
+corrupt it for every other run.
+
+The default cache (default_cache()) has a memory tier only, unless
+INDICATOR_CACHE_DIR names a directory for the disk tier.
+
+Example:
+    cache = default_cache()
+    sigma = cache.adaptive_sigma(close, 30, 0.94, 0.20, asset="BTCUSDT")
+    rsi = cache.rsi(close, 8, asset="BTCUSDT")
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+import indicators
+import instrument
+
+DEFAULT_MAX_BYTES = 256 << 20
+DEFAULT_CACHE_DIR = os.environ.get("INDICATOR_CACHE_DIR") or None
+
+
+def data_version(values: np.ndarray) -> str:
+    """Content digest of an input series (dtype, shape and bytes)."""
+    values = np.ascontiguousarray(values)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{values.dtype.str}{values.shape}".encode())
+    h.update(values.data)
+    return h.hexdigest()
+
+
+class IndicatorCache:
+    """Memory LRU plus optional disk tier of indicator series."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, directory: Optional[str] = None,
+                 max_disk_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._items: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.bytes = 0
+        self.hits = self.disk_hits = self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @staticmethod
+    def key(asset: str, version: str, indicator: str, params: Sequence) -> str:
+        ident = json.dumps([indicators.VERSION, asset, version, indicator, list(params)], separators=(",", ":"))
+        return f"{indicator}-{hashlib.blake2b(ident.encode(), digest_size=20).hexdigest()}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".npy")
+
+    def _remember(self, key: str, value: np.ndarray) -> None:
+        self._items[key] = value
+        self.bytes += value.nbytes
+        while self.bytes > self.max_bytes and len(self._items) > 1:
+            _, evicted = self._items.popitem(last=False)
+            self.bytes -= evicted.nbytes
+
+    def _load(self, key: str) -> Optional[np.ndarray]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            value = np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(path)  # recency for prune()
+        return value
+
+    def _store(self, key: str, value: np.ndarray) -> None:
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, value)
+        os.replace(tmp, path)
+        if self.max_disk_bytes is not None:
+            self.prune(self.max_disk_bytes)
+
+    def get(self, indicator: str, values: np.ndarray, params: Sequence, compute: Callable[[], np.ndarray],
+            asset: str = "", version: Optional[str] = None) -> np.ndarray:
+        """
+        The series of `indicator` over `values` with `params`, computing it
+        with compute() only if neither tier has it. Pass `version` to skip
+        hashing `values` when the caller already knows it.
+        """
+        key = self.key(asset, version or data_version(values), indicator, params)
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            instrument.active().count("indicator_cache_hits")
+            return value
+        value = self._load(key)
+        if value is not None:
+            self.disk_hits += 1
+            instrument.active().count("indicator_cache_disk_hits")
+        else:
+            self.misses += 1
+            instrument.active().count("indicator_cache_misses")
+            value = np.asarray(compute())
+            self._store(key, value)
+        value.flags.writeable = False
+        self._remember(key, value)
+        return value
+
+    def prune(self, max_disk_bytes: int) -> int:
+        """Delete the least recently used files until the disk tier fits; returns the files removed."""
+        if not self.directory:
+            return 0
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                st = os.stat(os.path.join(self.directory, name))
+                entries.append((st.st_mtime_ns, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, name in sorted(entries):
+            if total <= max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._items), "bytes": self.bytes, "hits": self.hits,
+                "disk_hits": self.disk_hits, "misses": self.misses}
+
+    # --- indicators.py functions ---
+
+    def sma(self, values: np.ndarray, period: int, asset: str = "", version: Optional[str] = None,
+            exact: bool = False) -> np.ndarray:
+        return self.get("sma", values, (int(period), bool(exact)),
+                        lambda: indicators.sma(values, period, exact=exact), asset, version)
+
+    def rsi(self, values: np.ndarray, period: int, asset: str = "", version: Optional[str] = None,
+            exact: bool = False) -> np.ndarray:
+        return self.get("rsi", values, (int(period), bool(exact)),
+                        lambda: indicators.rsi(values, period, exact), asset, version)
+
+    def running_drawdown(self, close: np.ndarray, asset: str = "", version: Optional[str] = None) -> np.ndarray:
+        return self.get("drawdown", close, (), lambda: indicators.running_drawdown(close), asset, version)
+
+    def adaptive_sigma(self, close: np.ndarray, lookback_days: int = 30, ewma_lambda_daily: float = 0.94,
+                       winsorize_abs_ret: float = 0.20,
+                       periods_per_year: float = indicators.PERIODS_PER_YEAR_DAILY,
+                       asset: str = "", version: Optional[str] = None, exact: bool = False) -> np.ndarray:
+        params = (int(lookback_days), float(ewma_lambda_daily), float(winsorize_abs_ret), float(periods_per_year),
+                  bool(exact))
+        return self.get("adaptive_sigma", close, params,
+                        lambda: indicators.adaptive_sigma(close, *params), asset, version)
+
+    def adaptive_sigma_drawdown(self, close: np.ndarray, lookback_days: int = 30, ewma_lambda_daily: float = 0.94,
+                                winsorize_abs_ret: float = 0.20,
+                                periods_per_year: float = indicators.PERIODS_PER_YEAR_DAILY,
+                                asset: str = "", version: Optional[str] = None, exact: bool = False):
+        """dca_engine.adaptive_sigma_drawdown through the cache; the drawdown is shared by every sigma."""
+        version = version or data_version(close)
+        return (self.adaptive_sigma(close, lookback_days, ewma_lambda_daily, winsorize_abs_ret, periods_per_year,
+                                    asset, version, exact),
+                self.running_drawdown(close, asset, version))
+
+
+_default_cache: Optional[IndicatorCache] = None
+
+
+def default_cache() -> IndicatorCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = IndicatorCache(directory=DEFAULT_CACHE_DIR)
+    return _default_cache
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Incremental builder for frontend/public/data/backtest_data_with_indicators.json.
+
+The dataset holds one row per day with the BTC/ETH closes and the indicators
+of the momentum strategy (momentum-eth-btc.py): RSI(8) of both closes, the
+200-day BTC SMA and RSI(5) of ETH/BTC. Three files are written side by side:
+
+    backtest_data_with_indicators.json        the rows, as before
+    backtest_data_with_indicators.bin         the same rows as typed arrays
+    backtest_data_with_indicators.state.json  indicator state after the last row
+
+A run only processes the days after the last row: the SMA window and the
+Wilder averages come from the state file, new rows are appended to the JSON in
+place and to the sidecar. A full rebuild is done with --full, or whenever the
+state is missing or does not match the files. The streams run with
+exact=True, so appended indicator values are identical to a full rebuild.
+
+Sidecar layout (little-endian): a 16-byte header (magic b"PWID", then uint32
+version, rows and columns), followed by rows x columns float64 in row-major
+order. Column 0 is the day number since 1970-01-01 (UTC), the others follow
+COLUMNS; missing values are NaN.
+
+Example:
+  python indicator_dataset.py            # append the candles closed since the last run
+  python indicator_dataset.py --full --start 2025-01-01
+"""
+import argparse
+import json
+import os
+import struct
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bars import DAY_MS, date_str, to_ms
+from indicators import RsiStream, SmaStream
+from kline_cache import fetch_binance_bars_many
+from price_store import DATA_DIR, PriceStore
+
+DEFAULT_JSON = os.path.join(DATA_DIR, "backtest_data_with_indicators.json")
+
+STATE_VERSION = 2
+SIDECAR_MAGIC = b"PWID"
+SIDECAR_VERSION = 1
+SIDECAR_HEADER = struct.Struct("<4sIII")
+
+# Value columns after the date, in JSON key and sidecar column order
+COLUMNS = ("btc_price", "eth_price", "btc_rsi", "eth_rsi", "btc_sma", "eth_btc_rsi")
+
+# momentum-eth-btc.py Parameters
+RSI_BARS = 8
+ETH_BTC_RSI_BARS = 5
+SMA_LENGTH = 200
+WARMUP_DAYS = 200  # history loaded before the first row of a full build
+
+
+def sidecar_path(json_path: str) -> str:
+    return os.path.splitext(json_path)[0] + ".bin"
+
+
+def state_path(json_path: str) -> str:
+    return os.path.splitext(json_path)[0] + ".state.json"
+
+
+# ------------------------------
+# Indicators
+# ------------------------------
+
+def new_streams() -> Dict[str, object]:
+    return {
+        "btc_rsi": RsiStream(RSI_BARS, exact=True),
+        "eth_rsi": RsiStream(RSI_BARS, exact=True),
+        "btc_sma": SmaStream(SMA_LENGTH, exact=True),
+        "eth_btc_rsi": RsiStream(ETH_BTC_RSI_BARS, exact=True),
+    }
+
+
+def advance(streams: Dict[str, object], btc: np.ndarray, eth: np.ndarray) -> Dict[str, np.ndarray]:
+    """Indicator columns for the next days; the streams keep their state for the following call."""
+    return {
+        "btc_price": btc,
+        "eth_price": eth,
+        "btc_rsi": streams["btc_rsi"].update(btc),
+        "eth_rsi": streams["eth_rsi"].update(eth),
+        "btc_sma": streams["btc_sma"].update(btc),
+        "eth_btc_rsi": streams["eth_btc_rsi"].update(eth / btc),
+    }
+
+
+# ------------------------------
+# Prices
+# ------------------------------
+
+def load_closes(start_ms: int, end_ms: int, store: Optional[PriceStore] = None
+                ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(day, btc, eth) of the closed daily candles in [start_ms, end_ms] that both assets have."""
+    now_ms = int(time.time() * 1000)
+    end_ms = min(end_ms, now_ms - 1)
+    if end_ms < start_ms:
+        return np.empty(0, dtype=np.int32), np.empty(0), np.empty(0)
+    if store is not None:
+        btc = store.bars("BTCUSDT").between(start_ms, end_ms)
+        eth = store.bars("ETHUSDT").between(start_ms, end_ms)
+    else:
+        start = pd.Timestamp(start_ms, unit="ms", tz="UTC")
+        got = fetch_binance_bars_many(["BTCUSDT", "ETHUSDT"], "1d", start, pd.Timestamp(end_ms, unit="ms", tz="UTC"))
+        btc, eth = (got[s].between(start_ms, end_ms) for s in ("BTCUSDT", "ETHUSDT"))
+    days, ib, ie = np.intersect1d(btc.days, eth.days, assume_unique=True, return_indices=True)
+    return days, np.asarray(btc.close, dtype=np.float64)[ib], np.asarray(eth.close, dtype=np.float64)[ie]
+
+
+# ------------------------------
+# Output files
+# ------------------------------
+
+def to_rows(days: np.ndarray, cols: Dict[str, np.ndarray]) -> list:
+    """JSON rows; NaN (indicator not defined yet) becomes null."""
+    dates = [date_str(d * DAY_MS) for d in days.tolist()]
+    values = [[None if v != v else v for v in cols[c].tolist()] for c in COLUMNS]
+    return [dict(zip(("date",) + COLUMNS, row)) for row in zip(dates, *values)]
+
+
+def write_json(path: str, rows: list) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(rows, f, indent=2)
+    os.replace(tmp, path)
+
+
+def append_json(path: str, rows: list) -> None:
+    """
+    Append rows to a list written by write_json without rewriting it: the
+    closing bracket is replaced by the new elements, giving the same bytes
+    as dumping the whole list.
+    """
+    if not rows:
+        return
+    with open(path, "r+b") as f:
+        f.seek(-2, os.SEEK_END)
+        if f.read(2) != b"\n]":
+            raise ValueError(f"{path} does not end like a json.dump(indent=2) list")
+        f.seek(-2, os.SEEK_END)
+        f.truncate()
+        f.write(b",\n" + json.dumps(rows, indent=2)[2:].encode())
+
+
+def sidecar_block(days: np.ndarray, cols: Dict[str, np.ndarray]) -> np.ndarray:
+    block = np.empty((len(days), 1 + len(COLUMNS)), dtype="<f8")
+    block[:, 0] = days
+    for j, c in enumerate(COLUMNS, start=1):
+        block[:, j] = cols[c]
+    return block
+
+
+def write_sidecar(path: str, block: np.ndarray) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(SIDECAR_HEADER.pack(SIDECAR_MAGIC, SIDECAR_VERSION, len(block), block.shape[1]))
+        f.write(block.tobytes())
+    os.replace(tmp, path)
+
+
+def append_sidecar(path: str, block: np.ndarray) -> None:
+    """Append rows to the sidecar and bump the row count in its header."""
+    with open(path, "r+b") as f:
+        magic, version, rows, ncols = SIDECAR_HEADER.unpack(f.read(SIDECAR_HEADER.size))
+        if magic != SIDECAR_MAGIC or version != SIDECAR_VERSION or ncols != block.shape[1]:
+            raise ValueError(f"{path} is not a version {SIDECAR_VERSION} indicator sidecar")
+        f.seek(SIDECAR_HEADER.size + rows * ncols * 8)
+        f.write(block.tobytes())
+        f.truncate()
+        f.seek(0)
+        f.write(SIDECAR_HEADER.pack(magic, version, rows + len(block), ncols))
+
+
+def sidecar_from_json(json_path: str) -> int:
+    """Write the sidecar of an existing JSON dataset (e.g. one edited by hand); returns its rows."""
+    with open(json_path) as f:
+        rows = json.load(f)
+    days = np.array([r["date"] for r in rows], dtype="datetime64[D]").astype(np.int64)
+    cols = {c: np.array([np.nan if r.get(c) is None else r[c] for r in rows], dtype=np.float64)
+            for c in COLUMNS}
+    write_sidecar(sidecar_path(json_path), sidecar_block(days, cols))
+    return len(rows)
+
+
+# ------------------------------
+# Build
+# ------------------------------
+
+def load_state(json_path: str) -> Optional[dict]:
+    """The saved state if it still describes the JSON and sidecar on disk, else None."""
+    path, bin_path = state_path(json_path), sidecar_path(json_path)
+    if not (os.path.exists(path) and os.path.exists(json_path) and os.path.exists(bin_path)):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    with open(bin_path, "rb") as f:
+        _, _, bin_rows, _ = SIDECAR_HEADER.unpack(f.read(SIDECAR_HEADER.size))
+    if (state.get("version") != STATE_VERSION or state["json_size"] != os.path.getsize(json_path)
+            or state["rows"] != bin_rows):
+        return None
+    return state
+
+
+def save_state(json_path: str, streams: Dict[str, object], last_day: int, rows: int) -> None:
+    """Written last, so an interrupted run is detected by load_state and rebuilt."""
+    state = {
+        "version": STATE_VERSION,
+        "last_day": int(last_day),
+        "rows": int(rows),
+        "json_size": os.path.getsize(json_path),
+        "streams": {k: s.state() for k, s in streams.items()},
+    }
+    path = state_path(json_path)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def build(json_path: str = DEFAULT_JSON, start: str = "2025-01-01", end: Optional[str] = None,
+          store: Optional[PriceStore] = None, full: bool = False) -> Tuple[int, int]:
+    """
+    Bring the dataset up to `end` (default: the last closed candle). Returns
+    (new rows, total rows). `start` is the first row of a full rebuild.
+    """
+    end_ms = to_ms(end) + DAY_MS - 1 if end is not None else int(time.time() * 1000)
+    state = None if full else load_state(json_path)
+
+    if state is None:
+        streams = new_streams()
+        first_ms = to_ms(start)
+        days, btc, eth = load_closes(first_ms - WARMUP_DAYS * DAY_MS, end_ms, store)
+        cols = advance(streams, btc, eth)
+        keep = days >= first_ms // DAY_MS
+        days, cols = days[keep], {c: v[keep] for c, v in cols.items()}
+        if not len(days):
+            raise RuntimeError("No data for the requested period.")
+        write_json(json_path, to_rows(days, cols))
+        write_sidecar(sidecar_path(json_path), sidecar_block(days, cols))
+        save_state(json_path, streams, days[-1], len(days))
+        return len(days), len(days)
+
+    streams = {k: (SmaStream if k == "btc_sma" else RsiStream).from_state(s) for k, s in state["streams"].items()}
+    days, btc, eth = load_closes((state["last_day"] + 1) * DAY_MS, end_ms, store)
+    if not len(days):
+        return 0, state["rows"]
+    cols = advance(streams, btc, eth)
+    append_json(json_path, to_rows(days, cols))
+    append_sidecar(sidecar_path(json_path), sidecar_block(days, cols))
+    total = state["rows"] + len(days)
+    save_state(json_path, streams, days[-1], total)
+    return len(days), total
+
+
+# ------------------------------
+# CLI
+# ------------------------------
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Append new days to the indicator dataset of the simulator.")
+    p.add_argument("--json", type=str, default=DEFAULT_JSON, help="Dataset path (sidecar and state live next to it)")
+    p.add_argument("--start", type=str, default="2025-01-01", help="First row of a full rebuild (YYYY-MM-DD)")
+    p.add_argument("--end", type=str, default=None, help="Last day to include (default: last closed candle)")
+    p.add_argument("--full", action="store_true", help="Rebuild from --start instead of appending.")
+    p.add_argument("--sidecar-only", action="store_true", help="Only rewrite the sidecar from the JSON.")
+    p.add_argument("--offline", action="store_true", help="Use the bundled public/data daily closes instead of Binance.")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.sidecar_only:
+        rows = sidecar_from_json(args.json)
+        print(f"Wrote {sidecar_path(args.json)} ({rows} rows)")
+        return
+    t0 = time.perf_counter()
+    new, total = build(args.json, args.start, args.end, PriceStore() if args.offline else None, args.full)
+    print(f"Added {new} row(s), {total} in total, in {time.perf_counter() - t0:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
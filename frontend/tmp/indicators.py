@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+Vectorized indicator library for the Python backtests.
+
+Port of frontend/src/lib/indicators.ts (SMA, Wilder RSI) plus the volatility
+and drawdown inputs of the adaptive DCA strategy. Every function takes a whole
+float64 array and returns a whole array computed in one pass, so neither
+pandas_ta nor a per-bar Python loop is needed.
+
+Linear recurrences (Wilder RMA, EWMA variance) are evaluated in closed form
+over blocks, and rolling sums come from cumulative sums. Results therefore
+agree with the step-by-step definitions to within float rounding (~1e-12
+relative) rather than bit for bit.
+
+Where bit-identity matters, pass exact=True: sums then run in the TS
+summation order and the recurrences are evaluated one step at a time in the
+operation order of indicators.ts and the original adaptive DCA loop. A
+1-ulp difference can leave a dust position that flips every later signal,
+so the backtests that are compared against a reference (run_backtest, the
+strategy ports, the momentum script) use it.
+"""
+import math
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+
+PERIODS_PER_YEAR_DAILY = 365.0
+DAY_MS = 86_400_000
+
+# Part of every indicator_cache key: bump it whenever a function here changes
+# its output, so the disk tier stops serving series computed by the old code.
+# 2: step-exact recurrences (exact=True) and the (prev > 0) & (close > 0) log guard.
+VERSION = 2
+
+
+def periods_per_year(bar_ms: int) -> float:
+    """Bars per 365-day year for bars of `bar_ms` milliseconds (365.0 for daily bars)."""
+    return PERIODS_PER_YEAR_DAILY * (DAY_MS / bar_ms)
+
+
+# ------------------------------
+# Building blocks
+# ------------------------------
+
+def seq_sum(values: np.ndarray) -> float:
+    """Left-to-right sum, like a JS for loop or Array.reduce (np.sum is pairwise)."""
+    values = np.asarray(values, dtype=np.float64)
+    return float(np.cumsum(values)[-1]) if len(values) else 0.0
+
+
+def linear_recurrence(x: np.ndarray, a: float, b: float, y0: float = 0.0, exact: bool = False) -> np.ndarray:
+    """
+    y[i] = a * y[i-1] + b * x[i], with y[-1] = y0, for 0 <= a < 1 and x >= 0.
+
+    Within a block y[k+j] = a^(j+1) * (y[k-1] + b * cumsum(a^-(m+1) * x[k+m])),
+    with the block length chosen so that a^-len stays far from overflow. With
+    exact=True the recurrence is evaluated step by step instead.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if exact:
+        out: List[float] = []
+        append = out.append
+        y = float(y0)
+        for v in x.tolist():
+            y = a * y + b * v
+            append(y)
+        return np.array(out, dtype=np.float64)
+    n = len(x)
+    res = np.empty(n, dtype=np.float64)
+    if n == 0:
+        return res
+    if a <= 0.0:
+        res[:] = b * x
+        return res
+    block = n if a >= 1.0 else max(1, min(n, int(100.0 * math.log(10.0) / -math.log(a))))
+    steps = np.arange(1, block + 1, dtype=np.float64)
+    pw = a ** steps
+    inv = a ** -steps
+    prev = float(y0)
+    for k in range(0, n, block):
+        m = min(block, n - k)
+        acc = np.cumsum(x[k:k + m] * inv[:m])
+        acc *= b
+        acc += prev
+        acc *= pw[:m]
+        res[k:k + m] = acc
+        prev = float(acc[-1])
+    return res
+
+
+def rolling_sum(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Trailing sum over the last `window` values (fewer at the start of the
+    series) and the number of values in each window.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    cs = np.empty(n + 1, dtype=np.float64)
+    cs[0] = 0.0
+    np.cumsum(values, out=cs[1:])
+    idx = np.arange(1, n + 1)
+    lo = np.maximum(0, idx - window)
+    return cs[idx] - cs[lo], (idx - lo)
+
+
+# ------------------------------
+# Indicators (indicators.ts)
+# ------------------------------
+
+def sma(values: np.ndarray, period: int, ascending: bool = False, exact: bool = False) -> np.ndarray:
+    """
+    Simple moving average; NaN until `period` values are available. With
+    exact=True each window is summed prices[i], prices[i-1], ... like
+    calculateSMA, or oldest first with ascending=True (the smaAt helper of
+    btcTrendFollowing.ts); that costs `period` passes over the series.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = np.full(n, np.nan)
+    if period <= 0 or n < period:
+        return out
+    if not exact:
+        s, _ = rolling_sum(values, period)
+        out[period - 1:] = s[period - 1:] / period
+        return out
+    m = n - period + 1
+    acc = np.zeros(m)
+    for j in (range(period) if ascending else range(period - 1, -1, -1)):
+        acc += values[j:j + m]
+    out[period - 1:] = acc / period
+    return out
+
+
+def rma(values: np.ndarray, period: int, exact: bool = False) -> np.ndarray:
+    """calculateRMA: SMA seed over the first `period` valid values, then alpha = 1/period."""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = np.full(n, np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    first = int(valid[0]) if len(valid) else n
+    if n - first < period:
+        return out
+    seed_idx = first + period - 1
+    window = values[first:seed_idx + 1]
+    seed = (seq_sum(window) if exact else float(np.sum(window))) / period
+    out[seed_idx] = seed
+    alpha = 1.0 / period
+    out[seed_idx + 1:] = linear_recurrence(values[seed_idx + 1:], 1 - alpha, alpha, seed, exact)
+    return out
+
+
+def rsi(values: np.ndarray, period: int, exact: bool = False) -> np.ndarray:
+    """calculateRSI: Wilder RSI (diff drift 1, RMA-smoothed gains/losses); 100 when there are no losses."""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n < period + 1:
+        return np.full(n, np.nan)
+    changes = np.empty(n)
+    changes[0] = np.nan
+    np.subtract(values[1:], values[:-1], out=changes[1:])
+    positive = np.where(changes > 0, changes, 0.0)
+    negative = np.where(changes < 0, -changes, 0.0)
+    positive[0] = negative[0] = np.nan
+    pos_avg = rma(positive, period, exact)
+    neg_avg = rma(negative, period, exact)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100 * pos_avg / (pos_avg + neg_avg)
+    out[neg_avg == 0] = 100.0
+    return out
+
+
+# ------------------------------
+# Adaptive DCA inputs
+# ------------------------------
+
+def log_returns(close: np.ndarray, winsorize_abs_ret: Optional[float] = None) -> np.ndarray:
+    """Log returns with r[0] = 0 (and 0 next to a non-positive price), optionally clipped to ±winsor."""
+    close = np.asarray(close, dtype=np.float64)
+    r = np.zeros(len(close))
+    if len(close) > 1:
+        prev, curr = close[:-1], close[1:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r[1:] = np.log(curr / prev)
+        r[1:][~((prev > 0) & (curr > 0))] = 0.0
+    if winsorize_abs_ret is not None:
+        np.clip(r, -winsorize_abs_ret, winsorize_abs_ret, out=r)
+    return r
+
+
+def realized_vol(returns: np.ndarray, lookback: int,
+                 periods_per_year: float = PERIODS_PER_YEAR_DAILY) -> np.ndarray:
+    """Annualized vol from the rolling sum of squared returns over up to `lookback` bars."""
+    s, count = rolling_sum(np.square(returns), lookback)
+    out = np.zeros(len(s))
+    ok = s >= 0
+    out[ok] = np.sqrt(s[ok] * (periods_per_year / count[ok]))
+    return out
+
+
+def ewma_variance(returns: np.ndarray, lam: float, warmup: int) -> np.ndarray:
+    """
+    EWMA variance sigma2_t = lam*sigma2_{t-1} + (1-lam)*r_t^2. It is 0 during
+    the first `warmup` - 1 bars and seeded with the mean squared return of the
+    first `warmup` bars.
+    """
+    r2 = np.square(np.asarray(returns, dtype=np.float64))
+    n = len(r2)
+    out = np.zeros(n)
+    if warmup <= 0:
+        out[:] = linear_recurrence(r2, lam, 1.0 - lam, 0.0)
+        return out
+    if n < warmup:
+        return out
+    seed = float(np.mean(r2[:warmup]))
+    out[warmup - 1] = seed
+    out[warmup:] = linear_recurrence(r2[warmup:], lam, 1.0 - lam, seed)
+    return out
+
+
+def running_drawdown(close: np.ndarray) -> np.ndarray:
+    """Drawdown from the running peak, 1 - price / peak, floored at 0."""
+    close = np.asarray(close, dtype=np.float64)
+    if len(close) == 0:
+        return np.empty(0)
+    peak = np.maximum.accumulate(close)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd = np.maximum(0.0, 1.0 - close / peak)
+    dd[peak <= 0] = 0.0
+    return dd
+
+
+def adaptive_sigma(
+    close: np.ndarray,
+    lookback_days: int = 30,
+    ewma_lambda_daily: float = 0.94,
+    winsorize_abs_ret: float = 0.20,
+    periods_per_year: float = PERIODS_PER_YEAR_DAILY,
+    exact: bool = False,
+) -> np.ndarray:
+    """Annualized sigma of the adaptive DCA strategy: max(rolling RV, EWMA vol)."""
+    if exact:
+        stream = AdaptiveSigmaStream(lookback_days, ewma_lambda_daily, winsorize_abs_ret, periods_per_year,
+                                     exact=True)
+        return stream.update(close)[0]
+    r = log_returns(close, winsorize_abs_ret)
+    rv_ann = realized_vol(r, lookback_days, periods_per_year)
+    s2 = ewma_variance(r, ewma_lambda_daily, min(10, lookback_days // 3))
+    ewma_ann = np.sqrt(np.where(s2 > 0, s2, 0.0) * periods_per_year)
+    return np.maximum(rv_ann, ewma_ann)
+
+
+class AdaptiveSigmaStream:
+    """
+    adaptive_sigma and running_drawdown over a series that arrives in chunks.
+
+    Between chunks only the previous close, the last `lookback` squared
+    returns, the EWMA state (or its warmup values) and the running peak are
+    kept, so memory does not grow with the series. The output matches the
+    whole-series functions to float rounding (the rolling sums restart their
+    cumulative sum in every chunk).
+
+    With exact=True every bar goes through the per-bar loop of the original
+    adaptive DCA backtest instead (a running sum of the squared returns, the
+    EWMA updated one step at a time), so any split into chunks gives the
+    same output as one adaptive_sigma(..., exact=True) call, bit for bit.
+    """
+
+    def __init__(self, lookback: int = 30, ewma_lambda: float = 0.94, winsorize_abs_ret: float = 0.20,
+                 periods_per_year: float = PERIODS_PER_YEAR_DAILY, exact: bool = False):
+        self.lookback = lookback
+        self.ewma_lambda = ewma_lambda
+        self.winsorize_abs_ret = winsorize_abs_ret
+        self.periods_per_year = periods_per_year
+        self.exact = exact
+        self.warmup_len = min(10, lookback // 3)
+        self.prev_close = math.nan
+        self.peak = -math.inf
+        self.ewma = 0.0
+        self.seeded = self.warmup_len <= 0
+        self._warm: List[float] = []
+        self._tail = np.empty(0)   # last <= lookback squared returns
+        # exact mode: the same window as a deque with its running sum
+        self.sum_r2 = 0.0
+        self._buf: Deque[float] = deque(maxlen=max(0, lookback))
+
+    def update(self, close: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(sigma, drawdown) for the next chunk of closes."""
+        if self.exact:
+            return self._update_exact(close)
+        close = np.asarray(close, dtype=np.float64)
+        m = len(close)
+        if m == 0:
+            return np.empty(0), np.empty(0)
+
+        # log returns, 0 on the first bar and next to a non-positive close
+        prev = np.empty(m)
+        prev[0] = self.prev_close
+        prev[1:] = close[:-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = np.log(close / prev)
+        r[~((prev > 0) & (close > 0))] = 0.0
+        np.clip(r, -self.winsorize_abs_ret, self.winsorize_abs_ret, out=r)
+        self.prev_close = float(close[-1])
+        r2 = np.square(r)
+
+        # rolling realized vol over the carried tail + this chunk
+        ext = np.concatenate((self._tail, r2))
+        s, count = rolling_sum(ext, self.lookback)
+        s, count = s[-m:], count[-m:]
+        self._tail = ext[-self.lookback:].copy()
+        rv_ann = np.zeros(m)
+        ok = s >= 0
+        rv_ann[ok] = np.sqrt(s[ok] * (self.periods_per_year / count[ok]))
+
+        # EWMA variance, seeded with the mean of the first warmup_len squared returns
+        s2 = np.zeros(m)
+        k = 0
+        if not self.seeded:
+            take = r2[:self.warmup_len - len(self._warm)]
+            self._warm.extend(take.tolist())
+            k = len(take)
+            if len(self._warm) == self.warmup_len:
+                self.ewma = float(np.mean(np.asarray(self._warm)))
+                s2[k - 1] = self.ewma
+                self.seeded = True
+                self._warm = []
+        if self.seeded and k < m:
+            s2[k:] = linear_recurrence(r2[k:], self.ewma_lambda, 1.0 - self.ewma_lambda, self.ewma)
+            self.ewma = float(s2[-1])
+        ewma_ann = np.sqrt(np.where(s2 > 0, s2, 0.0) * self.periods_per_year)
+
+        # drawdown from the running peak carried across chunks
+        peak = np.maximum(np.maximum.accumulate(close), self.peak)
+        self.peak = float(peak[-1])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dd = np.maximum(0.0, 1.0 - close / peak)
+        dd[peak <= 0] = 0.0
+        return np.maximum(rv_ann, ewma_ann), dd
+
+    def _update_exact(self, close: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        prices = np.asarray(close, dtype=np.float64).tolist()
+        m = len(prices)
+        sigma = [0.0] * m
+        drawdown = [0.0] * m
+        buf, warm = self._buf, self._warm
+        lookback, warmup_len = self.lookback, self.warmup_len
+        lam, ppy, w = self.ewma_lambda, self.periods_per_year, self.winsorize_abs_ret
+        prev, peak, ewma, sum_r2 = self.prev_close, self.peak, self.ewma, self.sum_r2
+        log, sqrt = math.log, math.sqrt
+
+        for i, price in enumerate(prices):
+            peak = max(peak, price)
+            drawdown[i] = 0.0 if peak <= 0 else max(0.0, 1.0 - price / peak)
+
+            # 0 on the first bar (prev is NaN) and next to a non-positive close
+            r = log(price / prev) if prev > 0 and price > 0 else 0.0
+            r = max(-w, min(w, r))
+            prev = price
+
+            r2 = r * r
+            if buf and len(buf) == lookback:
+                sum_r2 -= buf[0]
+            buf.append(r2)
+            sum_r2 += r2
+
+            if len(warm) < warmup_len:
+                warm.append(r2)
+                if len(warm) == warmup_len:
+                    ewma = float(np.mean(warm))
+            else:
+                ewma = lam * ewma + (1.0 - lam) * (r * r)
+
+            window = len(buf)
+            rv_ann = sqrt(sum_r2 * (ppy / window)) if window > 0 and sum_r2 >= 0 else 0.0
+            ewma_ann = sqrt(ewma * ppy) if ewma > 0 else 0.0
+            sigma[i] = max(rv_ann, ewma_ann)
+
+        self.prev_close, self.peak, self.ewma, self.sum_r2 = prev, peak, ewma, sum_r2
+        return np.array(sigma, dtype=np.float64), np.array(drawdown, dtype=np.float64)
+
+    def state(self) -> dict:
+        return {"lookback": self.lookback, "ewma_lambda": self.ewma_lambda,
+                "winsorize_abs_ret": self.winsorize_abs_ret, "periods_per_year": self.periods_per_year,
+                "exact": self.exact, "prev_close": self.prev_close, "peak": self.peak, "ewma": self.ewma,
+                "seeded": self.seeded, "warm": list(self._warm), "tail": self._tail.tolist(),
+                "sum_r2": self.sum_r2, "buf": list(self._buf)}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "AdaptiveSigmaStream":
+        s = cls(int(state["lookback"]), float(state["ewma_lambda"]), float(state["winsorize_abs_ret"]),
+                float(state["periods_per_year"]), bool(state.get("exact", False)))
+        s.prev_close = float(state["prev_close"])
+        s.peak = float(state["peak"])
+        s.ewma = float(state["ewma"])
+        s.seeded = bool(state["seeded"])
+        s._warm = [float(v) for v in state["warm"]]
+        s._tail = np.asarray(state["tail"], dtype=np.float64)
+        s.sum_r2 = float(state["sum_r2"])
+        s._buf.extend(float(v) for v in state["buf"])
+        return s
+
+
+# ------------------------------
+# Streaming SMA / RSI
+# ------------------------------
+
+class SmaStream:
+    """sma over a series that arrives in chunks; keeps the last period - 1 values."""
+
+    def __init__(self, period: int, tail: Optional[list] = None, exact: bool = False):
+        self.period = period
+        self.exact = exact
+        self._tail = np.asarray(tail if tail is not None else [], dtype=np.float64)
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        m = len(values)
+        if m == 0 or self.period <= 0:
+            return np.full(m, np.nan)
+        ext = np.concatenate((self._tail, values))
+        if self.exact:
+            out = sma(ext, self.period, exact=True)[-m:]
+        else:
+            s, count = rolling_sum(ext, self.period)
+            out = np.where(count[-m:] == self.period, s[-m:] / self.period, np.nan)
+        self._tail = ext[max(0, len(ext) - (self.period - 1)):].copy()
+        return out
+
+    def state(self) -> dict:
+        return {"period": self.period, "tail": self._tail.tolist(), "exact": self.exact}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "SmaStream":
+        return cls(int(state["period"]), state["tail"], bool(state.get("exact", False)))
+
+
+class RsiStream:
+    """
+    rsi over a series that arrives in chunks. Between chunks only the last
+    value and the Wilder averages of gains and losses (or, until they are
+    seeded, the first changes) are kept.
+    """
+
+    def __init__(self, period: int, exact: bool = False):
+        self.period = period
+        self.exact = exact
+        self.prev = math.nan
+        self.avg_gain = math.nan
+        self.avg_loss = math.nan
+        self._warm: list = []   # (gain, loss) of the changes before the seed
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        m = len(values)
+        out = np.full(m, np.nan)
+        if m == 0:
+            return out
+        prev = np.empty(m)
+        prev[0] = self.prev
+        prev[1:] = values[:-1]
+        self.prev = float(values[-1])
+        changes = values - prev
+        # the very first value has no change
+        k = 1 if math.isnan(prev[0]) else 0
+        gains = np.where(changes > 0, changes, 0.0)
+        losses = np.where(changes < 0, -changes, 0.0)
+
+        if math.isnan(self.avg_gain):
+            take = min(m - k, self.period - len(self._warm))
+            self._warm.extend(zip(gains[k:k + take].tolist(), losses[k:k + take].tolist()))
+            k += take
+            if len(self._warm) < self.period:
+                return out
+            warm = np.asarray(self._warm)
+            total = seq_sum if self.exact else np.sum
+            self.avg_gain = float(total(warm[:, 0])) / self.period
+            self.avg_loss = float(total(warm[:, 1])) / self.period
+            self._warm = []
+            out[k - 1] = self._value(self.avg_gain, self.avg_loss)
+        if k < m:
+            alpha = 1.0 / self.period
+            g = linear_recurrence(gains[k:], 1 - alpha, alpha, self.avg_gain, self.exact)
+            l = linear_recurrence(losses[k:], 1 - alpha, alpha, self.avg_loss, self.exact)
+            self.avg_gain, self.avg_loss = float(g[-1]), float(l[-1])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[k:] = np.where(l == 0, 100.0, 100 * g / (g + l))
+        return out
+
+    @staticmethod
+    def _value(gain: float, loss: float) -> float:
+        return 100.0 if loss == 0 else 100 * gain / (gain + loss)
+
+    def state(self) -> dict:
+        return {"period": self.period, "prev": self.prev, "avg_gain": self.avg_gain,
+                "avg_loss": self.avg_loss, "warm": [list(w) for w in self._warm], "exact": self.exact}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "RsiStream":
+        s = cls(int(state["period"]), bool(state.get("exact", False)))
+        s.prev = float(state["prev"])
+        s.avg_gain = float(state["avg_gain"])
+        s.avg_loss = float(state["avg_loss"])
+        s._warm = [tuple(w) for w in state["warm"]]
+        return s
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Opt-in instrumentation for the backtest scripts.
+
+Code calls `instrument.active()` and uses the returned object:
+
+    inst = instrument.active()
+    with inst.phase("indicators"):
+        ...
+    inst.count("trades", n)
+    with inst.profile():          # cProfile just this block, if requested
+        simulate(...)
+
+By default active() is a shared no-op object whose methods return
+immediately (phase()/profile() hand back one reusable null context), so the
+hooks cost a function call when instrumentation is off. Instrumentation is
+turned on with `with instrument.session(...) as inst:` or enable(); the
+report is a JSON-serializable dict with nested phase timings, counters,
+allocation figures (with trace_alloc) and the path of the pstats dump.
+"""
+import contextlib
+import cProfile
+import json
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+
+class NullInstrumentation:
+    """Disabled instrumentation: every hook is a no-op."""
+
+    enabled = False
+    _null = contextlib.nullcontext()
+
+    def phase(self, name: str):
+        return self._null
+
+    def profile(self):
+        return self._null
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    def snapshot(self, label: str, top: int = 10) -> None:
+        pass
+
+    def report(self) -> dict:
+        return {}
+
+
+class Instrumentation(NullInstrumentation):
+    """Nested phase timers, thread-safe counters, allocation tracking and cProfile."""
+
+    enabled = True
+
+    def __init__(self, trace_alloc: bool = False, profile_path: Optional[str] = None):
+        self.trace_alloc = trace_alloc
+        self.profile_path = profile_path
+        self.phases: Dict[str, dict] = {}
+        self.counters: Dict[str, int] = {}
+        self.snapshots: Dict[str, List[dict]] = {}
+        self._stack: List[str] = []
+        self._lock = threading.Lock()
+        self._profiler: Optional[cProfile.Profile] = None
+        self._started_tracing = False
+        self._t0 = time.perf_counter()
+        if trace_alloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Time a (possibly nested) phase; nested names are joined with '/'."""
+        self._stack.append(name)
+        path = "/".join(self._stack)
+        mem0 = tracemalloc.get_traced_memory()[0] if self.trace_alloc else 0
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - t0
+            self._stack.pop()
+            rec = self.phases.setdefault(path, {"seconds": 0.0, "calls": 0})
+            rec["seconds"] += seconds
+            rec["calls"] += 1
+            if self.trace_alloc:
+                rec["alloc_net_kb"] = rec.get("alloc_net_kb", 0.0) + (tracemalloc.get_traced_memory()[0] - mem0) / 1024.0
+
+    @contextlib.contextmanager
+    def profile(self):
+        """cProfile the block (accumulated across calls) when a profile path is set."""
+        if self.profile_path is None:
+            yield
+            return
+        if self._profiler is None:
+            self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        try:
+            yield
+        finally:
+            self._profiler.disable()
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def snapshot(self, label: str, top: int = 10) -> None:
+        """Record the top allocation sites (requires trace_alloc)."""
+        if not self.trace_alloc:
+            return
+        stats = tracemalloc.take_snapshot().statistics("lineno")[:top]
+        self.snapshots[label] = [
+            {"where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "kb": s.size / 1024.0, "blocks": s.count}
+            for s in stats
+        ]
+
+    def close(self) -> None:
+        if self._profiler is not None:
+            self._profiler.dump_stats(self.profile_path)
+        if self._started_tracing:
+            self._memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def report(self) -> dict:
+        out = {
+            "wall_seconds": time.perf_counter() - self._t0,
+            "phases": {k: dict(v) for k, v in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+        if self.trace_alloc:
+            current, peak = getattr(self, "_memory", None) or tracemalloc.get_traced_memory()
+            out["memory"] = {"current_kb": current / 1024.0, "peak_kb": peak / 1024.0, "snapshots": self.snapshots}
+        if self.profile_path is not None:
+            out["profile"] = self.profile_path
+        return out
+
+
+NULL = NullInstrumentation()
+_active: NullInstrumentation = NULL
+
+
+def active() -> NullInstrumentation:
+    """The instrumentation in effect (the no-op NULL unless enabled)."""
+    return _active
+
+
+def enable(trace_alloc: bool = False, profile_path: Optional[str] = None) -> Instrumentation:
+    global _active
+    _active = Instrumentation(trace_alloc=trace_alloc, profile_path=profile_path)
+    return _active
+
+
+def disable() -> None:
+    global _active
+    if isinstance(_active, Instrumentation):
+        _active.close()
+    _active = NULL
+
+
+@contextlib.contextmanager
+def session(report_path: Optional[str] = None, trace_alloc: bool = False, profile_path: Optional[str] = None):
+    """Enable instrumentation for a block; the JSON report is written to report_path on exit."""
+    inst = enable(trace_alloc=trace_alloc, profile_path=profile_path)
+    try:
+        yield inst
+    finally:
+        disable()
+        if report_path:
+            with open(report_path, "w") as f:
+                json.dump(inst.report(), f, indent=2)
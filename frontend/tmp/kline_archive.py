@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Bulk kline backfill from Binance's public archive files.
+
+data.binance.vision publishes one zipped CSV per symbol, interval and month
+(and per day for the current month), each with a `.CHECKSUM` file holding its
+SHA-256:
+
+    data/spot/monthly/klines/BTCUSDT/1m/BTCUSDT-1m-2024-01.zip[.CHECKSUM]
+    data/spot/daily/klines/BTCUSDT/1m/BTCUSDT-1m-2024-02-05.zip[.CHECKSUM]
+
+ArchiveImporter reads that layout from a local directory or an HTTP mirror.
+Every file is verified against its checksum, decompressed as a stream and
+parsed in chunks straight into the KlineCache, so a month of 1m candles costs
+one download instead of 45 API pages. Months without a monthly file yet are
+read from the daily files. Timestamps are normalized to ms (the archive
+switched to microseconds in 2025).
+
+Files are imported outward from the range the cache already covers (older
+months newest first, newer months oldest first), so the covered range stays
+contiguous and is persisted after every batch. An interrupted import
+therefore resumes after the last committed file, and a month the cache
+already covers in part (the current one) only reads its missing days. Newer
+batches are appended to the cache columns in place; older ones are prepended
+with one rewrite, so their batches grow with the cache to keep the copying
+linear. Verified downloads from a mirror are kept until their batch is
+committed.
+
+Example:
+  python kline_archive.py --symbol BTCUSDT --interval 1m --start 2017-08-01 --source /mnt/binance-archive
+"""
+import argparse
+import hashlib
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import requests
+
+import instrument
+from bars import DAY_MS, to_ms
+from kline_cache import COLUMNS, INTERVAL_MS, Candles, KlineCache, concat_candles, default_cache
+
+ARCHIVE_URL = "https://data.binance.vision"
+
+# archive timestamps above this are in microseconds (ms values stay below it until the year 5138)
+MICROS_THRESHOLD = 10 ** 14
+
+CSV_COLUMNS = ("open_time", "open", "high", "low", "close", "volume", "close_time")
+
+
+# ------------------------------
+# Archive layout
+# ------------------------------
+
+def archive_file(symbol: str, interval: str, period: str) -> str:
+    """Path of the zip for a 'YYYY-MM' (monthly) or 'YYYY-MM-DD' (daily) period, relative to the root."""
+    kind = "monthly" if len(period) == 7 else "daily"
+    return f"data/spot/{kind}/klines/{symbol}/{interval}/{symbol}-{interval}-{period}.zip"
+
+
+def month_bounds(month: np.datetime64) -> Tuple[int, int]:
+    """[start_ms, end_ms) of a datetime64[M]."""
+    a = int(month.astype("datetime64[ms]").astype(np.int64))
+    b = int((month + 1).astype("datetime64[ms]").astype(np.int64))
+    return a, b
+
+
+def read_archive(path: str, chunk_rows: int = 500_000) -> Iterator[Candles]:
+    """Candles of one archive zip, decompressed and parsed `chunk_rows` at a time."""
+    with zipfile.ZipFile(path) as zf:
+        name = next(n for n in zf.namelist() if n.endswith(".csv"))
+        with zf.open(name) as f:
+            # newer files may start with a header line
+            header = not f.peek(1)[:1].isdigit()
+            reader = pd.read_csv(f, header=None, skiprows=1 if header else 0,
+                                 usecols=range(len(CSV_COLUMNS)), names=CSV_COLUMNS,
+                                 dtype={c: np.int64 if c.endswith("_time") else np.float64 for c in CSV_COLUMNS},
+                                 chunksize=chunk_rows)
+            for chunk in reader:
+                candles = {c: chunk[c].to_numpy() for c in COLUMNS}
+                if len(candles["open_time"]) and candles["open_time"][-1] >= MICROS_THRESHOLD:
+                    candles["open_time"] = candles["open_time"] // 1000
+                    candles["close_time"] = candles["close_time"] // 1000
+                yield candles
+
+
+def write_archive(root: str, symbol: str, interval: str, period: str, candles: Candles,
+                  micros: bool = False) -> str:
+    """Write candles as an archive zip plus .CHECKSUM under `root` (fixtures, local mirrors)."""
+    rel = archive_file(symbol, interval, period)
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    scale = 1000 if micros else 1
+    n = len(candles["open_time"])
+    frame = pd.DataFrame({
+        "open_time": candles["open_time"] * scale,
+        **{c: candles[c] for c in ("open", "high", "low", "close", "volume")},
+        "close_time": candles["close_time"] * scale + (scale - 1),
+        "quote_volume": candles["close"] * candles["volume"],
+        "count": np.zeros(n, dtype=np.int64),
+        "taker_buy_base": np.zeros(n), "taker_buy_quote": np.zeros(n), "ignore": np.zeros(n, dtype=np.int64),
+    })
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(os.path.basename(path)[:-4] + ".csv", frame.to_csv(header=False, index=False))
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    with open(path + ".CHECKSUM", "w") as f:
+        f.write(f"{digest}  {os.path.basename(path)}\n")
+    return path
+
+
+# ------------------------------
+# Sources
+# ------------------------------
+
+class ChecksumError(ValueError):
+    pass
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ArchiveSource:
+    """A local archive directory or an HTTP(S) mirror of data.binance.vision."""
+
+    def __init__(self, root: str = ARCHIVE_URL, download_dir: Optional[str] = None, timeout: float = 60.0):
+        self.root = root.rstrip("/")
+        self.remote = self.root.startswith(("http://", "https://"))
+        self.download_dir = download_dir
+        self.timeout = timeout
+        self.session = requests.Session() if self.remote else None
+
+    def _get(self, rel: str, dest: str) -> bool:
+        """Stream a remote file to dest; False if the mirror does not have it."""
+        r = self.session.get(f"{self.root}/{rel}", stream=True, timeout=self.timeout)
+        if r.status_code == 404:
+            return False
+        r.raise_for_status()
+        tmp = dest + ".part"
+        with open(tmp, "wb") as f:
+            for block in r.iter_content(1 << 20):
+                f.write(block)
+        os.replace(tmp, dest)
+        return True
+
+    def checksum(self, rel: str) -> Optional[str]:
+        if self.remote:
+            r = self.session.get(f"{self.root}/{rel}.CHECKSUM", timeout=self.timeout)
+            if r.status_code == 404:
+                return None
+            r.raise_for_status()
+            text = r.text
+        else:
+            path = os.path.join(self.root, rel + ".CHECKSUM")
+            if not os.path.exists(path):
+                return None
+            with open(path) as f:
+                text = f.read()
+        return text.split()[0].lower() if text.strip() else None
+
+    def fetch(self, rel: str, verify: bool = True) -> Optional[str]:
+        """Local path of a verified archive file, or None if the source does not have it."""
+        if self.remote:
+            local = os.path.join(self.download_dir, os.path.basename(rel))
+            expected = self.checksum(rel) if verify else None
+            if verify and expected is None:
+                return None  # every published file has a checksum
+            # a verified file left by an interrupted run is reused
+            if os.path.exists(local) and (not verify or sha256_file(local) == expected):
+                return local
+            if not self._get(rel, local):
+                return None
+        else:
+            local = os.path.join(self.root, rel)
+            if not os.path.exists(local):
+                return None
+            expected = self.checksum(rel) if verify else None
+            if verify and expected is None:
+                raise ChecksumError(f"Missing checksum for {rel}")
+        inst = instrument.active()
+        inst.count("archive_files")
+        inst.count("archive_bytes", os.path.getsize(local))
+        if verify:
+            actual = sha256_file(local)
+            if actual != expected:
+                if self.remote:
+                    os.remove(local)
+                raise ChecksumError(f"Checksum mismatch for {rel}: {actual} != {expected}")
+        return local
+
+
+# ------------------------------
+# Importer
+# ------------------------------
+
+class ArchiveImporter:
+    """Backfills a KlineCache from archive files, committing every `commit_rows` candles."""
+
+    def __init__(self, cache: Optional[KlineCache] = None, source: str = ARCHIVE_URL, verify: bool = True,
+                 workers: int = 4, commit_rows: int = 2_000_000, chunk_rows: int = 500_000):
+        self.cache = cache or default_cache()
+        download_dir = os.path.join(self.cache.root, ".archive")
+        self.source = ArchiveSource(source, download_dir=download_dir)
+        if self.source.remote:
+            os.makedirs(download_dir, exist_ok=True)
+        self.verify = verify
+        self.workers = workers
+        self.commit_rows = commit_rows
+        self.chunk_rows = chunk_rows
+
+    def _fetch_month(self, symbol: str, interval: str, month: np.datetime64, from_ms: int, end_ms: int,
+                     partial_ok: bool) -> Tuple[List[str], int, int, bool]:
+        """
+        (local files, start_ms, end_ms, complete) for one month from the day
+        of from_ms on: the monthly file, or else its daily files up to end_ms.
+        A month that starts before from_ms (the cache covers its first days)
+        reads the daily files of the missing days only, and falls back to the
+        monthly file if those are not published. With partial_ok a missing
+        day ends the month early (complete is False); otherwise the whole
+        month counts as missing.
+        """
+        a, b = month_bounds(month)
+        first = max(a, from_ms - from_ms % DAY_MS)
+        if first == a:
+            path = self.source.fetch(archive_file(symbol, interval, str(month)), self.verify)
+            if path is not None:
+                return [path], a, b, True
+        files, hi = [], first
+        days = np.arange(np.datetime64(first, "ms").astype("datetime64[D]"), (month + 1).astype("datetime64[D]"))
+        for day in days:
+            day_ms = int(day.astype("datetime64[ms]").astype(np.int64))
+            if day_ms > end_ms:
+                break
+            path = self.source.fetch(archive_file(symbol, interval, str(day)), self.verify)
+            if path is None:
+                if not files and first > a:
+                    path = self.source.fetch(archive_file(symbol, interval, str(month)), self.verify)
+                    if path is not None:
+                        return [path], a, b, True
+                return (files, first, hi, False) if partial_ok else ([], first, first, False)
+            files.append(path)
+            hi = day_ms + DAY_MS
+        return files, first, hi, True
+
+    def _commit(self, symbol: str, interval: str, parts: List[Candles], lo: int, hi: int,
+                files: List[str]) -> None:
+        """Add a batch to the cache and widen its covered range; then drop the batch's downloads."""
+        _, meta = self.cache.read(symbol, interval, mmap=True)
+        if meta is not None:
+            lo, hi = min(lo, int(meta["lo_ms"])), max(hi, int(meta["hi_ms"]))
+        # only the batch is sorted; extend() places it before or after the stored candles
+        self.cache.extend(symbol, interval, concat_candles(*parts),
+                          {"lo_ms": lo, "hi_ms": hi, "symbol": symbol, "interval": interval})
+        if self.source.remote:
+            for path in files:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _run(self, symbol: str, interval: str, months: List[np.datetime64], from_ms: int, end_ms: int,
+             forward: bool) -> int:
+        """Import months in the given order until one is missing; returns the rows read."""
+        rows = pending = 0
+        parts: List[Candles] = []
+        files: List[str] = []
+        lo = hi = None
+        cached, _ = self.cache.read(symbol, interval, mmap=True)
+        stored = len(cached["open_time"])
+        ahead = max(1, self.workers) * 2
+        with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="archive") as pool:
+            # fetch and verify a few months ahead while the current one is parsed
+            futures = [pool.submit(self._fetch_month, symbol, interval, m, from_ms, end_ms, forward)
+                       for m in months[:ahead]]
+            try:
+                for k in range(len(months)):
+                    if k + ahead < len(months):
+                        futures.append(pool.submit(self._fetch_month, symbol, interval, months[k + ahead],
+                                                   from_ms, end_ms, forward))
+                    got, a, b, complete = futures[k].result()
+                    for path in got:
+                        for candles in read_archive(path, self.chunk_rows):
+                            parts.append(candles)
+                            pending += len(candles["open_time"])
+                    if got:
+                        files.extend(got)
+                        lo = a if lo is None else min(lo, a)
+                        hi = b if hi is None else max(hi, b)
+                    # a prepend rewrites the stored columns: older batches at least match them in size
+                    if pending >= (self.commit_rows if forward else max(self.commit_rows, stored)):
+                        self._commit(symbol, interval, parts, lo, hi, files)
+                        rows += pending
+                        stored += pending
+                        parts, files, pending, lo, hi = [], [], 0, None, None
+                    if not complete:
+                        break
+            finally:
+                for fut in futures:
+                    fut.cancel()
+        if parts:
+            self._commit(symbol, interval, parts, lo, hi, files)
+            rows += pending
+        return rows
+
+    def import_range(self, symbol: str, interval: str, start_ms: int, end_ms: int,
+                     now_ms: Optional[int] = None) -> dict:
+        """
+        Backfill [start_ms, end_ms] (extended to touch the range the cache
+        already covers). Returns the rows imported and the covered range.
+        """
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"Interval {interval!r} cannot be cached")
+        symbol = symbol.upper()
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        # only finished days are published
+        end_ms = min(end_ms, now_ms - now_ms % DAY_MS - 1)
+        _, meta = self.cache.read(symbol, interval, mmap=True)
+        if meta is not None:
+            lo, hi = int(meta["lo_ms"]), int(meta["hi_ms"])
+            # never leave a hole between the archive range and the cached one
+            if end_ms < lo - 1:
+                end_ms = lo - 1
+            if start_ms > hi:
+                start_ms = hi
+        if end_ms < start_ms:
+            return {"rows": 0, **self._coverage(symbol, interval)}
+
+        months = list(np.arange(np.datetime64(start_ms, "ms").astype("datetime64[M]"),
+                                np.datetime64(end_ms, "ms").astype("datetime64[M]") + 1))
+        if meta is None:
+            older, newer = [], months
+        else:
+            older = [m for m in months if month_bounds(m)[0] < lo][::-1]
+            newer = [m for m in months if month_bounds(m)[1] > hi and month_bounds(m)[0] >= lo]
+        t0 = time.perf_counter()
+        rows = 0
+        if older:
+            rows += self._run(symbol, interval, older, 0, end_ms, forward=False)
+        if newer:
+            rows += self._run(symbol, interval, newer, 0 if meta is None else hi, end_ms, forward=True)
+        instrument.active().count("archive_rows", rows)
+        return {"rows": rows, "seconds": time.perf_counter() - t0, **self._coverage(symbol, interval)}
+
+    def _coverage(self, symbol: str, interval: str) -> dict:
+        _, meta = self.cache.read(symbol, interval, mmap=True)
+        if meta is None:
+            return {"lo_ms": None, "hi_ms": None}
+        return {"lo_ms": int(meta["lo_ms"]), "hi_ms": int(meta["hi_ms"])}
+
+
+# ------------------------------
+# CLI
+# ------------------------------
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Backfill the kline cache from Binance archive files.")
+    p.add_argument("--symbol", type=str, default="BTCUSDT")
+    p.add_argument("--interval", type=str, default="1m")
+    p.add_argument("--start", type=str, required=True, help="First day to import (YYYY-MM-DD)")
+    p.add_argument("--end", type=str, default=None, help="Last day to import (default: yesterday)")
+    p.add_argument("--source", type=str, default=ARCHIVE_URL, help="Archive directory or mirror URL")
+    p.add_argument("--cache-dir", type=str, default=None, help="Kline cache directory (default: KLINE_CACHE_DIR)")
+    p.add_argument("--workers", type=int, default=4, help="Files fetched and verified in parallel")
+    p.add_argument("--no-verify", action="store_true", help="Skip the SHA-256 checks.")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    cache = KlineCache(args.cache_dir) if args.cache_dir else default_cache()
+    importer = ArchiveImporter(cache, args.source, verify=not args.no_verify, workers=args.workers)
+    end_ms = to_ms(args.end) + DAY_MS - 1 if args.end else int(time.time() * 1000)
+    got = importer.import_range(args.symbol, args.interval, to_ms(args.start), end_ms)
+    if got["lo_ms"] is None:
+        print("Nothing imported.")
+        return
+    covered = f"{pd.Timestamp(got['lo_ms'], unit='ms')} .. {pd.Timestamp(got['hi_ms'], unit='ms')}"
+    print(f"Imported {got['rows']:,} candles in {got.get('seconds', 0.0):.2f}s; cache covers {covered}")
+
+
+if __name__ == "__main__":
+    main()
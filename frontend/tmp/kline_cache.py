@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk cache for Binance klines.
+
+Each (symbol, interval) pair is stored as one directory of NumPy column files:
+
+    <cache_dir>/<SYMBOL>/<interval>/open_time.npy   int64 epoch ms
+                                    close_time.npy  int64 epoch ms
+                                    open.npy ... volume.npy  float64
+                                    meta.json       covered open_time range
+
+Only closed candles are written, so a cached candle is never downloaded twice.
+A request only hits the network for the head/tail ranges that the cache does
+not cover yet (plus the still-open candle, if the range reaches "now").
+"""
+import datetime as dt
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import requests
+
+import instrument
+from bars import Bars
+
+# ------------------------------
+# Binance candle downloader
+# ------------------------------
+BINANCE_URL = "https://api.binance.com/api/v3/klines"
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "KLINE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "klines"),
+)
+
+# Fixed-length Binance intervals (1M is calendar based and cannot be cached by range)
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000, "3d": 259_200_000,
+    "1w": 604_800_000,
+}
+
+INT_COLUMNS = ("open_time", "close_time")
+FLOAT_COLUMNS = ("open", "high", "low", "close", "volume")
+COLUMNS = INT_COLUMNS + FLOAT_COLUMNS
+
+Candles = Dict[str, np.ndarray]
+
+
+def empty_candles() -> Candles:
+    out = {c: np.empty(0, dtype=np.int64) for c in INT_COLUMNS}
+    out.update({c: np.empty(0, dtype=np.float64) for c in FLOAT_COLUMNS})
+    return out
+
+
+def parse_klines(data: list) -> Candles:
+    """Convert raw /api/v3/klines rows into int64/float64 column arrays."""
+    if not data:
+        return empty_candles()
+    # Binance kline fields
+    # 0 open time, 1 open, 2 high, 3 low, 4 close, 5 volume, 6 close time, ...
+    return {
+        "open_time": np.fromiter((row[0] for row in data), dtype=np.int64, count=len(data)),
+        "close_time": np.fromiter((row[6] for row in data), dtype=np.int64, count=len(data)),
+        "open": np.fromiter((row[1] for row in data), dtype=np.float64, count=len(data)),
+        "high": np.fromiter((row[2] for row in data), dtype=np.float64, count=len(data)),
+        "low": np.fromiter((row[3] for row in data), dtype=np.float64, count=len(data)),
+        "close": np.fromiter((row[4] for row in data), dtype=np.float64, count=len(data)),
+        "volume": np.fromiter((row[5] for row in data), dtype=np.float64, count=len(data)),
+    }
+
+
+def concat_candles(*parts: Candles) -> Candles:
+    """Concatenate candle chunks, sort by open_time and drop duplicate candles."""
+    parts = [p for p in parts if len(p["open_time"])]
+    if not parts:
+        return empty_candles()
+    merged = {c: np.concatenate([p[c] for p in parts]) for c in COLUMNS}
+    # keep the last occurrence of each open_time (newer downloads win)
+    order = np.argsort(merged["open_time"], kind="stable")
+    ot = merged["open_time"][order]
+    keep = np.ones(len(ot), dtype=bool)
+    keep[:-1] = ot[1:] != ot[:-1]
+    idx = order[keep]
+    return {c: np.ascontiguousarray(merged[c][idx]) for c in COLUMNS}
+
+
+def slice_candles(candles: Candles, start_ms: int, end_ms: int) -> Candles:
+    """Rows whose open_time lies in [start_ms, end_ms] (Binance startTime/endTime semantics)."""
+    ot = candles["open_time"]
+    lo = int(np.searchsorted(ot, start_ms, side="left"))
+    hi = int(np.searchsorted(ot, end_ms, side="right"))
+    return {c: candles[c][lo:hi] for c in COLUMNS}
+
+
+def _append_npy(path: str, values: np.ndarray) -> bool:
+    """
+    Append `values` to a 1-d .npy file in place and update the shape in its
+    header. False (file untouched) if the dtype differs or the longer shape
+    does not fit in the header padding; the caller then rewrites the file.
+    """
+    if not len(values):
+        return True
+    with open(path, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+        elif version == (2, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+        else:
+            return False
+        start = f.tell()
+        if len(shape) != 1 or dtype != values.dtype:
+            return False
+        header = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": fortran,
+                       "shape": (shape[0] + len(values),)})
+        size = start - 8 - (2 if version == (1, 0) else 4)
+        if len(header) + 1 > size:
+            return False
+        # data first, header last: an interrupted append leaves the old shape readable
+        f.seek(start + shape[0] * dtype.itemsize)
+        f.write(np.ascontiguousarray(values).tobytes())
+        f.truncate()
+        f.seek(start - size)
+        f.write((header.ljust(size - 1) + "\n").encode("latin1"))
+    return True
+
+
+def download_klines(symbol: str, interval: str, start_ms: int, end_ms: int,
+                    session: Optional[requests.Session] = None) -> Candles:
+    """Fetch klines in [start_ms, end_ms] from Binance with pagination (limit 1000)."""
+    limit = 1000
+    get = session.get if session is not None else requests.get
+    chunks = []
+    while start_ms <= end_ms:
+        params = dict(symbol=symbol, interval=interval, limit=limit, startTime=start_ms, endTime=end_ms)
+        r = get(BINANCE_URL, params=params, timeout=30)
+        r.raise_for_status()
+        inst = instrument.active()
+        inst.count("http_pages")
+        inst.count("http_bytes", len(r.content))
+        data = r.json()
+        if not data:
+            break
+        chunks.append(parse_klines(data))
+        # advance: move cursor one ms after last close
+        start_ms = int(data[-1][6]) + 1
+        time.sleep(0.2)  # polite pause
+    return concat_candles(*chunks)
+
+
+# ------------------------------
+# Cache
+# ------------------------------
+
+class KlineCache:
+    """Column-per-file candle store with incremental head/tail gap fill."""
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, offline: bool = False, downloader=None):
+        self.root = root
+        self.offline = offline
+        # callable(symbol, interval, start_ms, end_ms) -> Candles
+        self.downloader = downloader or download_klines
+
+    def _dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, symbol.upper(), interval)
+
+    def read(self, symbol: str, interval: str, mmap: bool = False) -> Tuple[Candles, Optional[dict]]:
+        """Return (candles, meta); meta holds the covered open_time range [lo_ms, hi_ms)."""
+        path = self._dir(symbol, interval)
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return empty_candles(), None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        candles = {c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode=mode) for c in COLUMNS}
+        return candles, meta
+
+    def write(self, symbol: str, interval: str, candles: Candles, meta: dict) -> None:
+        """Atomically replace the stored columns; meta.json is written last."""
+        path = self._dir(symbol, interval)
+        os.makedirs(path, exist_ok=True)
+        for c in COLUMNS:
+            tmp = os.path.join(path, f".{c}.tmp.npy")
+            np.save(tmp, candles[c])
+            os.replace(tmp, os.path.join(path, f"{c}.npy"))
+        self._write_meta(path, meta)
+
+    @staticmethod
+    def _write_meta(path: str, meta: dict) -> None:
+        tmp = os.path.join(path, ".meta.tmp.json")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    def extend(self, symbol: str, interval: str, candles: Candles, meta: dict) -> None:
+        """
+        Add sorted candles that lie before and/or after the stored ones
+        (candles inside the stored open_time span are dropped). Newer candles
+        are appended to the column files in place; older ones cost one
+        rewrite of the columns, without re-sorting them.
+        """
+        cached, old_meta = self.read(symbol, interval, mmap=True)
+        ot = cached["open_time"]
+        if old_meta is None or not len(ot):
+            self.write(symbol, interval, candles, meta)
+            return
+        new_ot = candles["open_time"]
+        older = {c: candles[c][new_ot < ot[0]] for c in COLUMNS}
+        newer = {c: candles[c][new_ot > ot[-1]] for c in COLUMNS}
+        path = self._dir(symbol, interval)
+        if len(older["open_time"]) or not all(_append_npy(os.path.join(path, f"{c}.npy"), newer[c])
+                                              for c in COLUMNS):
+            self.write(symbol, interval, {c: np.concatenate((older[c], cached[c], newer[c])) for c in COLUMNS},
+                       meta)
+            return
+        self._write_meta(path, meta)
+
+    def sync(self, symbol: str, interval: str, start_ms: int, end_ms: int,
+             now_ms: Optional[int] = None, downloader=None) -> Candles:
+        """
+        Download and persist whatever part of [start_ms, end_ms] the cache does
+        not cover yet. Returns the candles of that range that are still open
+        (never persisted), so the caller can append them.
+        """
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"Interval {interval!r} cannot be cached")
+        live = empty_candles()
+        if self.offline:
+            return live
+        downloader = downloader or self.downloader
+        iv = INTERVAL_MS[interval]
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        # every candle opening before this instant has closed
+        closed_hi = now_ms - iv + 1
+
+        _, meta = self.read(symbol, interval, mmap=True)
+        fetched = []
+        if meta is None:
+            lo, hi = start_ms, start_ms
+            ranges = [(start_ms, end_ms)]
+        else:
+            lo, hi = int(meta["lo_ms"]), int(meta["hi_ms"])
+            ranges = []
+            if start_ms < lo:
+                ranges.append((start_ms, lo - 1))
+            if end_ms >= hi:
+                ranges.append((hi, end_ms))
+
+        for a, b in ranges:
+            got = downloader(symbol, interval, a, b)
+            closed = got["close_time"] < now_ms
+            fetched.append({c: got[c][closed] for c in COLUMNS})
+            if not closed.all():
+                live = concat_candles(live, {c: got[c][~closed] for c in COLUMNS})
+            lo = min(lo, a)
+            hi = max(hi, min(b + 1, closed_hi))
+
+        if fetched:
+            cached, _ = self.read(symbol, interval)
+            cached = concat_candles(cached, *fetched)
+            self.write(symbol, interval, cached, {"lo_ms": lo, "hi_ms": hi, "symbol": symbol, "interval": interval})
+        return live
+
+    def get(self, symbol: str, interval: str, start_ms: int, end_ms: int,
+            now_ms: Optional[int] = None, downloader=None) -> Candles:
+        """
+        Return candles with open_time in [start_ms, end_ms], downloading only
+        what the cache does not cover. Candles that are still open are returned
+        but never persisted.
+        """
+        live = self.sync(symbol, interval, start_ms, end_ms, now_ms, downloader)
+        cached, _ = self.read(symbol, interval)
+        return slice_candles(concat_candles(cached, live) if len(live["open_time"]) else cached, start_ms, end_ms)
+
+    def iter_candles(self, symbol: str, interval: str, start_ms: int, end_ms: int,
+                     chunk_rows: int = 100_000, now_ms: Optional[int] = None) -> Iterator[Candles]:
+        """
+        get() as a stream of chunks of at most `chunk_rows` candles. The range is
+        located by binary search on the memory-mapped open_time column, and each
+        chunk is read from the column files with a positioned read, so memory
+        stays at one chunk however long the range is.
+        """
+        live = self.sync(symbol, interval, start_ms, end_ms, now_ms)
+        cached, _ = self.read(symbol, interval, mmap=True)
+        ot = cached["open_time"]
+        lo = int(np.searchsorted(ot, start_ms, side="left"))
+        hi = int(np.searchsorted(ot, end_ms, side="right"))
+        path = self._dir(symbol, interval)
+        last = None
+        for a in range(lo, hi, chunk_rows):
+            b = min(a + chunk_rows, hi)
+            # plain reads rather than slices of the maps, which would stay resident
+            chunk = {c: np.fromfile(os.path.join(path, f"{c}.npy"), dtype=cached[c].dtype, count=b - a,
+                                    offset=cached[c].offset + a * cached[c].itemsize)
+                     for c in COLUMNS}
+            last = int(chunk["open_time"][-1])
+            yield chunk
+        live = slice_candles(live, start_ms, end_ms)
+        if len(live["open_time"]):
+            newer = live["open_time"] > (last if last is not None else start_ms - 1)
+            yield {c: live[c][newer] for c in COLUMNS}
+
+    def get_many(self, symbols: Iterable[str], interval: str, start_ms: int, end_ms: int,
+                 now_ms: Optional[int] = None) -> Dict[str, Candles]:
+        """get() for several symbols; their missing ranges are downloaded in parallel."""
+        symbols = list(symbols)
+        with ThreadPoolExecutor(max_workers=max(1, len(symbols))) as pool:
+            futures = {s: pool.submit(self.get, s, interval, start_ms, end_ms, now_ms) for s in symbols}
+            return {s: f.result() for s, f in futures.items()}
+
+
+_default_cache: Optional[KlineCache] = None
+
+
+def default_cache() -> KlineCache:
+    global _default_cache
+    if _default_cache is None:
+        from kline_download import KlineDownloader  # imports this module
+        _default_cache = KlineCache(offline=os.environ.get("KLINE_CACHE_OFFLINE", "") == "1",
+                                    downloader=KlineDownloader())
+    return _default_cache
+
+
+def parse_bars(symbol: str, data: list) -> Bars:
+    """Raw /api/v3/klines rows straight into a Bars container."""
+    return Bars.from_columns(symbol, parse_klines(data))
+
+
+def fetch_binance_bars(symbol: str, interval: str, start: dt.datetime, end: dt.datetime,
+                       cache: Optional[KlineCache] = None) -> Bars:
+    """OHLCV bars with open_time in [start, end] through the on-disk cache."""
+    start_ms = int(start.timestamp() * 1000)
+    end_ms   = int(end.timestamp()   * 1000)
+    candles = (cache or default_cache()).get(symbol, interval, start_ms, end_ms)
+    if not len(candles["open_time"]):
+        raise RuntimeError(f"No data returned for {symbol}")
+    return Bars.from_columns(symbol, candles)
+
+
+def fetch_binance_bars_many(symbols: Iterable[str], interval: str, start: dt.datetime, end: dt.datetime,
+                            cache: Optional[KlineCache] = None) -> Dict[str, Bars]:
+    """fetch_binance_bars for several symbols at once, downloading them in parallel."""
+    start_ms = int(start.timestamp() * 1000)
+    end_ms   = int(end.timestamp()   * 1000)
+    got = (cache or default_cache()).get_many(symbols, interval, start_ms, end_ms)
+    for s, c in got.items():
+        if not len(c["open_time"]):
+            raise RuntimeError(f"No data returned for {s}")
+    return {s: Bars.from_columns(s, c) for s, c in got.items()}
+
+
+def fetch_binance_klines(symbol: str, interval: str, start: dt.datetime, end: dt.datetime,
+                         cache: Optional[KlineCache] = None) -> pd.DataFrame:
+    """Fetch closes through the on-disk cache; returns columns time (close time, UTC) and close."""
+    return fetch_binance_bars(symbol, interval, start, end, cache).frame()
+
+
+def fetch_binance_klines_many(symbols: Iterable[str], interval: str, start: dt.datetime, end: dt.datetime,
+                              cache: Optional[KlineCache] = None) -> Dict[str, pd.DataFrame]:
+    """fetch_binance_klines for several symbols at once, downloading them in parallel."""
+    return {s: b.frame() for s, b in fetch_binance_bars_many(symbols, interval, start, end, cache).items()}
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Concurrent, connection-pooled Binance kline downloader.
+
+Instead of walking the history one page at a time, every page window
+(limit * interval ms) is computed up front and the windows of all requested
+symbols are fetched in parallel over one pooled requests.Session. Pages are
+reassembled in order per symbol. `base_url` can point at a local stub server
+that mimics /api/v3/klines.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import instrument
+from kline_cache import BINANCE_URL, INTERVAL_MS, Candles, concat_candles, download_klines, parse_klines
+
+PAGE_LIMIT = 1000
+
+
+def page_windows(interval: str, start_ms: int, end_ms: int, limit: int = PAGE_LIMIT) -> List[Tuple[int, int]]:
+    """Split [start_ms, end_ms] into inclusive open_time windows holding at most `limit` candles."""
+    step = INTERVAL_MS[interval] * limit
+    windows = []
+    a = start_ms
+    while a <= end_ms:
+        b = min(a + step - 1, end_ms)
+        windows.append((a, b))
+        a = b + 1
+    return windows
+
+
+class KlineDownloader:
+    """Thread-pooled page fetcher; usable as the `downloader` of a KlineCache."""
+
+    def __init__(self, max_workers: int = 8, base_url: str = BINANCE_URL, timeout: float = 30.0,
+                 retries: int = 5, session: Optional[requests.Session] = None):
+        self.max_workers = max_workers
+        self.base_url = base_url
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            # 429 asks to back off; 418 means the IP is already banned, and retrying only extends the ban
+            retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                          respect_retry_after_header=True, allowed_methods=("GET",))
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="klines")
+            return self._pool
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+        self.session.close()
+
+    def __enter__(self) -> "KlineDownloader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def fetch_page(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> Candles:
+        params = dict(symbol=symbol, interval=interval, limit=PAGE_LIMIT, startTime=start_ms, endTime=end_ms)
+        r = self.session.get(self.base_url, params=params, timeout=self.timeout)
+        r.raise_for_status()
+        inst = instrument.active()
+        inst.count("http_pages")
+        inst.count("http_bytes", len(r.content))
+        return parse_klines(r.json())
+
+    def fetch_many(self, symbols: Iterable[str], interval: str, start_ms: int, end_ms: int) -> Dict[str, Candles]:
+        """Fetch [start_ms, end_ms] for several symbols with all pages in flight at once."""
+        symbols = list(symbols)
+        if interval not in INTERVAL_MS:
+            # calendar intervals (1M) cannot be windowed up front
+            return {s: download_klines(s, interval, start_ms, end_ms, session=self.session) for s in symbols}
+        windows = page_windows(interval, start_ms, end_ms)
+        pool = self._executor()
+        futures = {s: [pool.submit(self.fetch_page, s, interval, a, b) for a, b in windows] for s in symbols}
+        return {s: concat_candles(*[f.result() for f in fs]) for s, fs in futures.items()}
+
+    def __call__(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> Candles:
+        return self.fetch_many([symbol], interval, start_ms, end_ms)[symbol]
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Incremental live-signal mode for the adaptive DCA + bands strategy.
+
+The whole strategy state is a handful of numbers: the AdaptiveSigmaStream
+state (the rolling window of squared returns and its sum, the EWMA variance
+and its warmup buffer, the running peak, the previous close) and the USDC/BTC
+holdings. LiveStrategy keeps exactly that, advances it one closed candle at a
+time in O(1) with step(), and saves/loads it as a small JSON checkpoint. A
+daily job therefore only feeds the candles closed since the last checkpoint
+instead of replaying the history.
+
+The indicators run through the same AdaptiveSigmaStream(exact=True) as
+run_backtest_stream, so a full replay reproduces the run_backtest results
+exactly and the live and backtest signals cannot drift apart.
+
+Example (first run seeds the checkpoint, later runs only catch up):
+  python live_signal.py --checkpoint state.json --initial-capital 10000 --start 2024-01-01
+  python live_signal.py --checkpoint state.json
+"""
+import argparse
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from dca_engine import SIDE_SELL, adaptive_trade
+from indicators import PERIODS_PER_YEAR_DAILY, AdaptiveSigmaStream
+from kline_cache import fetch_binance_bars
+from price_store import PriceStore
+
+CHECKPOINT_VERSION = 2
+
+
+@dataclass
+class LiveParams:
+    """run_backtest tunables that the incremental state depends on."""
+    lookback_days: int = 30
+    ewma_lambda_daily: float = 0.94
+    winsorize_abs_ret: float = 0.20
+    base_dca_usdc: float = 50.0
+    target_btc_weight: float = 0.70
+    band_delta: float = 0.10
+    k_kicker: float = 0.05
+    cmax_mult: float = 3.0
+    buffer_mult: float = 9.0
+    min_trade_usd: float = 5.0
+    threshold_mode: bool = False
+    rebalance_cap_frac: float = 0.25
+
+
+@dataclass
+class LiveState:
+    usdc: float
+    btc: float = 0.0
+    bars: int = 0
+    start_ms: Optional[int] = None        # first candle requested when the checkpoint was created
+    last_time_ms: Optional[int] = None    # close time of the last processed candle
+    indicators: Optional[dict] = None     # AdaptiveSigmaStream.state()
+
+
+@dataclass
+class Signal:
+    """Outcome of one candle: the trade to make (side 0 = hold) and the inputs behind it."""
+    time_ms: int
+    price: float
+    side: int
+    amount: float
+    usd_value: float
+    sigma: float
+    drawdown: float
+    usdc: float
+    btc: float
+
+    @property
+    def nav(self) -> float:
+        return self.usdc + self.btc * self.price
+
+    def describe(self) -> str:
+        date = pd.Timestamp(self.time_ms, unit="ms", tz="UTC").strftime("%Y-%m-%d")
+        action = "HOLD" if self.side == 0 else ("SELL" if self.side == SIDE_SELL else "BUY")
+        return (f"{date}, {action}, BTC, {self.amount:.8f}, {self.price:.2f}, {self.usd_value:.2f}, "
+                f"nav {self.nav:.2f}, sigma {self.sigma:.4f}, dd {self.drawdown:.4f}")
+
+
+class LiveStrategy:
+    """Stateful adaptive DCA: step() one closed candle at a time, checkpoint in between."""
+
+    def __init__(self, params: LiveParams, state: LiveState):
+        self.params = params
+        self.state = state
+        if state.indicators is None:
+            self._sigma = AdaptiveSigmaStream(params.lookback_days, params.ewma_lambda_daily,
+                                              params.winsorize_abs_ret, PERIODS_PER_YEAR_DAILY, exact=True)
+        else:
+            self._sigma = AdaptiveSigmaStream.from_state(state.indicators)
+
+    @classmethod
+    def new(cls, initial_capital_usdc: float, params: Optional[LiveParams] = None,
+            start_ms: Optional[int] = None) -> "LiveStrategy":
+        return cls(params or LiveParams(), LiveState(usdc=float(initial_capital_usdc), start_ms=start_ms))
+
+    # ------------------------------
+    # Incremental update
+    # ------------------------------
+
+    def step(self, close: float, time_ms: int) -> Signal:
+        """Advance one closed candle and apply (assume filled) the resulting trade."""
+        s, p = self.state, self.params
+        if s.last_time_ms is not None and time_ms <= s.last_time_ms:
+            raise ValueError(f"Candle {time_ms} is not newer than the checkpoint ({s.last_time_ms})")
+        price = float(close)
+        sigma, drawdown = self._sigma.update(np.array([price]))
+        sigma, drawdown = float(sigma[0]), float(drawdown[0])
+        trade = adaptive_trade(
+            price, sigma, drawdown, s.usdc, s.btc,
+            base_dca_usdc=p.base_dca_usdc,
+            target_btc_weight=p.target_btc_weight,
+            band_delta=p.band_delta,
+            k_kicker=p.k_kicker,
+            cmax_mult=p.cmax_mult,
+            buffer_mult=p.buffer_mult,
+            min_trade_usd=p.min_trade_usd,
+            threshold_mode=p.threshold_mode,
+            rebalance_cap_frac=p.rebalance_cap_frac,
+        )
+        side, amount, usd = trade if trade is not None else (0, 0.0, 0.0)
+        if side == SIDE_SELL:
+            s.btc -= amount
+            s.usdc += usd
+        elif side:
+            s.btc += amount
+            s.usdc -= usd
+        s.bars += 1
+        s.last_time_ms = int(time_ms)
+        return Signal(int(time_ms), price, side, amount, usd, sigma, drawdown, s.usdc, s.btc)
+
+    def catch_up(self, times_ms: Sequence[int], closes: Sequence[float]) -> List[Signal]:
+        """step() through the candles newer than the checkpoint (older ones are skipped)."""
+        times_ms = np.asarray(times_ms, dtype=np.int64)
+        closes = np.asarray(closes, dtype=np.float64)
+        lo = 0
+        if self.state.last_time_ms is not None:
+            lo = int(np.searchsorted(times_ms, self.state.last_time_ms, side="right"))
+        return [self.step(c, t) for t, c in zip(times_ms[lo:].tolist(), closes[lo:].tolist())]
+
+    # ------------------------------
+    # Checkpoints
+    # ------------------------------
+
+    def to_dict(self) -> dict:
+        self.state.indicators = self._sigma.state()
+        return {"version": CHECKPOINT_VERSION, "params": asdict(self.params), "state": asdict(self.state)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LiveStrategy":
+        version = data.get("version")
+        if version not in (1, CHECKPOINT_VERSION):
+            raise ValueError(f"Unsupported checkpoint version {version!r}")
+        known = {f.name for f in fields(LiveParams)}
+        params = LiveParams(**{k: v for k, v in data["params"].items() if k in known})
+        state = data["state"] if version == CHECKPOINT_VERSION else _state_from_v1(params, data["state"])
+        return cls(params, LiveState(**state))
+
+    def save(self, path: str) -> None:
+        """Atomically write the checkpoint (floats round-trip exactly through JSON)."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LiveStrategy":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def _state_from_v1(params: LiveParams, old: dict) -> dict:
+    """Version 1 kept the indicator fields inline; move them into an AdaptiveSigmaStream state."""
+    sigma = AdaptiveSigmaStream(params.lookback_days, params.ewma_lambda_daily, params.winsorize_abs_ret,
+                                PERIODS_PER_YEAR_DAILY, exact=True).state()
+    if old["prev_close"] is not None:
+        sigma.update(prev_close=old["prev_close"], peak=old["running_peak"], ewma=old["ewma_sigma2"],
+                     sum_r2=old["sum_r2"], buf=old["r2_window"], warm=old["warmup"],
+                     seeded=len(old["warmup"]) >= min(10, params.lookback_days // 3))
+    return {"usdc": old["usdc"], "btc": old["btc"], "bars": old["bars"],
+            "last_time_ms": old["last_time_ms"], "indicators": sigma}
+
+
+# ------------------------------
+# CLI
+# ------------------------------
+
+def closed_candles(start: pd.Timestamp, store: Optional[PriceStore] = None):
+    """(close_time_ms, close) of every daily candle closed since `start`."""
+    now_ms = int(time.time() * 1000)
+    end = pd.Timestamp(now_ms, unit="ms", tz="UTC")
+    if store is not None:
+        bars = store.bars("BTCUSDT", start, end)
+    else:
+        bars = fetch_binance_bars("BTCUSDT", "1d", start, end)
+    keep = bars.close_time < now_ms
+    return bars.close_time[keep], np.asarray(bars.close, dtype=np.float64)[keep]
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Advance the adaptive DCA strategy from its last checkpoint.")
+    p.add_argument("--checkpoint", type=str, required=True, help="Checkpoint JSON (created if missing)")
+    p.add_argument("--initial-capital", type=float, default=None, help="Initial USDC capital for a new checkpoint")
+    p.add_argument("--start", type=str, default=None, help="First candle date (YYYY-MM-DD) for a new checkpoint")
+    for f in fields(LiveParams):
+        flag = "--" + f.name.replace("_", "-")
+        if f.type is bool:
+            p.add_argument(flag, action="store_true", help="New checkpoints only")
+        else:
+            p.add_argument(flag, type=type(f.default), default=f.default, help=f"New checkpoints only (default {f.default})")
+    p.add_argument("--offline", action="store_true", help="Use the bundled public/data daily closes instead of Binance.")
+    p.add_argument("--dry-run", action="store_true", help="Do not write the checkpoint back.")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    if os.path.exists(args.checkpoint):
+        strat = LiveStrategy.load(args.checkpoint)
+        if strat.state.last_time_ms is not None:
+            start = pd.Timestamp(strat.state.last_time_ms + 1, unit="ms", tz="UTC")
+        elif strat.state.start_ms is not None:
+            # nothing processed yet (e.g. --start in the future): retry from the original start
+            start = pd.Timestamp(strat.state.start_ms, unit="ms", tz="UTC")
+        else:
+            raise SystemExit(f"{args.checkpoint} has no processed candle and no start date.")
+    else:
+        if args.initial_capital is None or args.start is None:
+            raise SystemExit("A new checkpoint needs --initial-capital and --start.")
+        params = LiveParams(**{f.name: getattr(args, f.name) for f in fields(LiveParams)})
+        start = pd.Timestamp(args.start, tz="UTC")
+        strat = LiveStrategy.new(args.initial_capital, params, start_ms=int(start.value // 1_000_000))
+
+    times, closes = closed_candles(start, PriceStore() if args.offline else None)
+    t0 = time.perf_counter()
+    signals = strat.catch_up(times, closes)
+    elapsed = time.perf_counter() - t0
+
+    trades = [s for s in signals if s.side]
+    print(f"Processed {len(signals)} new candle(s) in {elapsed * 1e6:.0f} µs; {len(trades)} trade(s).")
+    for s in trades[-10:]:
+        print(s.describe())
+    if signals:
+        print(f"Latest: {signals[-1].describe()}")
+    st = strat.state
+    print(f"Holdings: {st.usdc:.2f} USDC, {st.btc:.8f} BTC after {st.bars} candles")
+    if not args.dry_run:
+        strat.save(args.checkpoint)
+
+
+if __name__ == "__main__":
+    main()
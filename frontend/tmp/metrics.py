@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Performance metrics for many equity curves at once.
+
+Every function takes curves with time along `axis` (default: the last axis,
+i.e. a runs x days array; pass axis=0 for the (T, N) arrays of the batch
+engines) and returns one value per curve, in one vectorized pass. The
+formulas follow the web simulator:
+
+- daily returns: curr / prev - 1, with 0 where either value is not finite or
+  prev is 0 (stats.ts computeReturnsFromValues);
+- Sharpe: mean / sample std of the daily returns, times sqrt(365);
+- Sortino: mean of all returns / sample std of the negative returns (taken
+  around their own mean), times sqrt(365);
+- CAGR: over 365.2425-day years, annualized linearly under one year
+  (calculateCAGR in the strategy files);
+- max drawdown: lowest value / running peak - 1.
+
+Example:
+    m = summarize(nav, days=1826, initial=10_000.0, axis=0)
+    best = np.argsort(m["Sharpe"])[::-1][:10]
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+PERIODS_PER_YEAR = 365
+DAYS_PER_YEAR = 365.2425
+
+
+def _time_last(values: np.ndarray, axis: int) -> np.ndarray:
+    return np.moveaxis(np.asarray(values, dtype=np.float64), axis, -1)
+
+
+# ------------------------------
+# Returns and risk-adjusted ratios (stats.ts)
+# ------------------------------
+
+def daily_returns(equity: np.ndarray, axis: int = -1) -> np.ndarray:
+    """Step returns of every curve (one fewer along `axis`), as computeReturnsFromValues."""
+    v = _time_last(equity, axis)
+    prev, curr = v[..., :-1], v[..., 1:]
+    ok = np.isfinite(prev) & (prev != 0) & np.isfinite(curr)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = np.where(ok, curr / np.where(ok, prev, 1.0) - 1.0, 0.0)
+    return np.moveaxis(r, -1, axis)
+
+
+def sharpe_sortino(returns: np.ndarray, axis: int = -1,
+                   periods_per_year: float = PERIODS_PER_YEAR) -> Tuple[np.ndarray, np.ndarray]:
+    """(sharpe, sortino) of every return series, as computeSharpeAndSortinoFromReturns."""
+    r = _time_last(returns, axis)
+    n = r.shape[-1]
+    if n == 0:
+        zero = np.zeros(r.shape[:-1])
+        return zero, zero.copy()
+    scale = np.sqrt(periods_per_year)
+    mean = r.mean(axis=-1)
+    var = ((r - mean[..., None]) ** 2).sum(axis=-1) / (n - 1) if n > 1 else np.zeros_like(mean)
+    std = np.sqrt(var)
+
+    neg = r < 0
+    count = neg.sum(axis=-1)
+    mean_down = np.where(neg, r, 0.0).sum(axis=-1) / np.maximum(count, 1)
+    down_var = np.where(neg, r - mean_down[..., None], 0.0)
+    down_var = np.where(count > 1, (down_var ** 2).sum(axis=-1) / np.maximum(count - 1, 1), 0.0)
+    down_dev = np.sqrt(down_var)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, mean / std * scale, 0.0)
+        sortino = np.where(down_dev > 0, mean / down_dev * scale, 0.0)
+    return sharpe, sortino
+
+
+# ------------------------------
+# Growth and drawdown
+# ------------------------------
+
+def cagr(start_value, end_value, days) -> np.ndarray:
+    """Compound annual growth (fraction) from start to end over `days` calendar days; all broadcast."""
+    start = np.asarray(start_value, dtype=np.float64)
+    end = np.asarray(end_value, dtype=np.float64)
+    days = np.maximum(np.asarray(days, dtype=np.float64), 1.0)
+    years = days / DAYS_PER_YEAR
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = end / start
+        return np.where(years < 1, (ratio - 1.0) * (DAYS_PER_YEAR / days),
+                        np.power(ratio, 1.0 / years) - 1.0)
+
+
+def max_drawdown(equity: np.ndarray, axis: int = -1) -> np.ndarray:
+    """Most negative value / running peak - 1 of every curve (0 while the peak is not positive)."""
+    v = _time_last(equity, axis)
+    if v.shape[-1] == 0:
+        return np.zeros(v.shape[:-1])
+    peak = np.maximum.accumulate(v, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(peak > 0, v / peak - 1.0, 0.0).min(axis=-1)
+
+
+def drawdown_duration(equity: np.ndarray, axis: int = -1) -> np.ndarray:
+    """Longest stretch of bars spent below a previous peak (until recovery or the end) of every curve."""
+    v = _time_last(equity, axis)
+    if v.shape[-1] == 0:
+        return np.zeros(v.shape[:-1], dtype=np.int64)
+    under = v < np.maximum.accumulate(v, axis=-1)
+    idx = np.arange(v.shape[-1])
+    last_high = np.maximum.accumulate(np.where(under, 0, idx), axis=-1)
+    return (idx - last_high).max(axis=-1)
+
+
+def calmar(cagr_frac, max_dd) -> np.ndarray:
+    """CAGR / |max drawdown| (0 without a drawdown)."""
+    cagr_frac = np.asarray(cagr_frac, dtype=np.float64)
+    dd = np.abs(np.asarray(max_dd, dtype=np.float64))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(dd > 0, cagr_frac / dd, 0.0)
+
+
+def time_in_market(exposure: np.ndarray, axis: int = -1) -> np.ndarray:
+    """Fraction of bars with a positive risk-asset exposure (value or quantity) per curve."""
+    x = _time_last(exposure, axis)
+    if x.shape[-1] == 0:
+        return np.zeros(x.shape[:-1])
+    return (x > 0).mean(axis=-1)
+
+
+# ------------------------------
+# Rolling variants
+# ------------------------------
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing sums over exactly `window` values along the last axis; NaN before the first full window."""
+    cs = np.concatenate([np.zeros(values.shape[:-1] + (1,)), np.cumsum(values, axis=-1)], axis=-1)
+    out = np.full(values.shape, np.nan)
+    out[..., window - 1:] = cs[..., window:] - cs[..., :-window]
+    return out
+
+
+def rolling_returns(equity: np.ndarray, window: int, axis: int = -1) -> np.ndarray:
+    """Return over the trailing `window` bars at every bar (NaN for the first `window`)."""
+    v = _time_last(equity, axis)
+    out = np.full(v.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[..., window:] = v[..., window:] / v[..., :-window] - 1.0
+    return np.moveaxis(out, -1, axis)
+
+
+def rolling_sharpe_sortino(returns: np.ndarray, window: int, axis: int = -1,
+                           periods_per_year: float = PERIODS_PER_YEAR) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    sharpe_sortino over every trailing `window` of returns, aligned with the
+    returns (NaN before the first full window). Uses running sums, so values
+    agree with sharpe_sortino on the same window up to rounding.
+    """
+    if window < 2:
+        raise ValueError("window must be at least 2")
+    r = _time_last(returns, axis)
+    scale = np.sqrt(periods_per_year)
+    s1, s2 = _rolling_sum(r, window), _rolling_sum(r * r, window)
+    mean = s1 / window
+    std = np.sqrt(np.maximum(s2 - s1 * mean, 0.0) / (window - 1))
+
+    neg = (r < 0).astype(np.float64)
+    c = _rolling_sum(neg, window)
+    d1, d2 = _rolling_sum(r * neg, window), _rolling_sum(r * r * neg, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        down_var = np.where(c > 1, np.maximum(d2 - d1 * d1 / c, 0.0) / (c - 1), 0.0)
+        down_dev = np.sqrt(down_var)
+        sharpe = np.where(std > 0, mean / std * scale, 0.0)
+        sortino = np.where(down_dev > 0, mean / down_dev * scale, 0.0)
+    valid = ~np.isnan(s1)
+    sharpe = np.where(valid, sharpe, np.nan)
+    sortino = np.where(valid, sortino, np.nan)
+    return np.moveaxis(sharpe, -1, axis), np.moveaxis(sortino, -1, axis)
+
+
+# ------------------------------
+# Summary
+# ------------------------------
+
+def summarize(equity: np.ndarray, days=None, initial=None, exposure: Optional[np.ndarray] = None,
+              axis: int = -1) -> Dict[str, np.ndarray]:
+    """
+    Web-simulator metrics of every curve. `days` is the calendar span
+    (default: one day per step), `initial` the capital CAGR starts from
+    (default: the first value), `exposure` the risk-asset holdings for time
+    in market.
+    """
+    v = _time_last(equity, axis)
+    t = v.shape[-1]
+    start = v[..., 0] if initial is None else initial
+    end = v[..., -1] if t else np.full(v.shape[:-1], np.nan)
+    growth = cagr(start, end, max(t - 1, 1) if days is None else days)
+    mdd = max_drawdown(v)
+    sharpe, sortino = sharpe_sortino(daily_returns(v))
+    out = {
+        "CAGR_%": growth * 100.0,
+        "Max_DD_%": mdd * 100.0,
+        "Max_DD_Days": drawdown_duration(v),
+        "Sharpe": sharpe,
+        "Sortino": sortino,
+        "Calmar": calmar(growth, mdd),
+    }
+    if exposure is not None:
+        out["Time_In_Market_%"] = time_in_market(_time_last(exposure, axis)) * 100.0
+    return out
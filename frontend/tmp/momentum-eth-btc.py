@@ -2,21 +2,24 @@
 """
 Minimal ETH–BTC long swing backtest (no CLI, no web3).
 
-- Pulls daily candles from Binance public REST (no key needed)
+- Pulls daily candles from Binance public REST (no key needed), cached on disk
+  by kline_cache.py so repeated runs only download missing days
+  (pass --offline to use the bundled frontend/public/data histories instead;
+  --instrument REPORT.json [--trace-alloc] [--profile OUT.pstats] records
+  phase timings and counters via instrument.py)
 - Reimplements the RSI + regime + momentum logic you posted
 - Uses Binance-mode params (no size risk / credit / DEX fees)
 - Outputs:
   - equity curve CSV:  equity_curve.csv
-  - trades CSV:        trades.csv
+  - trades CSV:        trades.csv (or any trade_sink.py sink via run_backtest(sink=...))
   - prints summary stats
 
 Requires:
-  pip install requests numpy pandas ft-pandas-ta tqdm
+  pip install requests numpy pandas tqdm
 """
 
 from __future__ import annotations
 import math
-import time
 import json
 import csv
 import sys
@@ -24,12 +27,17 @@ import datetime as dt
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 
-import requests
 import numpy as np
 import pandas as pd
-import pandas_ta as ta
 from tqdm import tqdm
 
+import indicator_cache
+import indicators
+import instrument
+from kline_cache import fetch_binance_klines_many
+from price_store import PriceStore
+from trade_sink import ISO_TIME_FORMAT, CsvSink, QuietSink, TradeSink
+
 
 # ------------------------------
 # Parameters (mirrored from code)
@@ -61,53 +69,11 @@ class Parameters:
     lookback_days = 200  # For the 200-day SMA
 
 
-# ------------------------------
-# Binance candle downloader
-# ------------------------------
-BINANCE_URL = "https://api.binance.com/api/v3/klines"
-
-def fetch_binance_klines(symbol: str, interval: str, start: dt.datetime, end: dt.datetime) -> pd.DataFrame:
-    """Fetch daily OHLCV from Binance with pagination (limit 1000)."""
-    limit = 1000
-    start_ms = int(start.timestamp() * 1000)
-    end_ms   = int(end.timestamp()   * 1000)
-    frames = []
-    while start_ms < end_ms:
-        params = dict(symbol=symbol, interval=interval, limit=limit, startTime=start_ms, endTime=end_ms)
-        r = requests.get(BINANCE_URL, params=params, timeout=30)
-        r.raise_for_status()
-        data = r.json()
-        if not data:
-            break
-        # Binance kline fields
-        # 0 open time, 1 open, 2 high, 3 low, 4 close, 5 volume, 6 close time, ...
-        df = pd.DataFrame(data, columns=[
-            "open_time","open","high","low","close","volume","close_time",
-            "qav","num_trades","tbbav","tbqav","ignore"
-        ])
-        df["open_time"] = pd.to_datetime(df["open_time"], unit="ms", utc=True)
-        df["close_time"] = pd.to_datetime(df["close_time"], unit="ms", utc=True)
-        df[["open","high","low","close","volume"]] = df[["open","high","low","close","volume"]].astype(float)
-        frames.append(df[["close_time","close"]].rename(columns={"close_time": "time", "close":"close"}))
-        # advance
-        last_close = data[-1][6]
-        # move cursor one ms after last close
-        start_ms = int(last_close) + 1
-        # polite pause
-        time.sleep(0.2)
-    if not frames:
-        raise RuntimeError(f"No data returned for {symbol}")
-    out = pd.concat(frames, ignore_index=True)
-    out = out.drop_duplicates(subset=["time"]).sort_values("time").reset_index(drop=True)
-    out["time"] = out["time"].dt.tz_convert("UTC")
-    return out
-
-
 # ------------------------------
 # Helpers
 # ------------------------------
 def compute_rsi(series: pd.Series, length: int) -> pd.Series:
-    return ta.rsi(series, length=length)
+    return pd.Series(indicators.rsi(series.to_numpy(dtype=float), length, exact=True), index=series.index)
 
 def max_drawdown(equity: pd.Series) -> float:
     roll_max = equity.cummax()
@@ -134,87 +100,106 @@ class Position:
     open_time: Optional[pd.Timestamp] = None
 
 
-# ------------------------------
-# Core backtest
-# ------------------------------
-def run_backtest() -> Tuple[pd.DataFrame, pd.DataFrame]:
-    p = Parameters
+def cross_above(now: float, prev: float, level: float) -> bool:
+    # Check for valid numbers and standard cross
+    if math.isnan(now) or math.isnan(prev):
+        return False
+    return now >= level and prev < level
+
+def cross_below(now: float, prev: float, level: float) -> bool:
+    # Check for valid numbers and standard cross
+    if math.isnan(now) or math.isnan(prev):
+        return False
+    return now < level and prev > level
+
+def rebalance(pos: Position, target_value: float, px: float, cash: float, total_equity: float,
+              p=Parameters) -> Tuple[float, Optional[Tuple[str, float]]]:
+    """
+    Move `pos` towards target_value if the change exceeds the rebalance threshold
+    (absolute dollars). Returns the new cash balance and (side, fee) of the
+    trade, or None if nothing was traded.
+    """
+    delta = target_value - pos.value
+    if abs(delta) < (p.rebalance_threshold * total_equity):
+        return cash, None
+    fee = 0.0
+    if delta > 0:
+        # buy
+        total_cost = delta * (1.0 + p.trading_fee)  # Total cost including fees
+        # Check if we have enough cash
+        if total_cost > cash:
+            # Adjust delta to match available cash
+            delta = cash / (1.0 + p.trading_fee)
+            # Skip if adjusted size is below threshold
+            if abs(delta) < (p.rebalance_threshold * total_equity):
+                return cash, None
+        qty = (delta * (1.0 - p.trading_fee)) / px
+        fee = delta * p.trading_fee
+        pos.qty += qty
+        cash -= (delta + fee)  # Deduct both the trade amount and fee
+    else:
+        # sell
+        sell_val = -delta
+        qty = min(pos.qty, sell_val / px)
+        actual_val = qty * px
+        fee = actual_val * p.trading_fee
+        pos.qty -= qty
+        cash += (actual_val * (1.0 - p.trading_fee))
+    return cash, ("BUY" if delta > 0 else "SELL", fee)
 
-    # 1) Fetch BTCUSDT + ETHUSDT daily closes with extra lookback for SMA
-    print("Downloading Binance daily candles...")
-    lookback_start = p.backtest_start - dt.timedelta(days=p.lookback_days)
-    btc = fetch_binance_klines("BTCUSDT", "1d", lookback_start, p.backtest_end)
-    eth = fetch_binance_klines("ETHUSDT", "1d", lookback_start, p.backtest_end)
 
-    # align on intersection
-    df = pd.DataFrame({
-        "time": btc["time"]
-    })
-    df = df.merge(btc, on="time", suffixes=("","")).rename(columns={"close":"btc"})
-    df = df.merge(eth, on="time", suffixes=("","")).rename(columns={"close":"eth"})
-    df = df.set_index("time").sort_index()
+@dataclass
+class MomentumResult:
+    # per-bar columns over the backtest window (end of bar, after rebalancing)
+    cash: np.ndarray
+    btc_value: np.ndarray
+    eth_value: np.ndarray
+    equity: np.ndarray
+    btc_hodl_value: np.ndarray
+    trades: List[dict]
+
+
+def simulate_momentum(
+    btc: np.ndarray,
+    eth: np.ndarray,
+    btc_rsi: np.ndarray,
+    eth_rsi: np.ndarray,
+    btc_sma: np.ndarray,
+    eth_btc_rsi: np.ndarray,
+    start: int,
+    initial_capital: float = 10_000.0,
+    p=Parameters,
+    times: Optional[pd.DatetimeIndex] = None,
+) -> MomentumResult:
+    """
+    Simulate the RSI + regime + momentum strategy over indicator columns.
+    Bars before `start` only feed indicators; the result columns cover bars
+    start..end. Trade rows are recorded when `times` is given, with the bar
+    time as epoch ms (formatted later by the trade sink).
+    """
+    btc_l, eth_l = np.asarray(btc, dtype=float).tolist(), np.asarray(eth, dtype=float).tolist()
+    btc_rsi_l, eth_rsi_l = np.asarray(btc_rsi, dtype=float).tolist(), np.asarray(eth_rsi, dtype=float).tolist()
+    sma_l, eb_rsi_l = np.asarray(btc_sma, dtype=float).tolist(), np.asarray(eth_btc_rsi, dtype=float).tolist()
+    n = len(btc_l) - start
+
+    # Setup BTC HODL benchmark (account for the initial buy fee)
+    btc_hodl_qty = (initial_capital * (1.0 - p.trading_fee)) / btc_l[start]
+
+    cash_col = np.full(n, initial_capital)
+    btc_col = np.zeros(n)
+    eth_col = np.zeros(n)
+    equity_col = np.full(n, initial_capital)
+    hodl_col = btc_hodl_qty * np.asarray(btc_l[start:], dtype=float)
 
-    # 2) Indicators
-    df["btc_rsi"] = compute_rsi(df["btc"], p.rsi_bars)
-    df["eth_rsi"] = compute_rsi(df["eth"], p.rsi_bars)
-    # Regime filter SMA on BTC (200d)
-    df["btc_sma"] = ta.sma(df["btc"], length=p.regime_filter_ma_length)
-    # ETH/BTC and its RSI(5)
-    df["eth_btc"] = df["eth"] / df["btc"]
-    df["eth_btc_rsi"] = compute_rsi(df["eth_btc"], p.eth_btc_rsi_bars)
-
-    # 3) Setup BTC HODL benchmark and daily performance tracking
-    initial_capital = 10_000.0
-    # Find first BTC price after backtest_start
-    first_valid_idx = df.index[df.index >= p.backtest_start][0]
-    btc_start_price = df.at[first_valid_idx, "btc"]
-    btc_hodl_qty = (initial_capital * (1.0 - p.trading_fee)) / btc_start_price  # Account for initial buy fee
-    
-    # 4) Iterate bars and simulate portfolio
     cash = initial_capital
-    equity = []
-    dates = []
-    trades = []  # rows for CSV
-    
-    # Daily performance tracking
-    daily_perf = []  # List to store daily performance records
-    
+    trades: List[dict] = []
+    times_ms = pd.DatetimeIndex(times).as_unit("ms").asi8.tolist() if times is not None else None
     pos_btc = Position("BTCUSDT")
     pos_eth = Position("ETHUSDT")
-    
-    # Get all dates in the backtest period
-    backtest_dates = df[df.index >= p.backtest_start].index
-    
-    # Initialize daily performance tracking
-    for date in backtest_dates:
-        btc_price = df.at[date, "btc"]
-        eth_price = df.at[date, "eth"]
-        
-        total_equity = cash + pos_btc.qty * btc_price + pos_eth.qty * eth_price
-        btc_hodl_value = btc_hodl_qty * btc_price
-        
-        daily_perf.append({
-            "date": date.strftime("%Y-%m-%d"),
-            "btc_price": round(btc_price, 2),
-            "eth_price": round(eth_price, 2),
-            "usdt_value": round(cash, 2),
-            "eth_value": round(pos_eth.qty * eth_price, 2),
-            "btc_value": round(pos_btc.qty * btc_price, 2),
-            "total_portfolio_value": round(total_equity, 2),
-            "btc_hodl_value": round(btc_hodl_value, 2)
-        })
-    
-    # Now simulate trading
-    for i in range(1, len(df)):
-        today = df.index[i]
-        yday = df.index[i-1]
-
-        # Skip dates before backtest_start
-        if today.to_pydatetime() < p.backtest_start:
-            continue
 
-        btc_px = df.at[today, "btc"]
-        eth_px = df.at[today, "eth"]
+    for i in range(max(1, start), len(btc_l)):
+        btc_px = btc_l[i]
+        eth_px = eth_l[i]
 
         # Update mark-to-market
         for pos, px in ((pos_btc, btc_px), (pos_eth, eth_px)):
@@ -223,36 +208,22 @@ def run_backtest() -> Tuple[pd.DataFrame, pd.DataFrame]:
 
         # Regime
         bullish = True  # Default to bullish
-        sma = df.at[today, "btc_sma"]
+        sma = sma_l[i]
         if not math.isnan(sma):
-            bullish = (df.at[today, "btc"] > sma)
+            bullish = (btc_px > sma)
 
         rsi_entry = p.bullish_rsi_entry if bullish else p.bearish_rsi_entry
         rsi_exit  = p.bullish_rsi_exit  if bullish else p.bearish_rsi_exit
 
         # RSI crosses (compare yesterday vs. day before yesterday)
-        btc_rsi_now  = df.at[today, "btc_rsi"]
-        eth_rsi_now  = df.at[today, "eth_rsi"]
-        btc_rsi_prev = df.at[yday,  "btc_rsi"]
-        eth_rsi_prev = df.at[yday,  "eth_rsi"]
-
-        def cross_above(now, prev, level):
-            # Check for valid numbers and standard cross
-            if math.isnan(now) or math.isnan(prev):
-                return False
-            return now >= level and prev < level
-
-        def cross_below(now, prev, level):
-            # Check for valid numbers and standard cross
-            if math.isnan(now) or math.isnan(prev):
-                return False
-            return now < level and prev > level
+        btc_rsi_now, btc_rsi_prev = btc_rsi_l[i], btc_rsi_l[i - 1]
+        eth_rsi_now, eth_rsi_prev = eth_rsi_l[i], eth_rsi_l[i - 1]
 
         btc_open = pos_btc.qty > 0
         eth_open = pos_eth.qty > 0
 
         # Momentum from ETH/BTC RSI
-        eb_rsi = df.at[today, "eth_btc_rsi"]
+        eb_rsi = eb_rsi_l[i]
         if math.isnan(eb_rsi):
             eth_mom = btc_mom = 0.5
         else:
@@ -269,20 +240,14 @@ def run_backtest() -> Tuple[pd.DataFrame, pd.DataFrame]:
         if btc_open:
             if cross_below(btc_rsi_now, btc_rsi_prev, rsi_exit):
                 w_btc = 0.0
-        else:
-            if cross_above(btc_rsi_now, btc_rsi_prev, rsi_entry):
-                pass  # keep momentum-driven positive weight
-            else:
-                w_btc = 0.0
+        elif not cross_above(btc_rsi_now, btc_rsi_prev, rsi_entry):
+            w_btc = 0.0
 
         if eth_open:
             if cross_below(eth_rsi_now, eth_rsi_prev, rsi_exit):
                 w_eth = 0.0
-        else:
-            if cross_above(eth_rsi_now, eth_rsi_prev, rsi_entry):
-                pass
-            else:
-                w_eth = 0.0
+        elif not cross_above(eth_rsi_now, eth_rsi_prev, rsi_entry):
+            w_eth = 0.0
 
         # Normalize to sum<=1 and then scale by allocation
         w_sum = w_btc + w_eth
@@ -291,138 +256,320 @@ def run_backtest() -> Tuple[pd.DataFrame, pd.DataFrame]:
             w_eth /= w_sum
         total_equity = cash + pos_btc.value + pos_eth.value
         investable = total_equity * p.allocation
-        target_btc_val = investable * w_btc
-        target_eth_val = investable * w_eth
 
-        # Rebalance if difference exceeds threshold (absolute dollar change)
-        def rebalance(pos: Position, target_value: float, px: float, label: str):
-            nonlocal cash, trades
-            delta = target_value - pos.value
-            if abs(delta) < (p.rebalance_threshold * total_equity):
-                return
-            fee = 0.0
-            if delta > 0:
-                # buy
-                total_cost = delta * (1.0 + p.trading_fee)  # Total cost including fees
-                # Check if we have enough cash
-                if total_cost > cash:
-                    # Adjust delta to match available cash
-                    delta = cash / (1.0 + p.trading_fee)
-                    # Skip if adjusted size is below threshold
-                    if abs(delta) < (p.rebalance_threshold * total_equity):
-                        return
-                qty = (delta * (1.0 - p.trading_fee)) / px
-                fee = delta * p.trading_fee
-                pos.qty += qty
-                cash -= (delta + fee)  # Deduct both the trade amount and fee
-            else:
-                # sell
-                sell_val = -delta
-                qty = min(pos.qty, sell_val / px)
-                actual_val = qty * px
-                fee = actual_val * p.trading_fee
-                pos.qty -= qty
-                cash += (actual_val * (1.0 - p.trading_fee))
-            # record trade
-            # Calculate portfolio breakdown at this point
+        for pos, target_value, px in ((pos_btc, investable * w_btc, btc_px), (pos_eth, investable * w_eth, eth_px)):
+            cash, trade = rebalance(pos, target_value, px, cash, total_equity, p)
+            if trade is None or times is None:
+                continue
+            # record trade with the portfolio breakdown at this point
             btc_value = pos_btc.qty * btc_px
             eth_value = pos_eth.qty * eth_px
-            usdt_value = cash
-            
-            # Determine if this is a buy or sell
-            side = "BUY" if delta > 0 else "SELL"
-            
-            # Calculate BTC HODL value
-            btc_hodl_value = btc_hodl_qty * btc_px
-            
             trades.append({
-                "side": side,
-                "time": today.isoformat(),
-                "symbol": label,
-                "target_value": round(target_value, 2),
-                "price": round(px, 2),
-                "fee": round(fee, 4),
+                "side": trade[0],
+                "time": times_ms[i],
+                "symbol": pos.symbol,
+                "target_value": _round(target_value, 2),
+                "price": _round(px, 2),
+                "fee": _round(trade[1], 4),
                 "qty_after": pos.qty,
                 "value_after": pos.qty * px,
-                "usdt_value": round(usdt_value, 2),
-                "btc_value": round(btc_value, 2),
-                "eth_value": round(eth_value, 2),
-                "total_portfolio_value": round(usdt_value + btc_value + eth_value, 2),
-                "btc_hodl_value": round(btc_hodl_value, 2)
+                "usdt_value": _round(cash, 2),
+                "btc_value": _round(btc_value, 2),
+                "eth_value": _round(eth_value, 2),
+                "total_portfolio_value": _round(cash + btc_value + eth_value, 2),
+                "btc_hodl_value": _round(btc_hodl_qty * btc_px, 2)
             })
 
-        rebalance(pos_btc, target_btc_val, btc_px, "BTCUSDT")
-        rebalance(pos_eth, target_eth_val, eth_px, "ETHUSDT")
-
-        # Update equity
-        total_equity = cash + pos_btc.qty * btc_px + pos_eth.qty * eth_px
-        equity.append(total_equity)
-        dates.append(today)
-        
-        # Update the corresponding daily performance record
-        idx = backtest_dates.get_loc(today)
-        daily_perf[idx].update({
-            "usdt_value": round(cash, 2),
-            "eth_value": round(pos_eth.qty * eth_px, 2),
-            "btc_value": round(pos_btc.qty * btc_px, 2),
-            "total_portfolio_value": round(total_equity, 2)
+        # End-of-bar columns
+        k = i - start
+        cash_col[k] = cash
+        btc_col[k] = pos_btc.qty * btc_px
+        eth_col[k] = pos_eth.qty * eth_px
+        equity_col[k] = cash + pos_btc.qty * btc_px + pos_eth.qty * eth_px
+
+    return MomentumResult(cash=cash_col, btc_value=btc_col, eth_value=eth_col,
+                          equity=equity_col, btc_hodl_value=hodl_col, trades=trades)
+
+
+@dataclass
+class MomentumBatchResult:
+    equity: np.ndarray         # final equity per column
+    trades_count: np.ndarray
+    max_drawdown: np.ndarray   # most negative equity / running-peak - 1 per column
+
+
+def _cross_above_v(now: np.ndarray, prev: np.ndarray, level: np.ndarray) -> np.ndarray:
+    return (now >= level) & (prev < level)   # NaN compares False, like cross_above
+
+
+def _cross_below_v(now: np.ndarray, prev: np.ndarray, level: np.ndarray) -> np.ndarray:
+    return (now < level) & (prev > level)
+
+
+def _rebalance_v(qty, value, target_value, px, cash, total_equity, p=Parameters):
+    """rebalance() for arrays of positions; returns (qty, cash, traded mask)."""
+    thr = p.rebalance_threshold * total_equity
+    delta = target_value - value
+    act = ~(np.abs(delta) < thr)
+    buy = act & (delta > 0)
+    sell = act & ~(delta > 0)
+    # buys are cut back to the available cash (and skipped if that is below the threshold)
+    over = buy & (delta * (1.0 + p.trading_fee) > cash)
+    delta = np.where(over, cash / (1.0 + p.trading_fee), delta)
+    buy &= ~(over & (np.abs(delta) < thr))
+    buy_qty = (delta * (1.0 - p.trading_fee)) / px
+    sell_qty = np.minimum(qty, -delta / px)
+    qty = np.where(buy, qty + buy_qty, np.where(sell, qty - sell_qty, qty))
+    cash = np.where(buy, cash - (delta + delta * p.trading_fee),
+                    np.where(sell, cash + (sell_qty * px * (1.0 - p.trading_fee)), cash))
+    return qty, cash, buy | sell
+
+
+def simulate_momentum_batch(
+    btc: np.ndarray,
+    eth: np.ndarray,
+    btc_rsi: np.ndarray,
+    eth_rsi: np.ndarray,
+    btc_sma: np.ndarray,
+    eth_btc_rsi: np.ndarray,
+    start: int,
+    initial_capital: float = 10_000.0,
+    p=Parameters,
+) -> MomentumBatchResult:
+    """
+    simulate_momentum for N price paths at once: every input is a (T, N)
+    array and the portfolio state is carried as length-N arrays. Each column
+    reproduces simulate_momentum exactly.
+    """
+    btc, eth = np.asarray(btc, dtype=float), np.asarray(eth, dtype=float)
+    n = btc.shape[1]
+    first = max(1, start)
+
+    # Momentum weights for all bars up front. Python's float pow, not np.power:
+    # a 1-ulp difference can leave dust positions that change later signals.
+    eb = np.asarray(eth_btc_rsi, dtype=float)[first:]
+    e = p.momentum_exponent
+    def _pow(x: np.ndarray) -> np.ndarray:
+        return np.array([v ** e for v in x.ravel().tolist()]).reshape(x.shape)
+    eth_mom_all = _pow(np.where(np.isnan(eb), 0.5, (eb / 100.0) + 0.5))
+    btc_mom_all = _pow(np.where(np.isnan(eb), 0.5, (1.0 - (eb / 100.0)) + 0.5))
+
+    cash = np.full(n, float(initial_capital))
+    q_btc = np.zeros(n)
+    q_eth = np.zeros(n)
+    trades = np.zeros(n, dtype=np.int64)
+    peak = np.full(n, float(initial_capital))
+    mdd = np.zeros(n)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for i in range(first, len(btc)):
+            btc_px, eth_px = btc[i], eth[i]
+            v_btc, v_eth = q_btc * btc_px, q_eth * eth_px
+
+            sma = btc_sma[i]
+            bullish = np.isnan(sma) | (btc_px > sma)
+            rsi_entry = np.where(bullish, p.bullish_rsi_entry, p.bearish_rsi_entry)
+            rsi_exit = np.where(bullish, p.bullish_rsi_exit, p.bearish_rsi_exit)
+
+            eth_mom, btc_mom = eth_mom_all[i - first], btc_mom_all[i - first]
+
+            keep_btc = np.where(q_btc > 0, ~_cross_below_v(btc_rsi[i], btc_rsi[i - 1], rsi_exit),
+                                _cross_above_v(btc_rsi[i], btc_rsi[i - 1], rsi_entry))
+            keep_eth = np.where(q_eth > 0, ~_cross_below_v(eth_rsi[i], eth_rsi[i - 1], rsi_exit),
+                                _cross_above_v(eth_rsi[i], eth_rsi[i - 1], rsi_entry))
+            w_btc = np.where(keep_btc, btc_mom, 0.0)
+            w_eth = np.where(keep_eth, eth_mom, 0.0)
+            w_sum = w_btc + w_eth
+            w_btc = np.where(w_sum > 0, w_btc / w_sum, w_btc)
+            w_eth = np.where(w_sum > 0, w_eth / w_sum, w_eth)
+
+            total_equity = cash + v_btc + v_eth
+            investable = total_equity * p.allocation
+            q_btc, cash, traded = _rebalance_v(q_btc, v_btc, investable * w_btc, btc_px, cash, total_equity, p)
+            trades += traded
+            q_eth, cash, traded = _rebalance_v(q_eth, v_eth, investable * w_eth, eth_px, cash, total_equity, p)
+            trades += traded
+
+            equity = cash + q_btc * btc_px + q_eth * eth_px
+            np.maximum(peak, equity, out=peak)
+            np.minimum(mdd, equity / peak - 1.0, out=mdd)
+
+    return MomentumBatchResult(equity=cash + q_btc * btc[-1] + q_eth * eth[-1],
+                               trades_count=trades, max_drawdown=mdd)
+
+
+def _round(x: float, ndigits: int) -> float:
+    # NumPy rounding (the report values used to be np.float64 scalars)
+    return float(np.round(x, ndigits))
+
+
+# ------------------------------
+# Core backtest
+# ------------------------------
+def trade_columns(trades: List[dict]) -> Dict[str, np.ndarray]:
+    """Trade rows as columns for a trade sink."""
+    if not trades:
+        return {}
+    return {k: np.array([t[k] for t in trades]) for k in trades[0]}
+
+
+def run_backtest(
+    store: Optional[PriceStore] = None,
+    sink: Optional[TradeSink] = None,
+    verbose: bool = True,
+    save_csv: bool = True,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Run the backtest on Binance candles, or on the offline price store if given.
+    Trades go to `sink` (default: trades.csv when save_csv); `verbose` prints
+    the summary and `save_csv` writes equity_curve.csv / portfolio_perf.csv.
+    """
+    p = Parameters
+    inst = instrument.active()
+
+    # 1) Fetch BTCUSDT + ETHUSDT daily closes with extra lookback for SMA
+    lookback_start = p.backtest_start - dt.timedelta(days=p.lookback_days)
+    with inst.phase("load"):
+        if store is not None:
+            btc = store.frame("BTCUSDT", lookback_start, p.backtest_end)
+            eth = store.frame("ETHUSDT", lookback_start, p.backtest_end)
+        else:
+            if verbose:
+                print("Downloading Binance daily candles...")
+            got = fetch_binance_klines_many(["BTCUSDT", "ETHUSDT"], "1d", lookback_start, p.backtest_end)
+            btc, eth = got["BTCUSDT"], got["ETHUSDT"]
+
+        # align on intersection
+        df = pd.DataFrame({
+            "time": btc["time"]
         })
+        df = df.merge(btc, on="time", suffixes=("","")).rename(columns={"close":"btc"})
+        df = df.merge(eth, on="time", suffixes=("","")).rename(columns={"close":"eth"})
+        df = df.set_index("time").sort_index()
 
-    equity = pd.Series(equity, index=pd.Index(dates, name="time"), name="equity").astype(float)
+    # 2) Indicators
+    # (memoized per close series, so repeated runs over the same candles reuse them)
+    with inst.phase("indicators"):
+        cache = indicator_cache.default_cache()
+        btc_close, eth_close = df["btc"].to_numpy(dtype=float), df["eth"].to_numpy(dtype=float)
+        df["btc_rsi"] = cache.rsi(btc_close, p.rsi_bars, asset="BTCUSDT", exact=True)
+        df["eth_rsi"] = cache.rsi(eth_close, p.rsi_bars, asset="ETHUSDT", exact=True)
+        # Regime filter SMA on BTC (200d)
+        df["btc_sma"] = cache.sma(btc_close, p.regime_filter_ma_length, asset="BTCUSDT", exact=True)
+        # ETH/BTC and its RSI(5)
+        df["eth_btc"] = df["eth"] / df["btc"]
+        df["eth_btc_rsi"] = cache.rsi(df["eth_btc"].to_numpy(dtype=float), p.eth_btc_rsi_bars, asset="ETHBTC",
+                                      exact=True)
+
+    # 3) Simulate over the backtest window
+    initial_capital = 10_000.0
+    start = int(np.searchsorted(df.index, p.backtest_start, side="left"))
+    times = df.index
+    with inst.phase("simulate"), inst.profile():
+        res = simulate_momentum(
+            df["btc"].to_numpy(), df["eth"].to_numpy(),
+            df["btc_rsi"].to_numpy(), df["eth_rsi"].to_numpy(),
+            df["btc_sma"].to_numpy(), df["eth_btc_rsi"].to_numpy(),
+            start, initial_capital, p, times=times,
+        )
+    trades = res.trades
+    inst.count("bars", len(times) - start)
+    inst.count("trades", len(trades))
+    # bar `start` is only simulated from index 1 on (it needs a previous RSI)
+    first = max(1, start) - start
+    bt_times = times[start:]
+    equity = pd.Series(res.equity[first:], index=pd.Index(bt_times[first:], name="time"), name="equity").astype(float)
+
+    # Daily performance columns (rounded to cents like the CSV)
+    total_r = np.round(res.equity, 2)
+    hodl_r = np.round(res.btc_hodl_value, 2)
+    perf_df = pd.DataFrame({
+        "date": bt_times.strftime("%Y-%m-%d"),
+        "btc_price": np.round(df["btc"].to_numpy()[start:], 2),
+        "eth_price": np.round(df["eth"].to_numpy()[start:], 2),
+        "usdt_value": np.round(res.cash, 2),
+        "eth_value": np.round(res.eth_value, 2),
+        "btc_value": np.round(res.btc_value, 2),
+        "total_portfolio_value": total_r,
+        "btc_hodl_value": hodl_r,
+    })
+    # Drawdowns from the running maximum
+    perf_df["portfolio_dd"] = (total_r / np.maximum.accumulate(total_r) - 1.0) * 100
+    perf_df["btc_hodl_dd"] = (hodl_r / np.maximum.accumulate(hodl_r) - 1.0) * 100
 
     # Stats
+    inst.snapshot("end")
     mdd = max_drawdown(equity)
     annual = cagr(equity, equity.index.to_series())
-    # Calculate BTC HODL CAGR using daily data
-    btc_hodl_series = pd.Series([d["btc_hodl_value"] for d in daily_perf], 
-                               index=pd.Index([pd.Timestamp(d["date"]) for d in daily_perf]))
+    # BTC HODL CAGR using daily data
+    btc_hodl_series = pd.Series(hodl_r, index=pd.DatetimeIndex(perf_df["date"]))
     btc_hodl_cagr = cagr(btc_hodl_series, btc_hodl_series.index.to_series())
     btc_hodl_mdd = max_drawdown(btc_hodl_series)
-    
-    print("\n=== Backtest summary (Binance daily) ===")
-    print(f"Start:   {equity.index[0].date()}  |  End: {equity.index[-1].date()}  | Points: {len(equity)}")
-    print(f"\nStrategy Performance:")
-    print(f"CAGR:    {annual*100:.2f}%")
-    print(f"Max DD:  {mdd*100:.2f}%")
-    print(f"Final equity: ${equity.iloc[-1]:,.2f}")
-    print(f"Trades:  {len(trades)}")
-    print(f"\nBTC HODL Performance:")
-    print(f"CAGR:    {btc_hodl_cagr*100:.2f}%")
-    print(f"Max DD:  {btc_hodl_mdd*100:.2f}%")
-    print(f"Final value: ${btc_hodl_series.iloc[-1]:,.2f}")
-    print(f"\nOutperformance: {(annual - btc_hodl_cagr)*100:.2f}%")
-    print("\nSaved: equity_curve.csv, trades.csv")
-
-    # Create daily performance DataFrame and calculate drawdowns
-    perf_df = pd.DataFrame(daily_perf)
-    
-    # Calculate running maximum for drawdown calculations
-    perf_df["portfolio_peak"] = perf_df["total_portfolio_value"].expanding().max()
-    perf_df["btc_hodl_peak"] = perf_df["btc_hodl_value"].expanding().max()
-    
-    # Calculate drawdowns
-    perf_df["portfolio_dd"] = (perf_df["total_portfolio_value"] / perf_df["portfolio_peak"] - 1.0) * 100
-    perf_df["btc_hodl_dd"] = (perf_df["btc_hodl_value"] / perf_df["btc_hodl_peak"] - 1.0) * 100
-    
-    # Drop intermediate columns used for calculation
-    perf_df = perf_df.drop(columns=["portfolio_peak", "btc_hodl_peak"])
-    
-    # Output CSVs
-    equity.to_frame().to_csv("equity_curve.csv")
-    pd.DataFrame(trades).to_csv("trades.csv", index=False)
-    perf_df.to_csv("portfolio_perf.csv", index=False)
-    
-    # Print maximum drawdowns from daily data
-    print(f"\nMaximum Drawdowns (from daily data):")
-    print(f"Strategy: {perf_df['portfolio_dd'].min():.2f}%")
-    print(f"BTC HODL: {perf_df['btc_hodl_dd'].min():.2f}%")
-    
-    print("\nSaved: equity_curve.csv, trades.csv, portfolio_perf.csv")
+
+    if verbose:
+        print("\n=== Backtest summary (Binance daily) ===")
+        print(f"Start:   {equity.index[0].date()}  |  End: {equity.index[-1].date()}  | Points: {len(equity)}")
+        print(f"\nStrategy Performance:")
+        print(f"CAGR:    {annual*100:.2f}%")
+        print(f"Max DD:  {mdd*100:.2f}%")
+        print(f"Final equity: ${equity.iloc[-1]:,.2f}")
+        print(f"Trades:  {len(trades)}")
+        print(f"\nBTC HODL Performance:")
+        print(f"CAGR:    {btc_hodl_cagr*100:.2f}%")
+        print(f"Max DD:  {btc_hodl_mdd*100:.2f}%")
+        print(f"Final value: ${btc_hodl_series.iloc[-1]:,.2f}")
+        print(f"\nOutperformance: {(annual - btc_hodl_cagr)*100:.2f}%")
+        if save_csv:
+            print("\nSaved: equity_curve.csv, trades.csv")
+
+    # Trades (written in one batch; times are formatted by the sink)
+    own_sink = sink is None
+    if own_sink:
+        sink = CsvSink("trades.csv", time_format=ISO_TIME_FORMAT) if save_csv else QuietSink()
+    with inst.phase("output"):
+        sink.write(trade_columns(trades))
+        if own_sink:
+            sink.close()
+        else:
+            sink.flush()
+
+        # Output CSVs
+        if save_csv:
+            equity.to_frame().to_csv("equity_curve.csv")
+            perf_df.to_csv("portfolio_perf.csv", index=False)
+
+    if verbose:
+        # Print maximum drawdowns from daily data
+        print(f"\nMaximum Drawdowns (from daily data):")
+        print(f"Strategy: {perf_df['portfolio_dd'].min():.2f}%")
+        print(f"BTC HODL: {perf_df['btc_hodl_dd'].min():.2f}%")
+
+        if save_csv:
+            print("\nSaved: equity_curve.csv, trades.csv, portfolio_perf.csv")
 
     # Also return DataFrames if imported
-    return equity.to_frame(), pd.DataFrame(trades)
+    trades_df = pd.DataFrame(trades)
+    if len(trades_df):
+        trades_df["time"] = pd.to_datetime(trades_df["time"], unit="ms", utc=True).dt.strftime(ISO_TIME_FORMAT)
+    return equity.to_frame(), trades_df
 
 
 if __name__ == "__main__":
-    run_backtest()
+    import argparse
+    import contextlib
+
+    ap = argparse.ArgumentParser(description="ETH-BTC momentum backtest (Binance daily).")
+    ap.add_argument("--offline", action="store_true", help="Use the bundled frontend/public/data histories")
+    ap.add_argument("--instrument", type=str, default=None, metavar="REPORT_JSON",
+                    help="Write phase timings, counters and allocation stats to this JSON file")
+    ap.add_argument("--trace-alloc", action="store_true", help="With --instrument, also track allocations")
+    ap.add_argument("--profile", type=str, default=None, metavar="PSTATS",
+                    help="cProfile the simulation loop and dump pstats here")
+    args = ap.parse_args()
+    if args.instrument is not None or args.profile is not None:
+        session = instrument.session(args.instrument, trace_alloc=args.trace_alloc, profile_path=args.profile)
+    else:
+        session = contextlib.nullcontext(instrument.NULL)
+    with session as inst, inst.phase("run_backtest"):
+        run_backtest(store=PriceStore() if args.offline else None)
 
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+RSI + regime + momentum rotation (momentum-eth-btc.py) over a basket of N assets.
+
+The rules of the two-asset script are generalized with the first symbol as
+the reference asset (BTC in the original):
+
+- regime: bullish while the reference close is above its 200-bar SMA;
+- entries/exits: RSI(rsi_bars) crosses of every asset, as before;
+- momentum: asset j > 0 scores RSI(asset_j / reference) / 100 + 0.5, the
+  reference scores 1 - mean of those RSIs / 100 + 0.5, each raised to
+  momentum_exponent. With two assets this is the ETH/BTC RSI tilt exactly.
+
+The simulation keeps one length-N quantity vector and computes weights,
+threshold checks, fees and trades for all assets as array operations. Within
+a bar the trades run in one of two orders (ORDERS, --order):
+
+- sells_first (default): all sells execute before the buys, and buys are
+  filled in symbol order from the cash left (the last one cut back to it, as
+  rebalance() does), so sale proceeds are reinvested on the same bar;
+- symbol: every asset is rebalanced in symbol order against the cash left by
+  the ones before it, as momentum-eth-btc.py does for BTC then ETH. A buy
+  that comes before the sale funding it is cut back (or skipped) and only
+  completes on a later bar.
+
+With --symbols BTCUSDT,ETHUSDT --order symbol the result is the two-asset
+script's exactly. sells_first differs from it on every bar where BTC is
+bought while ETH is sold, and the paths diverge from there (2024-01-01 to
+2025-09-27 offline: $18,658 against the script's $23,998).
+
+Assets without a candle on a bar (not listed yet, gaps) are not traded on it:
+their positions keep the last close for valuation and are left out of the
+weights; the investable amount is reduced by their value.
+
+Example:
+  python momentum_basket.py --symbols BTCUSDT,ETHUSDT,SOLUSDT,BNBUSDT --start 2024-01-01 --end 2025-09-27
+"""
+import argparse
+import datetime as dt
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+import indicators
+import instrument
+from bars import DAY_MS, date_str, to_ms
+from dca_engine import max_drawdown
+from panel import PricePanel, load_panel
+from price_store import PriceStore
+
+
+@dataclass
+class BasketParams:
+    """momentum-eth-btc.py Parameters; any object with these attributes works."""
+    rsi_bars: int = 8
+    eth_btc_rsi_bars: int = 5          # RSI length of every asset / reference ratio
+    bearish_rsi_entry: float = 65
+    bearish_rsi_exit: float = 70
+    bullish_rsi_entry: float = 80
+    bullish_rsi_exit: float = 65
+    regime_filter_ma_length: int = 200
+    allocation: float = 0.98
+    rebalance_threshold: float = 0.275
+    momentum_exponent: float = 3.5
+    trading_fee: float = 0.0030
+    lookback_days: int = 200
+
+
+# ------------------------------
+# Indicators
+# ------------------------------
+
+def _segment(values: np.ndarray, fn) -> np.ndarray:
+    """fn over the part of `values` from its first non-NaN entry on (NaN before it)."""
+    out = np.full(len(values), np.nan)
+    ok = np.flatnonzero(~np.isnan(values))
+    if len(ok):
+        out[ok[0]:] = fn(values[ok[0]:])
+    return out
+
+
+def basket_indicators(panel: PricePanel, p=BasketParams()) -> Dict[str, np.ndarray]:
+    """
+    Forward-filled closes, per-asset RSI, momentum scores (T x N) and the
+    reference SMA (T). Indicators start at each asset's first candle.
+    """
+    close = panel.filled()
+    n = close.shape[1]
+    rsi = np.column_stack([_segment(close[:, j], lambda v: indicators.rsi(v, p.rsi_bars, exact=True)) for j in range(n)])
+    rel = np.full(close.shape, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for j in range(1, n):
+            rel[:, j] = _segment(close[:, j] / close[:, 0], lambda v: indicators.rsi(v, p.eth_btc_rsi_bars, exact=True))
+    score = np.where(np.isnan(rel), 0.5, (rel / 100.0) + 0.5)
+    if n > 1:
+        others = rel[:, 1:]
+        count = (~np.isnan(others)).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(np.isnan(others), 0.0, others).sum(axis=1) / count
+        score[:, 0] = np.where(count > 0, (1.0 - (mean / 100.0)) + 0.5, 0.5)
+    else:
+        score[:, 0] = 0.5
+    # Python's float pow, not np.power, as in simulate_momentum_batch
+    e = p.momentum_exponent
+    score = np.array([v ** e for v in score.ravel().tolist()]).reshape(score.shape)
+    sma = _segment(close[:, 0], lambda v: indicators.sma(v, p.regime_filter_ma_length, exact=True))
+    return {"close": close, "rsi": rsi, "score": score, "sma": sma}
+
+
+# ------------------------------
+# Simulation
+# ------------------------------
+
+ORDERS = ("sells_first", "symbol")
+
+
+@dataclass
+class BasketResult:
+    # per-bar columns over the backtest window (end of bar, after rebalancing)
+    cash: np.ndarray
+    values: np.ndarray           # T x N position values
+    equity: np.ndarray
+    hodl_value: np.ndarray       # reference asset bought on the first bar
+    trades: Dict[str, np.ndarray]
+
+
+def _fold(start: float, amounts: np.ndarray) -> np.ndarray:
+    """start + a0, (start + a0) + a1, ... added left to right like a Python loop."""
+    return np.add.accumulate(np.concatenate(([start], amounts)))[1:]
+
+
+def simulate_basket(
+    close: np.ndarray,
+    valid: np.ndarray,
+    rsi: np.ndarray,
+    score: np.ndarray,
+    ref_sma: np.ndarray,
+    start: int,
+    initial_capital: float = 10_000.0,
+    p=BasketParams(),
+    times: Optional[np.ndarray] = None,
+    symbols: Optional[Sequence[str]] = None,
+    order: str = "sells_first",
+) -> BasketResult:
+    """
+    Simulate the basket over T x N columns (close forward-filled, valid the
+    candle mask). Bars before `start` only feed indicators. Trades are
+    recorded as columns when `times` (epoch ms per bar) is given. `order` is
+    one of ORDERS (see the module docstring).
+    """
+    if order not in ORDERS:
+        raise ValueError(f"order must be one of {', '.join(ORDERS)}, got {order!r}")
+    close = np.asarray(close, dtype=np.float64)
+    valid = np.asarray(valid, dtype=bool)
+    t, n = close.shape
+    first = max(1, start)
+    fee = p.trading_fee
+    symbols = np.asarray(symbols if symbols is not None else [str(j) for j in range(n)])
+
+    rows = t - start
+    cash = float(initial_capital)
+    qty = np.zeros(n)
+    cash_col = np.full(rows, cash)
+    values_col = np.zeros((rows, n))
+    parts: List[Dict[str, np.ndarray]] = []   # trade columns per bar and side
+
+    for i in range(first, t):
+        px = close[i]
+        tradable = valid[i] & (px > 0)
+        mark = np.where(np.isnan(px), 0.0, px)
+        value = qty * mark
+
+        sma = ref_sma[i]
+        bullish = np.isnan(sma) or px[0] > sma
+        rsi_entry = p.bullish_rsi_entry if bullish else p.bearish_rsi_entry
+        rsi_exit = p.bullish_rsi_exit if bullish else p.bearish_rsi_exit
+
+        now, prev = rsi[i], rsi[i - 1]
+        # NaN compares False, like cross_above / cross_below
+        keep = np.where(qty > 0, ~((now < rsi_exit) & (prev > rsi_exit)), (now >= rsi_entry) & (prev < rsi_entry))
+        w = np.where(keep & tradable, score[i], 0.0)
+        w_sum = w.sum()
+        if w_sum > 0:
+            w = w / w_sum
+
+        total_equity = float(_fold(cash, value)[-1]) if n else cash
+        investable = total_equity * p.allocation - value[~tradable].sum()
+        target = investable * w
+        delta = target - value
+        thr = p.rebalance_threshold * total_equity
+        act = tradable & ~(np.abs(delta) < thr)
+
+        if order == "symbol":
+            # rebalance() one asset at a time, each against the cash left by the previous ones
+            jb, sides, tq, tfee, cash_after = [], [], [], [], []
+            for j in np.flatnonzero(act).tolist():
+                dj = delta[j]
+                if dj > 0:
+                    if dj * (1.0 + fee) > cash:
+                        dj = cash / (1.0 + fee)
+                        if abs(dj) < thr:
+                            continue
+                    q = (dj * (1.0 - fee)) / px[j]
+                    qty[j] += q
+                    cash -= (dj + dj * fee)
+                    sides.append("BUY")
+                    tfee.append(dj * fee)
+                else:
+                    q = min(qty[j], -dj / px[j])
+                    gross = q * px[j]
+                    qty[j] -= q
+                    cash += gross * (1.0 - fee)
+                    sides.append("SELL")
+                    tfee.append(gross * fee)
+                jb.append(j)
+                tq.append(q)
+                cash_after.append(cash)
+            cash = float(cash)
+            if times is not None and jb:
+                jb = np.asarray(jb, dtype=np.int64)
+                parts.append({"bar": np.full(len(jb), i), "asset": jb, "side": np.asarray(sides),
+                              "qty": np.asarray(tq), "fee": np.asarray(tfee), "target_value": target[jb],
+                              "usdt_value": np.asarray(cash_after)})
+        else:
+            sells = np.flatnonzero(act & ~(delta > 0))
+            if len(sells):
+                sq = np.minimum(qty[sells], -delta[sells] / px[sells])
+                gross = sq * px[sells]
+                qty[sells] -= sq
+                cash_after = _fold(cash, gross * (1.0 - fee))
+                cash = float(cash_after[-1])
+                if times is not None:
+                    parts.append({"bar": np.full(len(sells), i), "asset": sells,
+                                  "side": np.full(len(sells), "SELL"), "qty": sq, "fee": gross * fee,
+                                  "target_value": target[sells], "usdt_value": cash_after})
+
+            buys = np.flatnonzero(act & (delta > 0))
+            if len(buys):
+                d = delta[buys].copy()
+                # cash before each buy if all earlier ones are filled in full
+                left = np.subtract.accumulate(np.concatenate(([cash], d + d * fee)))
+                over = d * (1.0 + fee) > left[:-1]
+                k = int(np.argmax(over)) if over.any() else len(buys)
+                cash_after = list(left[1:k + 1])
+                cash = float(left[k])
+                # from the first buy that does not fit: cut back to the cash left, or skip
+                done = list(range(k))
+                for m in range(k, len(buys)):
+                    dm = d[m]
+                    if dm * (1.0 + fee) > cash:
+                        dm = cash / (1.0 + fee)
+                        if abs(dm) < thr:
+                            continue
+                    d[m] = dm
+                    cash -= (dm + dm * fee)
+                    cash_after.append(cash)
+                    done.append(m)
+                done = np.asarray(done, dtype=np.int64)
+                jb, d = buys[done], d[done]
+                bq = (d * (1.0 - fee)) / px[jb]
+                qty[jb] += bq
+                if times is not None and len(jb):
+                    parts.append({"bar": np.full(len(jb), i), "asset": jb, "side": np.full(len(jb), "BUY"),
+                                  "qty": bq, "fee": d * fee, "target_value": target[jb],
+                                  "usdt_value": np.asarray(cash_after)})
+
+        k = i - start
+        cash_col[k] = cash
+        values_col[k] = qty * mark
+
+    equity = cash_col.copy()
+    for j in range(n):
+        equity += values_col[:, j]
+    hodl_qty = (initial_capital * (1.0 - fee)) / close[start, 0]
+    trades: Dict[str, np.ndarray] = {}
+    if times is not None and parts:
+        cols = {k: np.concatenate([part[k] for part in parts]) for k in parts[0]}
+        bar, asset = cols.pop("bar"), cols.pop("asset")
+        trades = {"time": np.asarray(times)[bar], "symbol": symbols[asset], "side": cols.pop("side"),
+                  "price": close[bar, asset], **cols}
+    return BasketResult(cash=cash_col, values=values_col, equity=equity,
+                        hodl_value=hodl_qty * close[start:, 0], trades=trades)
+
+
+# ------------------------------
+# Backtest
+# ------------------------------
+
+def cagr(equity: np.ndarray, first_ms: int, last_ms: int) -> float:
+    """momentum-eth-btc.py cagr() on epoch-ms bounds."""
+    days = (last_ms - first_ms) // DAY_MS or 1
+    years = days / 365.2425
+    if years < 1:
+        return (equity[-1] / equity[0] - 1.0) * (365.2425 / days)
+    return (equity[-1] / equity[0]) ** (1 / years) - 1.0
+
+
+def run_basket(symbols: Sequence[str], start: str, end: str, initial_capital: float = 10_000.0,
+               p=BasketParams(), store: Optional[PriceStore] = None, verbose: bool = True,
+               order: str = "sells_first"):
+    """Load the panel (with indicator lookback), simulate and summarize; returns (panel, result, summary)."""
+    inst = instrument.active()
+    start_ms = to_ms(start)
+    with inst.phase("load"):
+        panel = load_panel(symbols, pd.Timestamp(start_ms - p.lookback_days * DAY_MS, unit="ms", tz="UTC"),
+                           end, store=store)
+    if not len(panel) or panel.close_time[-1] < start_ms:
+        raise RuntimeError("Not enough data for the requested period.")
+    with inst.phase("indicators"):
+        ind = basket_indicators(panel, p)
+    s = int(np.searchsorted(panel.close_time, start_ms, side="left"))
+    with inst.phase("simulate"), inst.profile():
+        res = simulate_basket(ind["close"], panel.valid, ind["rsi"], ind["score"], ind["sma"], s,
+                              initial_capital, p, times=panel.close_time, symbols=panel.symbols, order=order)
+    inst.count("bars", (len(panel) - s) * len(symbols))
+    inst.count("trades", len(res.trades.get("time", ())))
+
+    first = max(1, s) - s
+    times = panel.close_time[s:]
+    summary = {
+        "Start": date_str(times[first]),
+        "End": date_str(times[-1]),
+        "CAGR_%": cagr(res.equity[first:], times[first], times[-1]) * 100.0,
+        "Max_DD_%": max_drawdown(res.equity[first:]) * 100.0,
+        "Final_Equity_$": float(res.equity[-1]),
+        "Trades": len(res.trades.get("time", ())),
+        "HODL_CAGR_%": cagr(res.hodl_value, times[0], times[-1]) * 100.0,
+        "HODL_Max_DD_%": max_drawdown(res.hodl_value) * 100.0,
+    }
+    if verbose:
+        print(f"\n=== Basket momentum ({', '.join(panel.symbols)}) ===")
+        print(f"Start:   {summary['Start']}  |  End: {summary['End']}")
+        print(f"CAGR:    {summary['CAGR_%']:.2f}%")
+        print(f"Max DD:  {summary['Max_DD_%']:.2f}%")
+        print(f"Final equity: ${summary['Final_Equity_$']:,.2f}")
+        print(f"Trades:  {summary['Trades']}")
+        print(f"{panel.symbols[0]} HODL CAGR: {summary['HODL_CAGR_%']:.2f}%  |  Max DD: {summary['HODL_Max_DD_%']:.2f}%")
+    return panel, res, summary
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="RSI + regime + momentum rotation over a basket of assets.")
+    p.add_argument("--symbols", type=str, default="BTCUSDT,ETHUSDT",
+                   help="Comma-separated symbols; the first one is the reference asset")
+    p.add_argument("--start", type=str, default="2024-01-01", help="Backtest start (YYYY-MM-DD)")
+    p.add_argument("--end", type=str, default=dt.date.today().isoformat(), help="Backtest end (YYYY-MM-DD)")
+    p.add_argument("--initial-capital", type=float, default=10_000.0)
+    p.add_argument("--order", choices=ORDERS, default="sells_first",
+                   help="Trade order within a bar: all sells before the buys (default), or one asset at a time "
+                        "in symbol order like momentum-eth-btc.py")
+    p.add_argument("--offline", action="store_true", help="Use the bundled public/data daily closes instead of Binance.")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    run_basket(symbols, args.start, args.end, args.initial_capital, store=PriceStore() if args.offline else None,
+               order=args.order)
+
+
+if __name__ == "__main__":
+    main()
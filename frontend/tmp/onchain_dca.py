@@ -0,0 +1,740 @@
+#!/usr/bin/env python3
+"""
+Fixed-point simulation of SmartBtcDcaV2 (contracts/contracts/strategies).
+
+The contract decides in integer math: USD values scaled 1e8, weights in bps,
+kKicker scaled 1e6, and every division truncates. Its inputs come from
+TechnicalIndicators, also in integers: an EWMA variance of winsorized simple
+returns scaled 1e16, an integer sqrt, and the drawdown scaled 1e8. This
+module reproduces shouldRebalance and the indicator update exactly over
+(T, N) arrays, where the N columns are scenarios (a price path and a
+parameter set) advanced together in int64:
+
+- Products that can exceed int64 go through muldiv(). Examples are
+  balance x price and USD 1e8 x 10**decimals. muldiv() is an exact
+  floor(a * b / d): a float64 estimate of the quotient, corrected by the
+  remainder computed in wrapping int64 arithmetic.
+- Everything else stays plain int64.
+
+A float64 mirror of the same rules runs in lock-step: real-valued
+indicators, no truncation. compare_scenarios() therefore measures only the
+rounding divergence, as decision mismatches per bar and as the final NAV
+difference. reference_should_rebalance() and reference_indicators() are
+line-by-line transcriptions with Python ints; self_check() verifies the
+vectorized engine against them.
+
+The contract's rules also differ from the adaptive_dca_btc float model,
+beyond rounding:
+- base DCA is only spent from the balance above the buffer;
+- the kicker is capped by cmax and the balance only;
+- there is no minimum trade size;
+- a band trade of size zero falls through to DCA;
+- the vol input is an EWMA of simple returns (lambda 0.94, winsorized at
+  20%) without the rolling-RV max.
+
+Swaps fill at the feed price, less fee_bps, in the token's smallest units.
+
+Examples:
+  python onchain_dca.py --scenarios 1000000 --years 2 --workers 8 --out divergence.csv
+  python onchain_dca.py --self-check 200000
+"""
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass, fields
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# shouldRebalance outcomes
+NONE, BAND_SELL, BAND_BUY, DCA_BUY = 0, 1, 2, 3
+KIND_NAMES = ("none", "band_sell", "band_buy", "dca_buy")
+
+# TechnicalIndicators constants
+SCALE = 10 ** 8
+LAMBDA_BPS = 9400
+SQRT_365_1E8 = 1910497317
+CLAMP_1E8 = SCALE * 20 // 100
+
+_INT64_MAX = np.iinfo(np.int64).max
+_MULDIV_MAX_D = 1 << 51
+_MULDIV_MAX_Q = float(1 << 62)
+
+
+# ------------------------------
+# Fixed-point arithmetic
+# ------------------------------
+
+def muldiv(a, b, d, cap=None) -> np.ndarray:
+    """
+    Exact floor(a * b / d) for int64 a, b >= 0 and d > 0 (OverflowError if
+    the result does not fit in int64). With `cap` the result is
+    min(floor(a * b / d), cap) and never overflows. Products that fit are
+    divided directly. Otherwise, for d < 2**51, the float64 estimate of the quotient
+    is off by a few units at most, so the remainder a*b - q*d is small and
+    wrapping int64 arithmetic gets it exactly. The rare elements left over
+    go through Python ints.
+    """
+    a, b, d = np.broadcast_arrays(np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64),
+                                  np.asarray(d, dtype=np.int64))
+    if np.any(d <= 0):
+        raise ValueError("muldiv divisor must be positive")
+    with np.errstate(over="ignore", invalid="ignore"):
+        fits = (a == 0) | (b <= _INT64_MAX // np.maximum(a, 1))
+        out = np.floor_divide(a * b, d)
+        if fits.all():
+            return out if cap is None else np.minimum(out, cap)
+        est = np.floor(a.astype(np.float64) * b.astype(np.float64) / d.astype(np.float64))
+        wide = ~fits & (d < _MULDIV_MAX_D) & (est < _MULDIV_MAX_Q)
+        q = np.where(wide, est, 0.0).astype(np.int64)
+        rem = a * b - q * d
+        out = np.where(wide, q + np.floor_divide(rem, d), out)
+    rest = ~fits & ~wide
+    if rest.any():
+        exact = [x * y // z for x, y, z in zip(a[rest].tolist(), b[rest].tolist(), d[rest].tolist())]
+        if cap is not None:
+            caps = np.broadcast_to(np.asarray(cap, dtype=np.int64), out.shape)[rest].tolist()
+            exact = [min(x, c) for x, c in zip(exact, caps)]
+        elif max(exact) > _INT64_MAX:
+            raise OverflowError("muldiv result exceeds the int64 range")
+        out[rest] = exact
+    return out if cap is None else np.minimum(out, cap)
+
+
+def isqrt(x) -> np.ndarray:
+    """floor(sqrt(x)) for int64 0 <= x < 2**62, as the Babylonian loop of _sqrt1e16_to_1e8."""
+    x = np.asarray(x, dtype=np.int64)
+    y = np.floor(np.sqrt(x.astype(np.float64))).astype(np.int64)
+    y -= (y * y > x)
+    y += ((y + 1) * (y + 1) <= x)
+    return y
+
+
+# ------------------------------
+# TechnicalIndicators
+# ------------------------------
+
+def to_1e8(price: np.ndarray) -> np.ndarray:
+    """Float USD prices as Chainlink 1e8 answers."""
+    return np.rint(np.asarray(price, dtype=np.float64) * SCALE).astype(np.int64)
+
+
+def indicators_fixed(price1e8: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (vol1e8, dd1e8) after each row of a (T, ...) int64 price array, as
+    recomputeIndicators leaves them after that day: EWMA vol annualized and
+    drawdown from the running peak, both 0 on the first row.
+    """
+    p = np.asarray(price1e8, dtype=np.int64)
+    prev, curr = p[:-1], p[1:]
+    diff = curr - prev
+    # int256 division truncates toward zero
+    r = np.sign(diff) * muldiv(np.abs(diff), SCALE, prev)
+    r = np.clip(r, -CLAMP_1E8, CLAMP_1E8)
+    r2 = r * r                                      # <= 4e14
+    sigma2 = np.zeros_like(p)
+    s = np.zeros(p.shape[1:], dtype=np.int64)
+    for t in range(len(r2)):
+        s = (s * LAMBDA_BPS + r2[t] * (10000 - LAMBDA_BPS)) // 10000   # < 4e18
+        sigma2[t + 1] = s
+    vol = isqrt(sigma2) * SQRT_365_1E8 // SCALE     # <= 2e7 * 1.9e9
+    vol[0] = 0
+    peak = np.maximum.accumulate(p, axis=0)
+    dd = muldiv(peak - p, SCALE, peak)
+    return vol, dd
+
+
+def indicators_float(price: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """indicators_fixed in real numbers (annualized vol and drawdown as fractions)."""
+    p = np.asarray(price, dtype=np.float64)
+    r = np.clip((p[1:] - p[:-1]) / p[:-1], -0.2, 0.2)
+    r2 = r * r
+    sigma2 = np.zeros_like(p)
+    s = np.zeros(p.shape[1:])
+    lam = LAMBDA_BPS / 10000.0
+    for t in range(len(r2)):
+        s = lam * s + (1.0 - lam) * r2[t]
+        sigma2[t + 1] = s
+    vol = np.sqrt(sigma2) * np.sqrt(365.0)
+    peak = np.maximum.accumulate(p, axis=0)
+    return vol, (peak - p) / peak
+
+
+# ------------------------------
+# SmartBtcDcaV2.shouldRebalance
+# ------------------------------
+
+@dataclass
+class ContractParams:
+    """
+    SmartBtcDcaV2.initialize arguments (defaults from
+    scripts/manage/instantiate-power-btc-dca.ts). Every field but the
+    decimals may be a length-N array, one value per scenario.
+    """
+    base_dca_stable: object = 100 * 10 ** 6
+    frequency_days: object = 7
+    target_btc_bps: object = 8000
+    band_delta_bps: object = 1000
+    buffer_mult_x: object = 9
+    cmax_mult_x: object = 3
+    rebalance_cap_bps: object = 500
+    k_kicker_1e6: object = 50_000
+    threshold_mode: object = True
+    risk_decimals: int = 8
+    stable_decimals: int = 6
+
+    def columns(self, n: int) -> Dict[str, np.ndarray]:
+        """Per-scenario int64 columns (threshold_mode as bool)."""
+        out = {}
+        for f in fields(self):
+            if f.name in ("risk_decimals", "stable_decimals"):
+                continue
+            dtype = bool if f.name == "threshold_mode" else np.int64
+            out[f.name] = np.broadcast_to(np.asarray(getattr(self, f.name), dtype=dtype), (n,))
+        return out
+
+
+def should_rebalance(price1e8, stable, risk, vol1e8, dd1e8, q: Dict[str, np.ndarray],
+                     risk_decimals: int = 8, stable_decimals: int = 6) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (kind, amountIn) of shouldRebalance for N scenarios: balances in token
+    units, indicators scaled 1e8, `q` from ContractParams.columns(). The
+    frequency check is left to the caller.
+    """
+    rd, sd = 10 ** risk_decimals, 10 ** stable_decimals
+    price1e8 = np.asarray(price1e8, dtype=np.int64)
+    n = len(stable)
+    risk_value = muldiv(risk, price1e8, rd) if risk_decimals > 0 else np.zeros(n, dtype=np.int64)
+    stable_value = muldiv(stable, SCALE, sd) if stable_decimals > 0 else np.zeros(n, dtype=np.int64)
+    nav = stable_value + risk_value
+    live = (price1e8 > 0) & (nav > 0)
+    safe_nav = np.where(live, nav, 1)
+    safe_price = np.where(price1e8 > 0, price1e8, 1)
+
+    kind = np.zeros(n, dtype=np.int8)
+    amount = np.zeros(n, dtype=np.int64)
+    target, band = q["target_btc_bps"], q["band_delta_bps"]
+    lower = np.where(target > band, target - band, 0)
+    upper = target + band
+    cap = muldiv(safe_nav, q["rebalance_cap_bps"], 10000)
+
+    w_bps = muldiv(risk_value, 10000, safe_nav)
+    thr = q["threshold_mode"] & live
+    sell_zone = thr & (w_bps > upper) & (risk > 0)
+    buy_zone = thr & ~sell_zone & (w_bps < lower)
+    if sell_zone.any():
+        target_value = muldiv(safe_nav, upper, 10000)
+        trade = np.minimum(np.maximum(risk_value - target_value, 0), cap)
+        amount_risk = muldiv(trade, rd, safe_price)
+        sell = sell_zone & (risk_value > target_value) & (amount_risk > 0)
+        kind[sell] = BAND_SELL
+        amount[sell] = amount_risk[sell]
+    if buy_zone.any():
+        target_value = muldiv(safe_nav, lower, 10000)
+        trade = np.minimum(np.minimum(np.maximum(target_value - risk_value, 0), cap), stable_value)
+        buy = buy_zone & (target_value > risk_value) & (trade > 0)
+        kind[buy] = BAND_BUY
+        amount[buy] = muldiv(trade, sd, SCALE)[buy]   # may be 0: the contract still returns the action
+
+    # DCA + kicker where no band trade was returned
+    rest = live & (kind == NONE)
+    base = q["base_dca_stable"]
+    buffer_target = q["buffer_mult_x"] * base
+    available = np.where(stable > buffer_target, np.minimum(stable - buffer_target, base), 0)
+    kicker = muldiv(q["k_kicker_1e6"], vol1e8, 10 ** 6)
+    kicker = muldiv(kicker, dd1e8, SCALE)
+    kicker = muldiv(kicker, safe_nav, SCALE, cap=muldiv(q["cmax_mult_x"] * base, SCALE, sd))
+    total = np.minimum(muldiv(available, SCALE, sd) + kicker, stable_value)
+    amount_stable = muldiv(total, sd, SCALE)
+    dca = rest & (total > 0) & (amount_stable > 0)
+    kind[dca] = DCA_BUY
+    amount[dca] = amount_stable[dca]
+    return kind, amount
+
+
+def should_rebalance_float(price, stable_usd, risk_qty, vol, dd, f: Dict[str, np.ndarray]
+                           ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    should_rebalance in real numbers: balances in USD and BTC, parameters as
+    fractions (float_params()); amounts in USD for buys, BTC for sells.
+    """
+    n = len(stable_usd)
+    risk_value = risk_qty * price
+    nav = stable_usd + risk_value
+    live = (price > 0) & (nav > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        w = np.where(live, risk_value / nav, 0.0)
+    kind = np.zeros(n, dtype=np.int8)
+    amount = np.zeros(n)
+    lower = np.maximum(f["target_btc_weight"] - f["band_delta"], 0.0)
+    upper = f["target_btc_weight"] + f["band_delta"]
+    cap = nav * f["rebalance_cap_frac"]
+
+    thr = f["threshold_mode"] & live
+    sell_zone = thr & (w > upper) & (risk_qty > 0)
+    buy_zone = thr & ~sell_zone & (w < lower)
+    if sell_zone.any():
+        target_value = nav * upper
+        trade = np.minimum(np.maximum(risk_value - target_value, 0.0), cap)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            amount_risk = trade / price
+        sell = sell_zone & (risk_value > target_value) & (amount_risk > 0)
+        kind[sell] = BAND_SELL
+        amount[sell] = amount_risk[sell]
+    if buy_zone.any():
+        target_value = nav * lower
+        trade = np.minimum(np.minimum(np.maximum(target_value - risk_value, 0.0), cap), stable_usd)
+        buy = buy_zone & (target_value > risk_value) & (trade > 0)
+        kind[buy] = BAND_BUY
+        amount[buy] = trade[buy]
+
+    rest = live & (kind == NONE)
+    base = f["base_dca_usd"]
+    buffer_target = f["buffer_mult"] * base
+    available = np.where(stable_usd > buffer_target, np.minimum(stable_usd - buffer_target, base), 0.0)
+    kicker = np.minimum(f["k_kicker"] * vol * dd * nav, f["cmax_mult"] * base)
+    total = np.minimum(available + kicker, stable_usd)
+    dca = rest & (total > 0)
+    kind[dca] = DCA_BUY
+    amount[dca] = total[dca]
+    return kind, amount
+
+
+def float_params(q: Dict[str, np.ndarray], stable_decimals: int = 6) -> Dict[str, np.ndarray]:
+    """The contract parameters as the real numbers they encode."""
+    return {
+        "base_dca_usd": q["base_dca_stable"] / 10.0 ** stable_decimals,
+        "target_btc_weight": q["target_btc_bps"] / 10000.0,
+        "band_delta": q["band_delta_bps"] / 10000.0,
+        "buffer_mult": q["buffer_mult_x"].astype(np.float64),
+        "cmax_mult": q["cmax_mult_x"].astype(np.float64),
+        "rebalance_cap_frac": q["rebalance_cap_bps"] / 10000.0,
+        "k_kicker": q["k_kicker_1e6"] / 1e6,
+        "threshold_mode": q["threshold_mode"],
+    }
+
+
+# ------------------------------
+# Scenarios
+# ------------------------------
+
+@dataclass
+class ScenarioResult:
+    # fixed-point engine (token units)
+    stable: np.ndarray
+    risk: np.ndarray
+    trades: np.ndarray
+    # float mirror (USD, BTC); None when it was not run
+    stable_float: Optional[np.ndarray] = None
+    risk_float: Optional[np.ndarray] = None
+    trades_float: Optional[np.ndarray] = None
+    # bars whose decision differs, the first such bar (-1 if none) and the decisions on it
+    mismatches: Optional[np.ndarray] = None
+    first_mismatch: Optional[np.ndarray] = None
+    first_kinds: Optional[np.ndarray] = None
+
+
+def _fill_fixed(kind, amount, price1e8, stable, risk, e: int, fee_bps: int):
+    """Balances after the swaps of `kind`/`amount` at price1e8 (e = riskDecimals + 8 - stableDecimals)."""
+    sell = kind == BAND_SELL
+    buy = (kind == BAND_BUY) | (kind == DCA_BUY)
+    safe_price = np.where(price1e8 > 0, price1e8, 1)
+    stable_out = muldiv(np.where(sell, amount, 0), safe_price, 10 ** e)
+    risk_out = muldiv(np.where(buy, amount, 0), 10 ** e, safe_price)
+    if fee_bps:
+        stable_out = muldiv(stable_out, 10000 - fee_bps, 10000)
+        risk_out = muldiv(risk_out, 10000 - fee_bps, 10000)
+    stable = stable + stable_out - np.where(buy, amount, 0)
+    risk = risk + risk_out - np.where(sell, amount, 0)
+    return stable, risk
+
+
+def run_scenarios(price: np.ndarray, initial_stable, params: ContractParams, fee_bps: int = 0,
+                  float_model: bool = True) -> ScenarioResult:
+    """
+    Simulate N scenarios over the daily USD closes `price` (T, N). Every
+    column starts with `initial_stable` (token units) and no BTC and is
+    evaluated once a day whenever frequency_days have passed since its last
+    executed action, like the contract's lastTimestamp. With float_model the
+    float mirror runs alongside and the decisions of both are compared bar
+    by bar.
+    """
+    price = np.asarray(price, dtype=np.float64)
+    t_len, n = price.shape
+    rd, sd = params.risk_decimals, params.stable_decimals
+    e = rd + 8 - sd
+    if e < 0:
+        raise ValueError("riskDecimals + 8 must be at least stableDecimals")
+    q = params.columns(n)
+    price1e8 = to_1e8(price)
+    vol1e8, dd1e8 = indicators_fixed(price1e8)
+
+    stable = np.broadcast_to(np.asarray(initial_stable, dtype=np.int64), (n,)).copy()
+    risk = np.zeros(n, dtype=np.int64)
+    trades = np.zeros(n, dtype=np.int64)
+    last = np.full(n, -(1 << 40), dtype=np.int64)
+    freq = q["frequency_days"]
+
+    if float_model:
+        f = float_params(q, sd)
+        vol, dd = indicators_float(price)
+        stable_f = stable / 10.0 ** sd
+        risk_f = np.zeros(n)
+        trades_f = np.zeros(n, dtype=np.int64)
+        last_f = last.copy()
+        fee = fee_bps / 10000.0
+        mismatches = np.zeros(n, dtype=np.int64)
+        first = np.full(n, -1, dtype=np.int64)
+        first_kinds = np.zeros((n, 2), dtype=np.int8)
+
+    for t in range(t_len):
+        due = t >= last + freq
+        kind, amount = should_rebalance(price1e8[t], stable, risk, vol1e8[t], dd1e8[t], q, rd, sd)
+        kind = np.where(due, kind, NONE).astype(np.int8)
+        stable, risk = _fill_fixed(kind, amount, price1e8[t], stable, risk, e, fee_bps)
+        acted = kind != NONE
+        last = np.where(acted, t, last)
+        trades += acted
+
+        if float_model:
+            due_f = t >= last_f + freq
+            kind_f, amount_f = should_rebalance_float(price[t], stable_f, risk_f, vol[t], dd[t], f)
+            kind_f = np.where(due_f, kind_f, NONE).astype(np.int8)
+            sell = kind_f == BAND_SELL
+            buy = (kind_f == BAND_BUY) | (kind_f == DCA_BUY)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                bought = np.where(buy, amount_f / price[t], 0.0)
+            stable_f = stable_f + np.where(sell, amount_f * price[t], 0.0) * (1.0 - fee) - np.where(buy, amount_f, 0.0)
+            risk_f = risk_f + bought * (1.0 - fee) - np.where(sell, amount_f, 0.0)
+            acted_f = kind_f != NONE
+            last_f = np.where(acted_f, t, last_f)
+            trades_f += acted_f
+
+            diff = kind != kind_f
+            new = diff & (first < 0)
+            first[new] = t
+            first_kinds[new, 0] = kind[new]
+            first_kinds[new, 1] = kind_f[new]
+            mismatches += diff
+
+    res = ScenarioResult(stable=stable, risk=risk, trades=trades)
+    if float_model:
+        res.stable_float, res.risk_float, res.trades_float = stable_f, risk_f, trades_f
+        res.mismatches, res.first_mismatch, res.first_kinds = mismatches, first, first_kinds
+    return res
+
+
+def compare_scenarios(res: ScenarioResult, last_price: np.ndarray, params: ContractParams) -> Dict[str, np.ndarray]:
+    """Per-scenario final NAVs of both engines, their relative difference and the decision mismatches."""
+    nav_fixed = res.stable / 10.0 ** params.stable_decimals + res.risk / 10.0 ** params.risk_decimals * last_price
+    nav_float = res.stable_float + res.risk_float * last_price
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel = np.where(nav_float != 0, nav_fixed / nav_float - 1.0, 0.0)
+    return {
+        "nav_fixed": nav_fixed,
+        "nav_float": nav_float,
+        "nav_rel_diff": rel,
+        "trades_fixed": res.trades,
+        "trades_float": res.trades_float,
+        "mismatched_bars": res.mismatches,
+        "first_mismatch_bar": res.first_mismatch,
+        "first_kind_fixed": res.first_kinds[:, 0],
+        "first_kind_float": res.first_kinds[:, 1],
+    }
+
+
+# ------------------------------
+# Python-int reference
+# ------------------------------
+
+def reference_should_rebalance(price1e8: int, stable: int, risk: int, vol1e8: int, dd1e8: int,
+                               p: Dict[str, int], rdec: int = 8, sdec: int = 6) -> Tuple[int, int]:
+    """shouldRebalance transcribed with Python ints (uint256 never overflows in these ranges)."""
+    if price1e8 <= 0:
+        return NONE, 0
+    risk_value = (risk * price1e8) // (10 ** rdec) if rdec > 0 else 0
+    stable_value = (stable * 10 ** 8) // (10 ** sdec) if sdec > 0 else 0
+    nav = stable_value + risk_value
+    if nav == 0:
+        return NONE, 0
+    w_bps = (risk_value * 10000) // nav
+    target, band = p["target_btc_bps"], p["band_delta_bps"]
+    lower = target - band if target > band else 0
+    upper = target + band
+    if p["threshold_mode"]:
+        if w_bps > upper and risk > 0:
+            target_value = (nav * upper) // 10000
+            if risk_value > target_value:
+                excess = risk_value - target_value
+                cap = (nav * p["rebalance_cap_bps"]) // 10000
+                trade = excess if excess < cap else cap
+                amount_risk = (trade * 10 ** rdec) // price1e8
+                if amount_risk > 0:
+                    return BAND_SELL, amount_risk
+        elif w_bps < lower:
+            target_value = (nav * lower) // 10000
+            if target_value > risk_value:
+                shortfall = target_value - risk_value
+                cap = (nav * p["rebalance_cap_bps"]) // 10000
+                trade = shortfall if shortfall < cap else cap
+                max_usd = (stable * 10 ** 8) // (10 ** sdec)
+                if trade > max_usd:
+                    trade = max_usd
+                if trade > 0:
+                    return BAND_BUY, (trade * 10 ** sdec) // 10 ** 8
+    base = p["base_dca_stable"]
+    buffer_target = p["buffer_mult_x"] * base
+    available = 0
+    if stable > buffer_target:
+        above = stable - buffer_target
+        available = above if above < base else base
+    kicker = p["k_kicker_1e6"] * vol1e8 // 10 ** 6
+    kicker = (kicker * dd1e8) // 10 ** 8
+    kicker = (kicker * nav) // 10 ** 8
+    kicker_cap = (p["cmax_mult_x"] * base * 10 ** 8) // (10 ** sdec)
+    if kicker > kicker_cap:
+        kicker = kicker_cap
+    total = (available * 10 ** 8) // (10 ** sdec) + kicker
+    max_usd = (stable * 10 ** 8) // (10 ** sdec)
+    if total > max_usd:
+        total = max_usd
+    if total > 0:
+        amount = (total * 10 ** sdec) // 10 ** 8
+        if amount > 0:
+            return DCA_BUY, amount
+    return NONE, 0
+
+
+def reference_indicators(prices1e8: List[int]) -> Tuple[List[int], List[int]]:
+    """recomputeIndicators' loop with Python ints; (vol1e8, dd1e8) after every price."""
+    sigma2, peak = 0, 0
+    vols, dds = [], []
+    for i, p in enumerate(prices1e8):
+        if i == 0:
+            peak = p
+            vols.append(0)
+            dds.append(0)
+            continue
+        prev = prices1e8[i - 1]
+        vol = vols[-1]
+        if prev > 0:
+            diff = p - prev
+            r = abs(diff) * SCALE // prev * (1 if diff >= 0 else -1)   # truncation toward zero
+            r = max(-CLAMP_1E8, min(CLAMP_1E8, r))
+            sigma2 = (sigma2 * LAMBDA_BPS + r * r * (10000 - LAMBDA_BPS)) // 10000
+            vol = _babylonian_sqrt(sigma2) * SQRT_365_1E8 // SCALE
+        if peak == 0 or p > peak:
+            peak = p
+        vols.append(vol)
+        dds.append((peak - p) * SCALE // peak if peak > 0 else 0)
+    return vols, dds
+
+
+def _babylonian_sqrt(x: int) -> int:
+    if x == 0:
+        return 0
+    z, y = (x + 1) // 2, x
+    while z < y:
+        y = z
+        z = (x // z + z) // 2
+    return y
+
+
+def self_check(n: int = 100_000, seed: int = 0) -> Dict[str, int]:
+    """
+    Compare muldiv, indicators_fixed and should_rebalance with the Python-int
+    reference on random inputs; raises AssertionError on the first difference.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 62, n, dtype=np.int64) >> rng.integers(0, 60, n)
+    b = rng.integers(0, 1 << 62, n, dtype=np.int64) >> rng.integers(0, 60, n)
+    d = rng.integers(1, 1 << 50, n, dtype=np.int64) >> rng.integers(0, 49, n)
+    d = np.maximum(d, 1)
+    keep = (a.astype(float) * b.astype(float) / d) < 2.0 ** 61
+    a, b, d = a[keep], b[keep], d[keep]
+    got = muldiv(a, b, d)
+    want = [x * y // z for x, y, z in zip(a.tolist(), b.tolist(), d.tolist())]
+    assert got.tolist() == want, "muldiv"
+
+    paths = 20
+    prices = to_1e8(np.exp(np.cumsum(rng.normal(0.0, 0.04, (400, paths)), axis=0)) * 30_000.0)
+    vol, dd = indicators_fixed(prices)
+    for j in range(paths):
+        rv, rdd = reference_indicators(prices[:, j].tolist())
+        assert vol[:, j].tolist() == rv and dd[:, j].tolist() == rdd, "indicators"
+
+    price1e8 = to_1e8(np.exp(rng.uniform(np.log(100.0), np.log(500_000.0), n)))
+    stable = (np.exp(rng.uniform(0.0, np.log(1e13), n)) * (rng.random(n) > 0.05)).astype(np.int64)
+    risk = (np.exp(rng.uniform(0.0, np.log(1e12), n)) * (rng.random(n) > 0.2)).astype(np.int64)
+    vol1e8 = rng.integers(0, 5 * SCALE, n)
+    dd1e8 = rng.integers(0, SCALE + 1, n)
+    params = ContractParams(
+        base_dca_stable=(np.exp(rng.uniform(0.0, np.log(1e10), n))).astype(np.int64) + 1,
+        target_btc_bps=rng.integers(0, 10001, n),
+        band_delta_bps=rng.integers(0, 5001, n),
+        buffer_mult_x=rng.integers(0, 1 << 16, n) >> rng.integers(0, 16, n),
+        cmax_mult_x=rng.integers(0, 1 << 16, n) >> rng.integers(0, 16, n),
+        rebalance_cap_bps=rng.integers(0, 10001, n),
+        k_kicker_1e6=rng.integers(0, 1 << 32, n) >> rng.integers(0, 32, n),
+        threshold_mode=rng.random(n) < 0.7,
+    )
+    q = params.columns(n)
+    kind, amount = should_rebalance(price1e8, stable, risk, vol1e8, dd1e8, q)
+    cols = {k: v.tolist() for k, v in q.items()}
+    counts = np.zeros(4, dtype=np.int64)
+    for i in range(n):
+        p = {k: v[i] for k, v in cols.items()}
+        want = reference_should_rebalance(int(price1e8[i]), int(stable[i]), int(risk[i]), int(vol1e8[i]),
+                                          int(dd1e8[i]), p)
+        assert (int(kind[i]), int(amount[i])) == want, f"should_rebalance scenario {i}: {(kind[i], amount[i])} != {want}"
+        counts[want[0]] += 1
+    return {"muldiv": int(keep.sum()), "indicator_paths": paths,
+            **{f"should_rebalance_{name}": int(c) for name, c in zip(KIND_NAMES, counts)}}
+
+
+# ------------------------------
+# Differential check driver
+# ------------------------------
+
+def sample_params(rng: np.random.Generator, n: int) -> Tuple[ContractParams, np.ndarray]:
+    """Random contract parameters (in contract units) and initial USDC balances for n scenarios."""
+    params = ContractParams(
+        base_dca_stable=rng.integers(10, 1001, n) * 10 ** 6,
+        frequency_days=rng.choice([1, 7, 14], n),
+        target_btc_bps=rng.integers(20, 91, n) * 100,
+        band_delta_bps=rng.integers(5, 31, n) * 100,
+        buffer_mult_x=rng.integers(0, 13, n),
+        cmax_mult_x=rng.integers(1, 6, n),
+        rebalance_cap_bps=rng.integers(1, 26, n) * 100,
+        k_kicker_1e6=rng.integers(0, 51, n) * 10_000,
+        threshold_mode=rng.random(n) < 0.5,
+    )
+    initial = np.rint(np.exp(rng.uniform(np.log(1e3), np.log(1e6), n))).astype(np.int64) * 10 ** 6
+    return params, initial
+
+
+_worker: Dict[str, object] = {}
+
+
+def _init_worker(log_returns: np.ndarray, start_prices: np.ndarray, cfg: Dict[str, object]) -> None:
+    _worker.update(log_returns=log_returns, start_prices=start_prices, cfg=cfg)
+
+
+def _run_chunk(task) -> Dict[str, np.ndarray]:
+    from stress_test import bootstrap_paths
+    chunk_id, first, n = task
+    cfg = _worker["cfg"]
+    rng = np.random.default_rng(np.random.SeedSequence(cfg["seed"], spawn_key=(chunk_id,)))
+    price = bootstrap_paths(_worker["log_returns"], n, cfg["bars"] - 1, cfg["block"], rng,
+                            _worker["start_prices"])[:, :, 0]
+    params, initial = sample_params(rng, n)
+    res = run_scenarios(price, initial, params, cfg["fee_bps"])
+    out = {"scenario": np.arange(first, first + n), "initial_usdc": initial / 1e6}
+    out.update({k: np.asarray(v) for k, v in params.columns(n).items()})
+    out.update(compare_scenarios(res, price[-1], params))
+    return out
+
+
+def run_differential(n_scenarios: int = 100_000, years: float = 2.0, block: int = 30, seed: int = 0,
+                     fee_bps: int = 0, since: Optional[str] = None, workers: Optional[int] = None,
+                     chunk_size: int = 5_000, progress: bool = True) -> pd.DataFrame:
+    """
+    One row per scenario: a block-bootstrap BTC path (stress_test.py) and
+    random contract parameters, simulated by both engines.
+    """
+    import multiprocessing as mp
+    from stress_test import load_log_returns
+
+    log_returns, start_prices = load_log_returns(("BTCUSDT",), since)
+    cfg = {"seed": seed, "block": block, "bars": int(round(years * 365)), "fee_bps": int(fee_bps)}
+    tasks = [(k, first, min(chunk_size, n_scenarios - first))
+             for k, first in enumerate(range(0, n_scenarios, chunk_size))]
+    workers = workers or os.cpu_count() or 1
+    initargs = (log_returns, start_prices, cfg)
+    chunks: List[Dict[str, np.ndarray]] = []
+    t0 = time.perf_counter()
+    if workers == 1:
+        _init_worker(*initargs)
+        results, pool = map(_run_chunk, tasks), None
+    else:
+        pool = mp.Pool(workers, initializer=_init_worker, initargs=initargs)
+        results = pool.imap_unordered(_run_chunk, tasks)
+    try:
+        done = 0
+        for chunk in results:
+            chunks.append(chunk)
+            done += len(chunk["scenario"])
+            if progress:
+                rate = done * cfg["bars"] / (time.perf_counter() - t0)
+                print(f"{done}/{n_scenarios} scenarios ({rate:,.0f} scenario-bars/s)", file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    df = pd.DataFrame({k: np.concatenate([c[k] for c in chunks]) for k in chunks[0]})
+    return df.sort_values("scenario").reset_index(drop=True)
+
+
+def divergence_report(df: pd.DataFrame, material: float = 1e-4) -> str:
+    """Text summary: how often the engines disagree, by how much, and on which decisions first."""
+    rel = df["nav_rel_diff"].abs()
+    diverged = df["first_mismatch_bar"] >= 0
+    lines = [
+        f"Scenarios: {len(df):,}",
+        f"Decision mismatch on any bar: {diverged.mean() * 100:.3f}%  "
+        f"(mismatched bars per diverging scenario: median {df.loc[diverged, 'mismatched_bars'].median():.0f})"
+        if diverged.any() else "Decision mismatch on any bar: none",
+        f"|NAV fixed / NAV float - 1|: median {rel.median():.2e}  p99 {rel.quantile(0.99):.2e}  max {rel.max():.2e}",
+        f"Material (|NAV diff| > {material:g}): {(rel > material).mean() * 100:.3f}%",
+    ]
+    if diverged.any():
+        pairs = (df.loc[diverged, "first_kind_fixed"].map(dict(enumerate(KIND_NAMES))) + " vs "
+                 + df.loc[diverged, "first_kind_float"].map(dict(enumerate(KIND_NAMES))))
+        lines.append("First mismatch (fixed vs float):")
+        for name, count in pairs.value_counts().items():
+            lines.append(f"  {name:<24} {count:>10,}")
+    return "\n".join(lines)
+
+
+# ------------------------------
+# CLI
+# ------------------------------
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Differential check of SmartBtcDcaV2 fixed-point math against floats.")
+    p.add_argument("--scenarios", type=int, default=100_000, help="Number of (path, parameter) scenarios")
+    p.add_argument("--years", type=float, default=2.0, help="Path length in years of daily bars")
+    p.add_argument("--block", type=int, default=30, help="Bootstrap block length in days")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--fee-bps", type=int, default=0, help="Swap fee applied to every fill")
+    p.add_argument("--since", type=str, default=None, help="Only resample BTC returns from this date on")
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    p.add_argument("--chunk", type=int, default=5_000, help="Scenarios per task")
+    p.add_argument("--material", type=float, default=1e-4, help="Relative NAV difference counted as material")
+    p.add_argument("--out", type=str, default=None, help="Write the per-scenario rows to this CSV")
+    p.add_argument("--self-check", type=int, default=0, metavar="N",
+                   help="Only verify the vectorized engine against the Python-int reference on N random states")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.self_check:
+        t0 = time.perf_counter()
+        counts = self_check(args.self_check, args.seed)
+        print(f"Self-check passed in {time.perf_counter() - t0:.1f}s: {counts}")
+        return
+    t0 = time.perf_counter()
+    df = run_differential(args.scenarios, args.years, args.block, args.seed, args.fee_bps, args.since,
+                          args.workers, args.chunk)
+    print(f"\n{len(df):,} scenarios x {int(round(args.years * 365))} bars in {time.perf_counter() - t0:.1f}s")
+    print(divergence_report(df, args.material))
+    if args.out:
+        df.to_csv(args.out, index=False)
+        print(f"Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
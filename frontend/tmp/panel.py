@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Aligned multi-asset price panel.
+
+PricePanel holds the closes of N assets on one shared time axis as a T x N
+float64 matrix, with a validity mask for the bars an asset has no candle for
+(before its listing, or exchange gaps). Missing closes are NaN; filled()
+carries the last close forward for mark-to-market.
+"""
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from bars import DAY_MS, Bars, to_ms
+from kline_cache import fetch_binance_bars_many
+from price_store import PriceStore
+
+
+class PricePanel:
+    """Closes of several assets aligned on the union of their close times."""
+
+    __slots__ = ("symbols", "close_time", "close", "valid")
+
+    def __init__(self, symbols: Sequence[str], close_time: np.ndarray, close: np.ndarray, valid: np.ndarray):
+        self.symbols = tuple(symbols)
+        self.close_time = close_time
+        self.close = close
+        self.valid = valid
+
+    @classmethod
+    def from_bars(cls, bars: Sequence[Bars]) -> "PricePanel":
+        """Align Bars on the union of their close times; cells without a candle are NaN / invalid."""
+        times = np.unique(np.concatenate([np.asarray(b.close_time, dtype=np.int64) for b in bars]
+                                         or [np.empty(0, dtype=np.int64)]))
+        close = np.full((len(times), len(bars)), np.nan)
+        valid = np.zeros((len(times), len(bars)), dtype=bool)
+        for j, b in enumerate(bars):
+            rows = np.searchsorted(times, b.close_time)
+            close[rows, j] = b.close
+            valid[rows, j] = True
+        return cls([b.symbol for b in bars], times, close, valid)
+
+    def __len__(self) -> int:
+        return len(self.close_time)
+
+    @property
+    def days(self) -> np.ndarray:
+        """int32 day index (days since epoch, UTC) of every row."""
+        return (self.close_time // DAY_MS).astype(np.int32)
+
+    def column(self, symbol: str) -> np.ndarray:
+        return self.close[:, self.symbols.index(symbol)]
+
+    def between(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> "PricePanel":
+        """Zero-copy view of the rows with start_ms <= close_time <= end_ms."""
+        lo = 0 if start_ms is None else int(np.searchsorted(self.close_time, start_ms, side="left"))
+        hi = len(self) if end_ms is None else int(np.searchsorted(self.close_time, end_ms, side="right"))
+        hi = max(lo, hi)
+        return PricePanel(self.symbols, self.close_time[lo:hi], self.close[lo:hi], self.valid[lo:hi])
+
+    def complete(self) -> "PricePanel":
+        """Only the rows where every asset has a candle (the old merge-on-time alignment)."""
+        rows = self.valid.all(axis=1)
+        return PricePanel(self.symbols, self.close_time[rows], self.close[rows], self.valid[rows])
+
+    def filled(self) -> np.ndarray:
+        """close with each NaN replaced by the last valid close above it (NaN before the first one)."""
+        t = len(self)
+        idx = np.where(self.valid, np.arange(t)[:, None], 0)
+        np.maximum.accumulate(idx, axis=0, out=idx)
+        out = np.take_along_axis(self.close, idx, axis=0)
+        out[~np.maximum.accumulate(self.valid, axis=0)] = np.nan
+        return out
+
+    def frame(self) -> pd.DataFrame:
+        """DataFrame indexed by close time (UTC) with one close column per symbol."""
+        return pd.DataFrame(self.close, columns=list(self.symbols),
+                            index=pd.Index(pd.to_datetime(self.close_time, unit="ms", utc=True), name="time"))
+
+
+def load_panel(symbols: Sequence[str], start, end, interval: str = "1d",
+               store: Optional[PriceStore] = None) -> PricePanel:
+    """Panel of the candles with start <= close time <= end, from Binance or the offline store."""
+    start_ms, end_ms = to_ms(start), to_ms(end)
+    if store is not None:
+        if interval != "1d":
+            raise ValueError("The offline price store only holds daily closes.")
+        bars: Dict[str, Bars] = {s: store.bars(s, start, end) for s in symbols}
+    else:
+        bars = fetch_binance_bars_many(symbols, interval, pd.Timestamp(start_ms, unit="ms", tz="UTC"),
+                                       pd.Timestamp(end_ms, unit="ms", tz="UTC"))
+    return PricePanel.from_bars([bars[s].between(start_ms, end_ms) for s in symbols])
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped offline price store built from frontend/public/data/*.json.
+
+The bundled `{date, close}` histories are converted once into two flat files
+per asset:
+
+    <store_dir>/<SYMBOL>.days.i32   int32 days since 1970-01-01 (UTC)
+    <store_dir>/<SYMBOL>.close.f64  float64 daily close
+
+They are opened with np.memmap, so every process shares the same page-cached
+copy and slicing a date range is a binary search returning zero-copy views.
+The store is rebuilt automatically when the source JSON changes.
+"""
+import datetime as dt
+import json
+import os
+import tempfile
+from typing import Callable, Dict, IO, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from bars import Bars
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "public", "data")
+DEFAULT_STORE_DIR = os.environ.get(
+    "PRICE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "prices"),
+)
+
+# Binance symbol -> bundled daily history
+SYMBOL_FILES = {
+    "BTCUSDT": "btc_daily.json",
+    "ETHUSDT": "eth_daily.json",
+}
+
+DAY_MS = 86_400_000
+
+DateLike = Union[str, dt.date, dt.datetime, pd.Timestamp]
+
+
+def _replace_file(path: str, write: Callable[[IO[bytes]], None]) -> None:
+    """write() a temp file unique to this call next to `path`, then rename it over `path`."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def to_day(d: DateLike) -> int:
+    """Day number (days since epoch, UTC) for a date string / date / timestamp."""
+    ts = pd.Timestamp(d)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return int(ts.normalize().value // (DAY_MS * 1_000_000))
+
+
+class PriceSeries:
+    """Daily closes for one asset, backed by memory-mapped int32/float64 arrays."""
+
+    __slots__ = ("symbol", "days", "close")
+
+    def __init__(self, symbol: str, days: np.ndarray, close: np.ndarray):
+        self.symbol = symbol
+        self.days = days
+        self.close = close
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def index_range(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None):
+        """[lo, hi) row range for start <= day <= end, found by binary search."""
+        lo = 0 if start is None else int(np.searchsorted(self.days, to_day(start), side="left"))
+        hi = len(self.days) if end is None else int(np.searchsorted(self.days, to_day(end), side="right"))
+        return lo, hi
+
+    def slice(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> "PriceSeries":
+        """Zero-copy view of the rows between start and end (inclusive)."""
+        lo, hi = self.index_range(start, end)
+        return PriceSeries(self.symbol, self.days[lo:hi], self.close[lo:hi])
+
+    def close_time_ms(self) -> np.ndarray:
+        """Binance-style candle close time (last ms of the day) for every row."""
+        return self.days.astype(np.int64) * DAY_MS + (DAY_MS - 1)
+
+    def frame(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> pd.DataFrame:
+        """
+        DataFrame with the same (time, close) layout as fetch_binance_klines:
+        time is the candle close time, and rows are kept while start <= time <= end.
+        """
+        return self.bars(start, end).frame()
+
+    def bars(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> Bars:
+        """
+        Close-only Bars (open/high/low/volume are NaN) of the days kept while
+        start <= close time <= end; open time is the day start, close time its last ms.
+        """
+        lo, hi = self.index_range(start, None)
+        if end is not None:
+            end_ts = pd.Timestamp(end)
+            if end_ts.tzinfo is None:
+                end_ts = end_ts.tz_localize("UTC")
+            end_ms = end_ts.value // 1_000_000
+            # last day whose close time (day end) is still <= end
+            hi = int(np.searchsorted(self.days, (end_ms - (DAY_MS - 1)) // DAY_MS, side="right"))
+        view = PriceSeries(self.symbol, self.days[lo:max(lo, hi)], self.close[lo:max(lo, hi)])
+        open_time = view.days.astype(np.int64) * DAY_MS
+        return Bars.from_closes(self.symbol, open_time, open_time + (DAY_MS - 1), view.close)
+
+
+class PriceStore:
+    """Lazily built, memory-mapped daily closes for the bundled assets."""
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR, data_dir: str = DATA_DIR):
+        self.root = root
+        self.data_dir = data_dir
+        self._series: Dict[str, PriceSeries] = {}
+
+    def _paths(self, symbol: str):
+        base = os.path.join(self.root, symbol.upper())
+        return base + ".days.i32", base + ".close.f64", base + ".meta.json"
+
+    def _source(self, symbol: str) -> str:
+        try:
+            return os.path.join(self.data_dir, SYMBOL_FILES[symbol.upper()])
+        except KeyError:
+            raise KeyError(f"No bundled price history for {symbol}") from None
+
+    def _is_fresh(self, symbol: str) -> bool:
+        days_path, close_path, meta_path = self._paths(symbol)
+        if not (os.path.exists(days_path) and os.path.exists(close_path) and os.path.exists(meta_path)):
+            return False
+        st = os.stat(self._source(symbol))
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return meta.get("source_size") == st.st_size and meta.get("source_mtime_ns") == st.st_mtime_ns
+
+    def build(self, symbol: str) -> None:
+        """Convert the bundled JSON for `symbol` into the binary layout."""
+        src = self._source(symbol)
+        with open(src) as f:
+            rows = json.load(f)
+        days = np.array([r["date"] for r in rows], dtype="datetime64[D]").astype(np.int32)
+        close = np.array([r["close"] for r in rows], dtype=np.float64)
+        order = np.argsort(days, kind="stable")
+        days, close = days[order], close[order]
+        if len(days) > 1 and not np.all(np.diff(days) > 0):
+            raise ValueError(f"Duplicate dates in {src}")
+
+        os.makedirs(self.root, exist_ok=True)
+        days_path, close_path, meta_path = self._paths(symbol)
+        # unique temp names: several processes may rebuild the same store at once
+        for path, arr in ((days_path, days), (close_path, close)):
+            _replace_file(path, arr.tofile)
+        st = os.stat(src)
+        meta = {"symbol": symbol.upper(), "rows": int(len(days)),
+                "source_size": st.st_size, "source_mtime_ns": st.st_mtime_ns}
+        _replace_file(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+
+    def series(self, symbol: str) -> PriceSeries:
+        """Memory-mapped series for `symbol`, building the binary files if needed."""
+        symbol = symbol.upper()
+        if symbol in self._series:
+            return self._series[symbol]
+        if not self._is_fresh(symbol):
+            self.build(symbol)
+        days_path, close_path, _ = self._paths(symbol)
+        if os.path.getsize(days_path) == 0:
+            days = np.empty(0, dtype=np.int32)
+            close = np.empty(0, dtype=np.float64)
+        else:
+            days = np.memmap(days_path, dtype=np.int32, mode="r")
+            close = np.memmap(close_path, dtype=np.float64, mode="r")
+        s = PriceSeries(symbol, days, close)
+        self._series[symbol] = s
+        return s
+
+    def frame(self, symbol: str, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> pd.DataFrame:
+        return self.series(symbol).frame(start, end)
+
+    def bars(self, symbol: str, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> Bars:
+        return self.series(symbol).bars(start, end)
@@ -0,0 +1,41 @@
+"""
+Python ports of the web simulator strategies (frontend/src/lib/strategies).
+
+    from strategies import Session
+    session = Session("2021-01-01", "2024-12-31", offline=True)
+    results = session.run_all(deposit_amount=100, deposit_interval_days=7)
+    results["smart-btc-dca"].summary
+
+Strategies register themselves in STRATEGIES under their TS ids; parameters
+take the TS option names in camelCase or snake_case.
+"""
+from .engine import (
+    STRATEGIES,
+    Ledger,
+    Session,
+    Strategy,
+    StrategyResult,
+    Summary,
+    Window,
+    WindowError,
+    get_strategy,
+    make_params,
+    register,
+    total_contributions,
+)
+from . import momentum, power, simple, smart, trend  # noqa: F401  (registers the strategies)
+
+__all__ = [
+    "STRATEGIES",
+    "Ledger",
+    "Session",
+    "Strategy",
+    "StrategyResult",
+    "Summary",
+    "Window",
+    "WindowError",
+    "get_strategy",
+    "make_params",
+    "register",
+    "total_contributions",
+]
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Run the strategy ports over one window and print their summaries.
+
+Examples:
+  python -m strategies --start 2021-01-01 --end 2024-12-31 --offline
+  python -m strategies --only smart-btc-dca --deposit 100 --deposit-interval 7 --set smart-btc-dca.kKicker=0.1
+"""
+import argparse
+import dataclasses
+import json
+
+import pandas as pd
+
+from . import STRATEGIES, Session
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Run the Python strategy ports over one window.")
+    p.add_argument("--start", type=str, default="2021-01-01", help="Start date (YYYY-MM-DD)")
+    p.add_argument("--end", type=str, default=pd.Timestamp.now("UTC").strftime("%Y-%m-%d"), help="End date (YYYY-MM-DD)")
+    p.add_argument("--only", type=str, default=None, help="Comma-separated strategy ids: " + ", ".join(STRATEGIES))
+    p.add_argument("--deposit", type=float, default=1000.0, help="Deposit amount in USDC (default 1000)")
+    p.add_argument("--deposit-interval", type=int, default=0, help="Days between deposits; 0 = one deposit (default)")
+    p.add_argument("--set", action="append", default=[], metavar="ID.PARAM=VALUE",
+                   help="Override a strategy parameter (JSON value), e.g. power-btc-dca.tradeIntervalDays=14")
+    p.add_argument("--offline", action="store_true", help="Only use the bundled frontend/public/data histories")
+    p.add_argument("--out", type=str, default=None, help="Write the summaries to this CSV")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    ids = [s.strip() for s in args.only.split(",")] if args.only else list(STRATEGIES)
+    params = {}
+    for item in args.set:
+        key, _, raw = item.partition("=")
+        sid, _, name = key.rpartition(".")
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw
+        params.setdefault(sid, {})[name] = value
+
+    session = Session(args.start, args.end, offline=args.offline)
+    results = session.run_all(ids, args.deposit, args.deposit_interval, params)
+    table = pd.DataFrame({sid: dataclasses.asdict(r.summary) for sid, r in results.items()}).T
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.float_format", "{:,.2f}".format):
+        print(table.T)
+    if args.out:
+        table.to_csv(args.out, index_label="strategy")
+        print(f"Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""
+Shared engine for the strategy ports.
+
+A Session covers one simulation window. It loads the daily closes once
+(the bundled frontend/public/data histories, topped up from Binance through
+the kline cache unless offline), with the same 210-day lookback as
+loadPriceData in priceFeed.ts, and memoizes indicators by key so every
+strategy run in the session reuses them. A strategy's simulate() is a tight
+loop over plain Python floats that returns a Ledger (per-bar cash and
+quantities plus the trade list); the engine turns that into the daily
+performance columns and the summary of the web simulator in vectorized form.
+
+Dates are int day numbers (days since 1970-01-01 UTC), as in price_store.py.
+"""
+import datetime as dt
+import re
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import indicators
+import instrument
+import metrics
+from kline_cache import fetch_binance_klines
+from price_store import DAY_MS, DateLike, PriceStore, to_day
+
+LOOKBACK_DAYS = 210
+
+# Trade tuples: (day, symbol, side, price, quantity, value, fee, portfolio_value)
+TRADE_COLUMNS = ("day", "symbol", "side", "price", "quantity", "value", "fee", "portfolio_value")
+
+
+# ------------------------------
+# Strategy interface / registry
+# ------------------------------
+
+@dataclass
+class Ledger:
+    """Output of a strategy loop: state after each bar from the start bar on, plus trades."""
+    cash: List[float]
+    btc_qty: List[float]
+    eth_qty: Optional[List[float]] = None
+    trades: List[tuple] = field(default_factory=list)
+    extra: Dict[str, np.ndarray] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Strategy:
+    """
+    A registered strategy. `params` is a dataclass of its tunables (defaults
+    from DEFAULT_PARAMETERS in the TS module); `simulate(session, window, p,
+    deposit_amount, deposit_interval_days)` returns a Ledger. `fee_param`
+    names the fee also applied to the BTC HODL benchmark.
+    """
+    id: str
+    name: str
+    params: type
+    simulate: Callable[..., Ledger]
+    symbols: Tuple[str, ...] = ("BTCUSDT",)
+    fee_param: str = "trading_fee"
+
+
+STRATEGIES: Dict[str, Strategy] = {}
+
+
+def register(strategy: Strategy) -> Strategy:
+    STRATEGIES[strategy.id] = strategy
+    return strategy
+
+
+def get_strategy(strategy_id: str) -> Strategy:
+    try:
+        return STRATEGIES[strategy_id]
+    except KeyError:
+        raise KeyError(f"Unknown strategy id: {strategy_id} (known: {', '.join(STRATEGIES)})") from None
+
+
+def _snake(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+def make_params(params_cls: type, options: Optional[Dict[str, Any]] = None):
+    """Params dataclass from snake_case or TS-style camelCase option names."""
+    known = {f.name for f in fields(params_cls)}
+    kwargs = {}
+    for key, value in (options or {}).items():
+        name = key if key in known else _snake(key)
+        if name not in known:
+            raise TypeError(f"{params_cls.__name__} has no parameter {key!r}")
+        kwargs[name] = value
+    return params_cls(**kwargs)
+
+
+# ------------------------------
+# Results
+# ------------------------------
+
+@dataclass
+class Summary:
+    initial_capital: float
+    final_value: float
+    total_return: float
+    cagr: float
+    max_drawdown: float
+    total_trades: int
+    sharpe_ratio: float
+    sortino_ratio: float
+    btc_hodl_final_value: float
+    btc_hodl_return: float
+    btc_hodl_cagr: float
+    btc_hodl_max_drawdown: float
+    btc_hodl_sharpe_ratio: float
+    btc_hodl_sortino_ratio: float
+    outperformance: float
+
+
+@dataclass
+class StrategyResult:
+    """Daily performance arrays (one row per bar from the start date) and summary of one run."""
+    strategy_id: str
+    days: np.ndarray
+    btc_price: np.ndarray
+    eth_price: np.ndarray
+    cash: np.ndarray
+    btc_qty: np.ndarray
+    eth_qty: np.ndarray
+    btc_value: np.ndarray
+    eth_value: np.ndarray
+    total_value: np.ndarray
+    btc_hodl_value: np.ndarray
+    drawdown: np.ndarray
+    btc_hodl_drawdown: np.ndarray
+    trades: List[tuple]
+    summary: Summary
+    extra: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def daily_frame(self) -> pd.DataFrame:
+        """DailyPerformance rows with the TS field names, for diffing against the web simulator."""
+        out = pd.DataFrame({
+            "date": self.days.astype("datetime64[D]").astype(str),
+            "cash": self.cash,
+            "btcQty": self.btc_qty,
+            "ethQty": self.eth_qty,
+            "btcValue": self.btc_value,
+            "ethValue": self.eth_value,
+            "totalValue": self.total_value,
+            "btcHodlValue": self.btc_hodl_value,
+            "drawdown": self.drawdown,
+            "btcHodlDrawdown": self.btc_hodl_drawdown,
+            "btcPrice": self.btc_price,
+            "ethPrice": self.eth_price,
+        })
+        for name, values in self.extra.items():
+            out[name] = values
+        return out
+
+    def trades_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.trades, columns=list(TRADE_COLUMNS))
+        df.insert(0, "date", df.pop("day").to_numpy(dtype="datetime64[D]").astype(str))
+        return df
+
+
+def build_result(strategy_id: str, window: "Window", ledger: Ledger, initial_capital: float,
+                 hodl_fee: float) -> StrategyResult:
+    """Mark-to-market, drawdowns, BTC HODL benchmark and summary for a Ledger."""
+    s = window.start
+    days = window.days[s:]
+    btc_price = window.btc[s:]
+    eth_price = window.eth[s:] if window.eth is not None else np.zeros(len(days))
+    cash = np.asarray(ledger.cash, dtype=np.float64)
+    btc_qty = np.asarray(ledger.btc_qty, dtype=np.float64)
+    eth_qty = np.asarray(ledger.eth_qty, dtype=np.float64) if ledger.eth_qty is not None else np.zeros(len(days))
+
+    btc_value = btc_qty * btc_price
+    eth_value = eth_qty * eth_price
+    total = cash + btc_value + eth_value
+    hodl_qty = (initial_capital * (1.0 - hodl_fee)) / btc_price[0]
+    hodl = hodl_qty * btc_price
+    hodl[0] = initial_capital
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = (total / np.maximum.accumulate(total) - 1.0) * 100
+        hodl_dd = (hodl / np.maximum.accumulate(hodl) - 1.0) * 100
+    drawdown[0] = 0.0
+    hodl_dd[0] = 0.0
+
+    n_days = int(days[-1] - days[0])
+    final, hodl_final = float(total[-1]), float(hodl[-1])
+    strat_cagr = float(metrics.cagr(initial_capital, final, n_days)) * 100
+    hodl_cagr = float(metrics.cagr(initial_capital, hodl_final, n_days)) * 100
+    sharpe, sortino = map(float, metrics.sharpe_sortino(metrics.daily_returns(total)))
+    hodl_sharpe, hodl_sortino = map(float, metrics.sharpe_sortino(metrics.daily_returns(hodl)))
+    summary = Summary(
+        initial_capital=initial_capital,
+        final_value=final,
+        total_return=((final / initial_capital) - 1.0) * 100,
+        cagr=strat_cagr,
+        max_drawdown=float(np.min(drawdown)),
+        total_trades=len(ledger.trades),
+        sharpe_ratio=sharpe,
+        sortino_ratio=sortino,
+        btc_hodl_final_value=hodl_final,
+        btc_hodl_return=((hodl_final / initial_capital) - 1.0) * 100,
+        btc_hodl_cagr=hodl_cagr,
+        btc_hodl_max_drawdown=float(np.min(hodl_dd)),
+        btc_hodl_sharpe_ratio=hodl_sharpe,
+        btc_hodl_sortino_ratio=hodl_sortino,
+        outperformance=strat_cagr - hodl_cagr,
+    )
+    return StrategyResult(
+        strategy_id=strategy_id, days=days, btc_price=btc_price, eth_price=eth_price,
+        cash=cash, btc_qty=btc_qty, eth_qty=eth_qty, btc_value=btc_value, eth_value=eth_value,
+        total_value=total, btc_hodl_value=hodl, drawdown=drawdown, btc_hodl_drawdown=hodl_dd,
+        trades=ledger.trades, summary=summary, extra=ledger.extra,
+    )
+
+
+# ------------------------------
+# Session
+# ------------------------------
+
+@dataclass
+class Window:
+    """Aligned daily closes for a set of symbols; `start` is the first bar on/after the start date."""
+    symbols: Tuple[str, ...]
+    days: np.ndarray
+    btc: np.ndarray
+    eth: Optional[np.ndarray]
+    start: int
+
+    @property
+    def start_day(self) -> int:
+        return int(self.days[self.start])
+
+
+def total_contributions(start: DateLike, end: DateLike, deposit_amount: float, deposit_interval_days: int) -> float:
+    """Deposits on the start date and every interval after it up to the end date (simulator page)."""
+    if not deposit_amount > 0:
+        return 0.0
+    if deposit_interval_days <= 0:
+        return float(deposit_amount)
+    n = (to_day(end) - to_day(start)) // deposit_interval_days + 1
+    return float(deposit_amount) * max(0, n)
+
+
+class WindowError(RuntimeError):
+    """The requested window has no prices (e.g. it starts after the data ends)."""
+
+
+class Session:
+    """
+    Prices and indicators for one [start, end] window, shared by every
+    strategy run in it.
+    """
+
+    def __init__(self, start: DateLike, end: DateLike, store: Optional[PriceStore] = None,
+                 offline: bool = False, lookback_days: int = LOOKBACK_DAYS):
+        self.start = pd.Timestamp(start).strftime("%Y-%m-%d")
+        self.end = pd.Timestamp(end).strftime("%Y-%m-%d")
+        self.store = store or PriceStore()
+        self.offline = offline
+        self.lookback_start = to_day(start) - lookback_days
+        self._series: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._windows: Dict[Tuple[str, ...], Window] = {}
+        self._cache: Dict[tuple, Any] = {}
+
+    # --- prices ---
+
+    def series(self, symbol: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(days, close) for lookback_start <= day <= end: bundled history plus a Binance tail."""
+        if symbol in self._series:
+            return self._series[symbol]
+        with instrument.active().phase("load"):
+            end_day = to_day(self.end)
+            s = self.store.series(symbol)
+            _, hi = s.index_range(None, self.end)
+            lo = int(np.searchsorted(s.days, self.lookback_start, side="left"))
+            days = np.asarray(s.days[lo:hi], dtype=np.int64)
+            close = np.asarray(s.close[lo:hi], dtype=np.float64)
+            last = int(days[-1]) if len(days) else self.lookback_start - 1
+            if not self.offline and last < end_day:
+                tail_start = dt.datetime.fromtimestamp((last + 1) * DAY_MS / 1000, dt.timezone.utc)
+                tail_end = dt.datetime.fromtimestamp(end_day * DAY_MS / 1000, dt.timezone.utc)
+                tail = fetch_binance_klines(symbol, "1d", tail_start, tail_end)
+                t_days = tail["time"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+                keep = (t_days > last) & (t_days <= end_day)
+                t_days, t_close = t_days[keep], tail["close"].to_numpy(dtype=np.float64)[keep]
+                t_days, first = np.unique(t_days, return_index=True)
+                days = np.concatenate([days, t_days])
+                close = np.concatenate([close, t_close[first]])
+        self._series[symbol] = (days, close)
+        return days, close
+
+    def window(self, symbols: Iterable[str] = ("BTCUSDT",)) -> Window:
+        """Closes on the days every symbol has (BTCUSDT first, ETHUSDT second if present)."""
+        symbols = tuple(symbols)
+        if symbols in self._windows:
+            return self._windows[symbols]
+        days, btc = self.series(symbols[0])
+        eth = None
+        if len(symbols) > 1:
+            eth_days, eth_close = self.series(symbols[1])
+            days, ib, ie = np.intersect1d(days, eth_days, assume_unique=True, return_indices=True)
+            btc, eth = btc[ib], eth_close[ie]
+        start = int(np.searchsorted(days, to_day(self.start), side="left"))
+        if start >= len(days):
+            raise WindowError(f"Start date {self.start} not found in {'/'.join(symbols)} data")
+        w = Window(symbols=symbols, days=days, btc=btc, eth=eth, start=start)
+        self._windows[symbols] = w
+        return w
+
+    # --- indicators ---
+
+    def cached(self, key: tuple, fn: Callable[[], Any]) -> Any:
+        """Memoize fn() under key for the lifetime of the session."""
+        try:
+            return self._cache[key]
+        except KeyError:
+            with instrument.active().phase("indicators"):
+                value = self._cache[key] = fn()
+            return value
+
+    def sma(self, window: Window, which: str, period: int, ascending: bool = False) -> np.ndarray:
+        values = getattr(window, which)
+        return self.cached(("sma", window.symbols, which, period, ascending),
+                           lambda: indicators.sma(values, period, ascending, exact=True))
+
+    def rsi(self, window: Window, which: str, period: int) -> np.ndarray:
+        if which == "eth_btc":
+            values = self.cached(("ratio", window.symbols), lambda: window.eth / window.btc)
+        else:
+            values = getattr(window, which)
+        return self.cached(("rsi", window.symbols, which, period), lambda: indicators.rsi(values, period, exact=True))
+
+    # --- runs ---
+
+    def run(self, strategy_id: str, deposit_amount: float = 1000.0, deposit_interval_days: int = 0,
+            initial_capital: Optional[float] = None, **params) -> StrategyResult:
+        """
+        Run one strategy. Like the web simulator, the portfolio starts with one
+        deposit and receives `deposit_amount` every `deposit_interval_days`
+        (0 = a single deposit); returns are measured against the total
+        contributions unless `initial_capital` is given.
+        """
+        strat = get_strategy(strategy_id)
+        p = make_params(strat.params, params)
+        window = self.window(strat.symbols)
+        if initial_capital is None:
+            initial_capital = total_contributions(self.start, self.end, deposit_amount, deposit_interval_days)
+        inst = instrument.active()
+        with inst.phase(strategy_id):
+            ledger = strat.simulate(self, window, p, deposit_amount, deposit_interval_days)
+            res = build_result(strategy_id, window, ledger, initial_capital, getattr(p, strat.fee_param))
+        inst.count("bars", len(window.days) - window.start)
+        inst.count("trades", len(ledger.trades))
+        return res
+
+    def run_all(self, strategy_ids: Optional[Iterable[str]] = None, deposit_amount: float = 1000.0,
+                deposit_interval_days: int = 0, params: Optional[Dict[str, Dict[str, Any]]] = None
+                ) -> Dict[str, StrategyResult]:
+        """Run several strategies (default: all registered) over this session's window."""
+        params = params or {}
+        return {sid: self.run(sid, deposit_amount, deposit_interval_days, **params.get(sid, {}))
+                for sid in (strategy_ids or STRATEGIES)}
@@ -0,0 +1,145 @@
+"""
+BTC-ETH momentum (btcEthMomentum.ts): RSI-cross entries and exits under a
+BTC 200-day SMA regime filter, with BTC/ETH weights tilted by ETH/BTC RSI.
+"""
+from dataclasses import dataclass
+
+from .engine import Ledger, Strategy, register
+
+
+@dataclass
+class MomentumParams:
+    eval_interval_days: int = 1
+    rsi_bars: int = 8
+    eth_btc_rsi_bars: int = 5
+    bearish_rsi_entry: float = 65.0
+    bearish_rsi_exit: float = 70.0
+    bullish_rsi_entry: float = 80.0
+    bullish_rsi_exit: float = 65.0
+    regime_filter_ma_length: int = 200
+    allocation: float = 0.98
+    rebalance_threshold: float = 0.275
+    momentum_exponent: float = 3.5
+    trading_fee: float = 0.003
+
+
+def _crossed_above(cur: float, prev: float, level: float) -> bool:
+    # NaN compares False, as isNaN() guards in indicators.ts
+    return cur >= level and prev < level
+
+
+def _crossed_below(cur: float, prev: float, level: float) -> bool:
+    return cur < level and prev > level
+
+
+def simulate(session, window, p: MomentumParams, deposit_amount: float, deposit_interval_days: int) -> Ledger:
+    rsi_bars = max(1, int(p.rsi_bars))
+    eb_bars = max(1, int(p.eth_btc_rsi_bars))
+    ma_len = max(1, int(p.regime_filter_ma_length))
+    allocation = min(1.0, max(0.0, p.allocation))
+    threshold = max(0.0, p.rebalance_threshold)
+    exponent = max(0.0, p.momentum_exponent)
+    fee_pct = max(0.0, p.trading_fee)
+    interval = max(1, int(p.eval_interval_days))
+    dep_amount = max(0.0, deposit_amount)
+    dep_interval = max(0, int(deposit_interval_days))
+
+    btc_rsi = session.rsi(window, "btc", rsi_bars)
+    eth_rsi = session.rsi(window, "eth", rsi_bars)
+    eb_rsi = session.rsi(window, "eth_btc", eb_bars)
+    btc_rsi_l, eth_rsi_l, eb_rsi_l = btc_rsi.tolist(), eth_rsi.tolist(), eb_rsi.tolist()
+    sma_l = session.sma(window, "btc", ma_len).tolist()
+    days = window.days.tolist()
+    btc_px_l = window.btc.tolist()
+    eth_px_l = window.eth.tolist()
+
+    s = window.start
+    usdc = dep_amount if dep_amount > 0 else 0.0
+    btc_qty = eth_qty = 0.0
+    cash_l, btc_l, eth_l, trades = [usdc], [0.0], [0.0], []
+    next_eval = days[s] + interval
+    next_dep = days[s] + dep_interval
+
+    for i in range(s + 1, len(days)):
+        day, btc_px, eth_px = days[i], btc_px_l[i], eth_px_l[i]
+        if dep_amount > 0 and dep_interval > 0 and day >= next_dep:
+            usdc += dep_amount
+            next_dep += dep_interval
+        btc_value = btc_qty * btc_px
+        eth_value = eth_qty * eth_px
+
+        if day >= next_eval:
+            sma = sma_l[i]
+            bullish = True if sma != sma else btc_px > sma
+            rsi_entry = p.bullish_rsi_entry if bullish else p.bearish_rsi_entry
+            rsi_exit = p.bullish_rsi_exit if bullish else p.bearish_rsi_exit
+
+            eb = eb_rsi_l[i]
+            eth_mom = 0.5 if eb != eb else (eb / 100.0) + 0.5
+            btc_mom = 0.5 if eb != eb else (1.0 - (eb / 100.0)) + 0.5
+            w_btc = btc_mom ** exponent
+            w_eth = eth_mom ** exponent
+            if btc_qty > 0:
+                if _crossed_below(btc_rsi_l[i], btc_rsi_l[i - 1], rsi_exit):
+                    w_btc = 0.0
+            elif not _crossed_above(btc_rsi_l[i], btc_rsi_l[i - 1], rsi_entry):
+                w_btc = 0.0
+            if eth_qty > 0:
+                if _crossed_below(eth_rsi_l[i], eth_rsi_l[i - 1], rsi_exit):
+                    w_eth = 0.0
+            elif not _crossed_above(eth_rsi_l[i], eth_rsi_l[i - 1], rsi_entry):
+                w_eth = 0.0
+            w_sum = w_btc + w_eth
+            if w_sum > 0:
+                w_btc /= w_sum
+                w_eth /= w_sum
+
+            total_equity = usdc + btc_value + eth_value
+            investable = total_equity * allocation
+            min_delta = threshold * total_equity
+            # BTC first, then ETH (the ETH leg sees the cash left by the BTC leg)
+            for sym in ("BTC", "ETH"):
+                if sym == "BTC":
+                    qty, value, target, px = btc_qty, btc_value, investable * w_btc, btc_px
+                else:
+                    qty, value, target, px = eth_qty, eth_value, investable * w_eth, eth_px
+                delta = target - value
+                if abs(delta) < min_delta:
+                    continue
+                if delta > 0:
+                    actual = delta
+                    if delta * (1.0 + fee_pct) > usdc:
+                        actual = usdc / (1.0 + fee_pct)
+                        if abs(actual) < min_delta:
+                            continue
+                    q = (actual * (1.0 - fee_pct)) / px
+                    fee = actual * fee_pct
+                    qty += q
+                    usdc -= (actual + fee)
+                    side, trade_value = "BUY", actual
+                else:
+                    q = min(qty, -delta / px)
+                    trade_value = q * px
+                    fee = trade_value * fee_pct
+                    qty -= q
+                    usdc += trade_value * (1.0 - fee_pct)
+                    side = "SELL"
+                value = qty * px
+                if sym == "BTC":
+                    btc_qty, btc_value = qty, value
+                else:
+                    eth_qty, eth_value = qty, value
+                trades.append((day, sym, side, px, q, trade_value, fee, usdc + btc_value + eth_value))
+            next_eval += interval
+        cash_l.append(usdc)
+        btc_l.append(btc_qty)
+        eth_l.append(eth_qty)
+
+    return Ledger(cash=cash_l, btc_qty=btc_l, eth_qty=eth_l, trades=trades, extra={
+        "btcRsi": btc_rsi[s:].copy(),
+        "ethRsi": eth_rsi[s:].copy(),
+    })
+
+
+STRATEGY = register(Strategy("btc-eth-momentum", "BTC-ETH Momentum RSI", MomentumParams, simulate,
+                             symbols=("BTCUSDT", "ETHUSDT")))
@@ -0,0 +1,108 @@
+"""
+Power DCA (powerBtcDca.ts): buy below the power-law model price, sell above
+its upper band, keeping USDC and BTC reserves.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from price_store import to_day
+
+from .engine import Ledger, Strategy, register
+
+# Power law model: P(t) = C * d^N, with d = days since 2009-01-03
+C = 9.65e-18
+N = 5.845
+GENESIS_DAY = to_day("2009-01-03")
+
+
+@dataclass
+class PowerParams:
+    trade_interval_days: int = 7
+    upper_band_mult: float = 2.0
+    lower_band_mult: float = 0.5
+    buy_pct_below_lower: float = 0.05
+    buy_pct_between_lower_and_model: float = 0.01
+    sell_pct_above_upper: float = 0.05
+    usdc_reserve_frac: float = 0.02
+    btc_reserve_frac: float = 0.10
+    trading_fee: float = 0.003
+
+
+def model_price(days: np.ndarray) -> np.ndarray:
+    """Power-law model price per day (Python pow per element, like Math.pow)."""
+    return np.array([C * max(1, d - GENESIS_DAY) ** N for d in np.asarray(days).tolist()], dtype=np.float64)
+
+
+def simulate(session, window, p: PowerParams, deposit_amount: float, deposit_interval_days: int) -> Ledger:
+    fee_pct = p.trading_fee
+    interval = max(1, int(p.trade_interval_days))
+    usdc_reserve = max(0.0, p.usdc_reserve_frac)
+    btc_reserve = max(0.0, p.btc_reserve_frac)
+    buy_below = max(0.0, p.buy_pct_below_lower)
+    buy_between = max(0.0, p.buy_pct_between_lower_and_model)
+    sell_above = max(0.0, p.sell_pct_above_upper)
+    upper_mult = max(0.0, p.upper_band_mult)
+    lower_mult = max(0.0, p.lower_band_mult)
+    dep_amount = max(0.0, deposit_amount)
+    dep_interval = max(0, int(deposit_interval_days))
+
+    s = window.start
+    model = session.cached(("power_model", window.symbols), lambda: model_price(window.days[s:]))
+    days = window.days[s:].tolist()
+    prices = window.btc[s:].tolist()
+    models = model.tolist()
+    usdc = dep_amount if dep_amount > 0 else 0.0
+    btc = 0.0
+    cash_l, btc_l, trades = [usdc], [btc], []
+    last_trade = 0
+    next_dep = days[0] + dep_interval
+
+    for j in range(1, len(days)):
+        day, price, m = days[j], prices[j], models[j]
+        upper = m * upper_mult
+        lower = m * lower_mult
+        if dep_amount > 0 and dep_interval > 0 and day >= next_dep:
+            usdc += dep_amount
+            next_dep += dep_interval
+
+        btc_value = btc * price
+        total_equity = usdc + btc_value
+        # cadence counts bars since the last trade; a data gap of >= interval days also triggers
+        if (j - last_trade) >= interval or (day - days[j - 1]) >= interval:
+            usdc_spendable = max(0.0, total_equity * (1 - usdc_reserve) - btc_value)
+            btc_spendable = max(0.0, btc - (total_equity * btc_reserve) / price)
+            if price < lower and usdc > 0:
+                buy = min(usdc * buy_below, usdc_spendable)
+            elif lower <= price <= m and usdc > 0:
+                buy = min(usdc * buy_between, usdc_spendable)
+            else:
+                buy = 0.0
+                if price > upper and btc > 0:
+                    qty = min(btc * sell_above, btc_spendable)
+                    if qty > 0:
+                        gross = qty * price
+                        fee = gross * fee_pct
+                        btc -= qty
+                        usdc += gross * (1.0 - fee_pct)
+                        trades.append((day, "BTC", "SELL", price, qty, gross, fee, usdc + btc * price))
+                        last_trade = j
+            if buy > 0:
+                fee = buy * fee_pct
+                qty = (buy * (1.0 - fee_pct)) / price
+                btc += qty
+                usdc -= (buy + fee)
+                trades.append((day, "BTC", "BUY", price, qty, buy, fee, usdc + btc * price))
+                last_trade = j
+        cash_l.append(usdc)
+        btc_l.append(btc)
+
+    model_col = model.copy()
+    return Ledger(cash=cash_l, btc_qty=btc_l, trades=trades, extra={
+        "btcModel": model_col,
+        "btcUpperBand": model_col * upper_mult,
+        "btcLowerBand": model_col * lower_mult,
+    })
+
+
+STRATEGY = register(Strategy("power-btc-dca", "Power DCA", PowerParams, simulate))
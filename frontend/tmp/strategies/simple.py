@@ -0,0 +1,47 @@
+"""Simple DCA (simpleBtcDca.ts): buy a fixed USDC amount every interval while cash lasts."""
+from dataclasses import dataclass
+
+from .engine import Ledger, Strategy, register
+
+
+@dataclass
+class SimpleParams:
+    dca_interval_days: int = 7
+    dca_amount: float = 100.0
+    trading_fee: float = 0.003
+
+
+def simulate(session, window, p: SimpleParams, deposit_amount: float, deposit_interval_days: int) -> Ledger:
+    dca_amount = max(0.0, p.dca_amount)
+    interval = max(1, int(p.dca_interval_days))
+    fee_pct = p.trading_fee
+    dep_amount = max(0.0, deposit_amount)
+    dep_interval = max(0, int(deposit_interval_days))
+
+    s = window.start
+    days = window.days[s:].tolist()
+    prices = window.btc[s:].tolist()
+    usdc = dep_amount if dep_amount > 0 else 0.0
+    btc = 0.0
+    cash_l, btc_l, trades = [usdc], [btc], []
+    next_buy = days[0] + interval
+    next_dep = days[0] + dep_interval
+
+    for day, price in zip(days[1:], prices[1:]):
+        if dep_amount > 0 and dep_interval > 0 and day >= next_dep:
+            usdc += dep_amount
+            next_dep += dep_interval
+        if usdc >= dca_amount and day >= next_buy:
+            buy = min(dca_amount, usdc)
+            fee = buy * fee_pct
+            qty = (buy * (1.0 - fee_pct)) / price
+            btc += qty
+            usdc -= (buy + fee)
+            trades.append((day, "BTC", "BUY", price, qty, buy, fee, usdc + btc * price))
+            next_buy += interval
+        cash_l.append(usdc)
+        btc_l.append(btc)
+    return Ledger(cash=cash_l, btc_qty=btc_l, trades=trades)
+
+
+STRATEGY = register(Strategy("simple-btc-dca", "Simple DCA", SimpleParams, simulate))
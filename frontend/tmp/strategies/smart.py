@@ -0,0 +1,128 @@
+"""
+Smart DCA (smartBtcDca.ts): the adaptive DCA rules of adaptive_dca_btc.py
+evaluated every `eval_interval_days`, with the volatility and drawdown
+inputs measured from the start of the window.
+"""
+import collections
+import math
+from dataclasses import dataclass
+
+from dca_engine import SIDE_BUY, adaptive_trade
+
+from .engine import Ledger, Strategy, register
+
+
+@dataclass
+class SmartParams:
+    eval_interval_days: int = 7
+    base_dca_usdc: float = 100.0
+    min_trade_usd: float = 1.0
+    lookback_days: int = 30
+    k_kicker: float = 0.05
+    winsorize_abs_ret: float = 0.20
+    ewma_lambda_daily: float = 0.94
+    buffer_mult: float = 9.0
+    cmax_mult: float = 3.0
+    threshold_mode: bool = True
+    target_btc_weight: float = 0.50
+    band_delta: float = 0.30
+    rebalance_cap_frac: float = 0.20
+    trading_fee: float = 0.003
+
+
+def sigma_drawdown(session, window, lookback_days: int, lam: float, winsor: float):
+    """
+    Per-bar annualized sigma and drawdown from the start bar on, in the order
+    of the TS loop: the return buffer starts with r = 0 on the first bar after
+    the start, and the running peak at the start close.
+    """
+    def compute():
+        close = window.btc[window.start:].tolist()
+        n = len(close)
+        sigma, drawdown = [0.0] * n, [0.0] * n
+        buf = collections.deque()
+        sum_r2 = ewma = 0.0
+        warmup_len = min(10, lookback_days // 3)
+        warmup, warm_sum = 0, 0.0
+        peak = close[0]
+        prev = None
+        for j in range(1, n):
+            price = close[j]
+            peak = max(peak, price)
+            drawdown[j] = max(0.0, 1.0 - price / peak) if peak > 0 else 0.0
+            r = 0.0
+            if prev is not None and prev > 0:
+                r = math.log(price / prev)
+                r = min(winsor, max(-winsor, r))
+            prev = price
+            r2 = r * r
+            if len(buf) == lookback_days:
+                sum_r2 -= buf.popleft()
+            buf.append(r2)
+            sum_r2 += r2
+            if warmup < warmup_len:
+                warmup += 1
+                warm_sum += r2
+                if warmup == warmup_len:
+                    ewma = warm_sum / warmup
+            else:
+                ewma = lam * ewma + (1 - lam) * r2
+            rv_ann = math.sqrt(sum_r2 * (365.0 / len(buf)))
+            ewma_ann = math.sqrt(ewma * 365.0) if ewma > 0 else 0.0
+            sigma[j] = max(rv_ann, ewma_ann)
+        return sigma, drawdown
+    return session.cached(("smart_sigma_dd", window.symbols, lookback_days, lam, winsor), compute)
+
+
+def simulate(session, window, p: SmartParams, deposit_amount: float, deposit_interval_days: int) -> Ledger:
+    lookback_days = max(1, int(p.lookback_days))
+    interval = max(1, int(p.eval_interval_days))
+    sizing = dict(
+        base_dca_usdc=max(0.0, p.base_dca_usdc),
+        target_btc_weight=min(1.0, max(0.0, p.target_btc_weight)),
+        band_delta=min(1.0, max(0.0, p.band_delta)),
+        k_kicker=max(0.0, p.k_kicker),
+        cmax_mult=max(0.0, p.cmax_mult),
+        buffer_mult=max(0.0, p.buffer_mult),
+        min_trade_usd=max(0.0, p.min_trade_usd),
+        threshold_mode=bool(p.threshold_mode),
+        rebalance_cap_frac=min(1.0, max(0.0, p.rebalance_cap_frac)),
+    )
+    sigma, drawdown = sigma_drawdown(session, window, lookback_days, p.ewma_lambda_daily,
+                                     max(0.0, p.winsorize_abs_ret))
+    dep_amount = max(0.0, deposit_amount)
+    dep_interval = max(0, int(deposit_interval_days))
+
+    s = window.start
+    days = window.days[s:].tolist()
+    prices = window.btc[s:].tolist()
+    usdc = dep_amount if dep_amount > 0 else 0.0
+    btc = 0.0
+    cash_l, btc_l, trades = [usdc], [btc], []
+    next_eval = days[0] + interval
+    next_dep = days[0] + dep_interval
+
+    for j in range(1, len(days)):
+        day, price = days[j], prices[j]
+        if dep_amount > 0 and dep_interval > 0 and day >= next_dep:
+            usdc += dep_amount
+            next_dep += dep_interval
+        if day >= next_eval:
+            t = adaptive_trade(price, sigma[j], drawdown[j], usdc, btc, **sizing)
+            if t is not None:
+                side, qty, usd = t
+                if side == SIDE_BUY:
+                    btc += qty
+                    usdc -= usd
+                else:
+                    btc -= qty
+                    usdc += usd
+                trades.append((day, "BTC", "BUY" if side == SIDE_BUY else "SELL", price, qty, usd, 0.0,
+                               usdc + btc * price))
+            next_eval += interval
+        cash_l.append(usdc)
+        btc_l.append(btc)
+    return Ledger(cash=cash_l, btc_qty=btc_l, trades=trades)
+
+
+STRATEGY = register(Strategy("smart-btc-dca", "Smart DCA", SmartParams, simulate))
@@ -0,0 +1,110 @@
+"""
+Trend aware DCA (btcTrendFollowing.ts): fully in BTC while price holds above
+its 50-day SMA (with hysteresis and a slope gate), DCA into BTC below it.
+"""
+from dataclasses import dataclass
+
+from .engine import Ledger, Strategy, register
+
+SMA_LENGTH = 50
+
+
+@dataclass
+class TrendParams:
+    eval_interval_days: int = 5
+    dca_pct_when_bearish: float = 0.05
+    dca_mode: bool = True
+    hyst_bps: float = 0.015          # a fraction despite the name (0.015 = 1.5%)
+    slope_lookback_days: int = 14
+    dca_boost_multiplier: float = 2.0
+    discount_below_sma_pct: float = 0.15
+    min_cash_usd: float = 1.0
+    min_spend_usd: float = 1.0
+    fee_pct: float = 0.003
+
+
+def simulate(session, window, p: TrendParams, deposit_amount: float, deposit_interval_days: int) -> Ledger:
+    dca_pct = max(0.0, min(1.0, p.dca_pct_when_bearish))
+    interval = max(1, int(p.eval_interval_days))
+    fee_pct = p.fee_pct
+    discount_min = max(0.0, p.discount_below_sma_pct)
+    boost = max(1.0, p.dca_boost_multiplier)
+    min_cash = max(0.0, p.min_cash_usd)
+    min_spend = max(0.0, p.min_spend_usd)
+    hyst = max(0.0, p.hyst_bps)
+    slope_lb = max(1, int(p.slope_lookback_days))
+    dep_amount = max(0.0, deposit_amount)
+    dep_interval = max(0, int(deposit_interval_days))
+
+    s = window.start
+    sma_full = session.sma(window, "btc", SMA_LENGTH, ascending=True)
+    sma_l = sma_full.tolist()
+    days = window.days.tolist()
+    prices = window.btc.tolist()
+    usdc = dep_amount if dep_amount > 0 else 0.0
+    btc = 0.0
+    in_dca = bool(p.dca_mode)
+    cash_l, btc_l, trades = [usdc], [btc], []
+    next_eval = days[s] + interval
+    next_dep = days[s] + dep_interval
+
+    for i in range(s + 1, len(days)):
+        day, price, sma = days[i], prices[i], sma_l[i]
+        if dep_amount > 0 and dep_interval > 0 and day >= next_dep:
+            usdc += dep_amount
+            next_dep += dep_interval
+        if sma == sma and day >= next_eval:
+            up_thresh = sma * (1 + hyst)
+            dn_thresh = sma * (1 - hyst)
+            if i - slope_lb >= 0:
+                prev_sma = sma_l[i - slope_lb]
+                # TS compares against null (coerced to 0) before the SMA is defined
+                slope_ok = sma > (prev_sma if prev_sma == prev_sma else 0.0)
+            else:
+                slope_ok = True
+            enter_up = price > up_thresh and slope_ok
+            exit_up = price < dn_thresh or not slope_ok
+
+            if not in_dca and enter_up and usdc >= 1:
+                fee = usdc * fee_pct
+                qty = (usdc * (1.0 - fee_pct)) / price
+                btc += qty
+                usdc = 0.0
+                trades.append((day, "BTC", "BUY", price, qty, qty * price, fee, usdc + btc * price))
+            elif not in_dca and exit_up and btc > 0:
+                gross = btc * price
+                fee = gross * fee_pct
+                value = gross * (1.0 - fee_pct)
+                trades.append((day, "BTC", "SELL", price, btc, gross, fee, usdc + value))
+                usdc += value
+                btc = 0.0
+                in_dca = True
+            elif in_dca and price <= dn_thresh and usdc > min_cash:
+                spend = min(usdc, usdc * dca_pct)
+                discount = 1 - (price / sma)
+                if discount * 100 >= discount_min:
+                    spend = min(usdc, spend * boost)
+                if spend >= min_spend:
+                    fee = spend * fee_pct
+                    qty = (spend * (1.0 - fee_pct)) / price
+                    btc += qty
+                    usdc -= spend
+                    trades.append((day, "BTC", "BUY", price, qty, spend, fee, usdc + btc * price))
+            elif in_dca and enter_up and usdc >= 1:
+                spend = usdc
+                fee = spend * fee_pct
+                qty = (spend * (1.0 - fee_pct)) / price
+                btc += qty
+                usdc -= spend
+                trades.append((day, "BTC", "BUY", price, qty, spend, fee, usdc + btc * price))
+                # on-chain rule: leave DCA mode only once the stable balance is deployed
+                if usdc < min_spend:
+                    in_dca = False
+            next_eval += interval
+        cash_l.append(usdc)
+        btc_l.append(btc)
+
+    return Ledger(cash=cash_l, btc_qty=btc_l, trades=trades, extra={"btcSma50": sma_full[s:].copy()})
+
+
+STRATEGY = register(Strategy("trend-btc-dca", "Trend aware DCA", TrendParams, simulate, fee_param="fee_pct"))
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Block-bootstrap stress test of the adaptive DCA and ETH/BTC momentum strategies.
+
+Synthetic price paths are built by resampling blocks of consecutive daily log
+returns from the bundled btc_daily.json / eth_daily.json histories. BTC and
+ETH share the same block draws, so every path keeps their joint behaviour
+(and hence a realistic ETH/BTC ratio). Paths are generated chunk by chunk as
+(bars, paths) arrays inside the workers of a process pool and fed straight
+into the batched engines (dca_engine.simulate_adaptive_dca_batch and
+momentum-eth-btc.simulate_momentum_batch). Every chunk draws from its own
+seeded RNG stream, so results do not depend on the number of workers.
+
+Each path starts `warmup` bars before the measured horizon so the indicators
+(200-day SMA, RSI, volatility) are warmed up; returns, CAGR and drawdowns are
+measured over the horizon only.
+
+Example:
+  python stress_test.py --paths 10000 --years 5 --block 30 --seed 7 --initial-capital 10000 \\
+      --k 0.1 --threshold-mode --rebalance-threshold 0.2 --out stress.csv
+"""
+import argparse
+import importlib.util
+import multiprocessing as mp
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from dca_engine import simulate_adaptive_dca_batch
+from indicators import adaptive_sigma, rsi, running_drawdown, sma
+from metrics import daily_returns, drawdown_duration, sharpe_sortino
+from price_store import PriceStore
+
+
+def _load_momentum():
+    """Import momentum-eth-btc.py (its file name is not a valid module name)."""
+    name = "momentum_eth_btc"
+    if name not in sys.modules:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "momentum-eth-btc.py")
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+
+momentum = _load_momentum()
+
+STRATEGIES = ("adaptive", "momentum", "btc_hodl")
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+# ------------------------------
+# Path generation
+# ------------------------------
+
+def load_log_returns(symbols: Sequence[str] = ("BTCUSDT", "ETHUSDT"), since: Optional[str] = None,
+                     store: Optional[PriceStore] = None):
+    """
+    Daily log returns of `symbols` over their common days, as a (T, A) array,
+    plus the last close of each symbol (the default path start prices).
+    """
+    store = store or PriceStore()
+    series = [store.series(s).slice(since, None) for s in symbols]
+    days = series[0].days
+    for s in series[1:]:
+        days = np.intersect1d(days, s.days)
+    closes = np.column_stack([np.asarray(s.close)[np.searchsorted(s.days, days)] for s in series])
+    return np.diff(np.log(closes), axis=0), closes[-1].copy()
+
+
+def bootstrap_paths(log_returns: np.ndarray, n_paths: int, n_bars: int, block: int,
+                    rng: np.random.Generator, start_prices: np.ndarray) -> np.ndarray:
+    """
+    (n_bars + 1, n_paths, A) price paths from blocks of `block` consecutive
+    return rows; all assets of a path use the same rows.
+    """
+    t = len(log_returns)
+    block = max(1, min(block, t))
+    n_blocks = -(-n_bars // block)
+    starts = rng.integers(0, t - block + 1, size=(n_paths, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block)).reshape(n_paths, -1)[:, :n_bars]
+    cum = np.cumsum(log_returns[idx.T], axis=0)                # (n_bars, n_paths, A)
+    paths = np.empty((n_bars + 1, n_paths, log_returns.shape[1]))
+    paths[0] = start_prices
+    np.exp(cum, out=paths[1:])
+    paths[1:] *= start_prices
+    return paths
+
+
+def path_max_drawdown(values: np.ndarray) -> np.ndarray:
+    """Max drawdown (negative fraction) of every column of a (T, N) array."""
+    peak = np.maximum.accumulate(values, axis=0)
+    return (values / peak - 1.0).min(axis=0)
+
+
+# ------------------------------
+# Worker side
+# ------------------------------
+
+_worker: Dict[str, object] = {}
+
+
+def _init_worker(log_returns: np.ndarray, start_prices: np.ndarray, cfg: Dict[str, object]) -> None:
+    _worker.update(log_returns=log_returns, start_prices=start_prices, cfg=cfg)
+
+
+def _run_chunk(task) -> Dict[str, np.ndarray]:
+    chunk_id, first_path, n_paths = task
+    cfg = _worker["cfg"]
+    warm, horizon, initial = cfg["warmup"], cfg["horizon"], cfg["initial_capital"]
+    rng = np.random.default_rng(np.random.SeedSequence(cfg["seed"], spawn_key=(chunk_id,)))
+    paths = bootstrap_paths(_worker["log_returns"], n_paths, warm + horizon, cfg["block"], rng,
+                            _worker["start_prices"])
+    btc = paths[:, :, 0]
+    years = horizon / 365.0
+    out: Dict[str, np.ndarray] = {"path": np.arange(first_path, first_path + n_paths)}
+
+    def record(name: str, final: np.ndarray, mdd: np.ndarray, trades: Optional[np.ndarray] = None,
+               nav: Optional[np.ndarray] = None):
+        roi = final / initial - 1.0
+        out[f"{name}_ROI_%"] = roi * 100.0
+        out[f"{name}_CAGR_%"] = (np.maximum(1.0 + roi, 0.0) ** (1.0 / years) - 1.0) * 100.0
+        out[f"{name}_Max_DD_%"] = mdd * 100.0
+        if trades is not None:
+            out[f"{name}_Trades"] = trades
+        if nav is not None:
+            sharpe, sortino = sharpe_sortino(daily_returns(nav, axis=0), axis=0)
+            out[f"{name}_Sharpe"] = sharpe
+            out[f"{name}_Sortino"] = sortino
+            out[f"{name}_Max_DD_Days"] = drawdown_duration(nav, axis=0)
+
+    if "adaptive" in cfg["strategies"]:
+        a = cfg["adaptive"]
+        sigma = np.column_stack([
+            adaptive_sigma(btc[:, j], a["lookback_days"], a["ewma_lambda_daily"], a["winsorize_abs_ret"])
+            for j in range(n_paths)])
+        close = btc[warm:]
+        res = simulate_adaptive_dca_batch(close, sigma[warm:], running_drawdown(close), initial, **a["sizing"],
+                                          record_nav=True)
+        record("adaptive", res.usdc + res.btc * close[-1], res.max_drawdown, res.trades_count, res.nav)
+
+    if "momentum" in cfg["strategies"]:
+        p = type("StressParameters", (momentum.Parameters,), dict(cfg["momentum"]))
+        eth = paths[:, :, 1]
+        cols = lambda f: np.column_stack([f(j) for j in range(n_paths)])
+        res = momentum.simulate_momentum_batch(
+            btc, eth,
+            cols(lambda j: rsi(btc[:, j], p.rsi_bars)),
+            cols(lambda j: rsi(eth[:, j], p.rsi_bars)),
+            cols(lambda j: sma(btc[:, j], p.regime_filter_ma_length)),
+            cols(lambda j: rsi(eth[:, j] / btc[:, j], p.eth_btc_rsi_bars)),
+            warm, initial, p,
+        )
+        record("momentum", res.equity, res.max_drawdown, res.trades_count)
+
+    if "btc_hodl" in cfg["strategies"]:
+        hodl = initial * btc[warm:] / btc[warm]
+        record("btc_hodl", hodl[-1], path_max_drawdown(hodl), nav=hodl)
+
+    return out
+
+
+# ------------------------------
+# Driver
+# ------------------------------
+
+def run_stress(
+    n_paths: int = 10_000,
+    years: float = 5.0,
+    block: int = 30,
+    seed: int = 0,
+    initial_capital: float = 10_000.0,
+    strategies: Sequence[str] = STRATEGIES,
+    adaptive: Optional[Dict[str, object]] = None,
+    momentum_params: Optional[Dict[str, object]] = None,
+    since: Optional[str] = None,
+    warmup: Optional[int] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 250,
+    progress: bool = True,
+) -> pd.DataFrame:
+    """
+    One row per synthetic path with ROI / CAGR / max drawdown (and trades) of
+    each strategy, plus Sharpe / Sortino / drawdown duration (metrics.py) for
+    the strategies whose batch engine keeps the nav curve. `adaptive` takes run_backtest keywords, `momentum_params`
+    overrides momentum-eth-btc Parameters attributes.
+    """
+    if n_paths < 1:
+        raise ValueError(f"n_paths must be at least 1, got {n_paths}")
+    unknown = set(strategies) - set(STRATEGIES)
+    if unknown:
+        raise ValueError(f"Unknown strategies: {sorted(unknown)}")
+    adaptive = dict(adaptive or {})
+    indicator = {"lookback_days": adaptive.pop("lookback_days", 30),
+                 "ewma_lambda_daily": adaptive.pop("ewma_lambda_daily", 0.94),
+                 "winsorize_abs_ret": adaptive.pop("winsorize_abs_ret", 0.20)}
+    momentum_params = dict(momentum_params or {})
+    if warmup is None:
+        warmup = max(indicator["lookback_days"],
+                     momentum_params.get("regime_filter_ma_length", momentum.Parameters.regime_filter_ma_length))
+
+    symbols = ("BTCUSDT", "ETHUSDT") if "momentum" in strategies else ("BTCUSDT",)
+    log_returns, start_prices = load_log_returns(symbols, since)
+    cfg = {
+        "strategies": tuple(strategies), "seed": seed, "block": block, "warmup": int(warmup),
+        "horizon": int(round(years * 365)), "initial_capital": float(initial_capital),
+        "adaptive": dict(indicator, sizing=adaptive), "momentum": momentum_params,
+    }
+    tasks = [(k, first, min(chunk_size, n_paths - first))
+             for k, first in enumerate(range(0, n_paths, chunk_size))]
+
+    workers = workers or os.cpu_count() or 1
+    initargs = (log_returns, start_prices, cfg)
+    chunks: List[Dict[str, np.ndarray]] = []
+    t0 = time.perf_counter()
+    if workers == 1:
+        _init_worker(*initargs)
+        results, pool = map(_run_chunk, tasks), None
+    else:
+        pool = mp.Pool(workers, initializer=_init_worker, initargs=initargs)
+        results = pool.imap_unordered(_run_chunk, tasks)
+    try:
+        done = 0
+        for chunk in results:
+            chunks.append(chunk)
+            done += len(chunk["path"])
+            if progress:
+                print(f"{done}/{n_paths} paths ({done / (time.perf_counter() - t0):,.0f}/s)", file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    df = pd.DataFrame({k: np.concatenate([c[k] for c in chunks]) for k in chunks[0]})
+    return df.sort_values("path").reset_index(drop=True)
+
+
+def percentile_table(df: pd.DataFrame, percentiles: Sequence[int] = PERCENTILES) -> pd.DataFrame:
+    """mean and percentiles of every metric, one row per (strategy, metric)."""
+    rows = []
+    for col in df.columns:
+        if col == "path":
+            continue
+        strategy, metric = col.split("_", 1) if not col.startswith("btc_hodl") else ("btc_hodl", col[len("btc_hodl_"):])
+        values = df[col].to_numpy(dtype=float)
+        row = {"strategy": strategy, "metric": metric, "mean": float(values.mean())}
+        row.update({f"p{q}": v for q, v in zip(percentiles, np.percentile(values, percentiles))})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# ------------------------------
+# CLI
+# ------------------------------
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Block-bootstrap stress test of the DCA and momentum strategies.")
+    p.add_argument("--paths", type=int, default=10_000, help="Number of synthetic paths (default 10000)")
+    p.add_argument("--years", type=float, default=5.0, help="Measured horizon per path in years (default 5)")
+    p.add_argument("--block", type=int, default=30, help="Bootstrap block length in days (default 30)")
+    p.add_argument("--seed", type=int, default=0, help="RNG seed (default 0)")
+    p.add_argument("--since", type=str, default=None, help="Only resample returns from this date on (YYYY-MM-DD)")
+    p.add_argument("--strategies", type=str, default=",".join(STRATEGIES), help="Comma-separated subset of "
+                   + ", ".join(STRATEGIES))
+    p.add_argument("--initial-capital", type=float, default=10_000.0, help="Initial capital (default 10000)")
+    # adaptive DCA
+    p.add_argument("--base-dca", type=float, default=50.0, help="Base DCA per day in USDC (default 50)")
+    p.add_argument("--lookback", type=int, default=30, help="Lookback window (days) for rolling RV (default 30)")
+    p.add_argument("--w-target", type=float, default=0.70, help="Target BTC weight (default 0.70)")
+    p.add_argument("--band", type=float, default=0.10, help="No-trade band half-width (default 0.10)")
+    p.add_argument("--k", type=float, default=0.05, help="Volatility kicker coefficient (default 0.05)")
+    p.add_argument("--cmax", type=float, default=3.0, help="Max extra buy multiple of base DCA (default 3)")
+    p.add_argument("--threshold-mode", action="store_true", help="Enable true threshold rebalancing to band boundary.")
+    p.add_argument("--rebalance-cap", type=float, default=0.25, help="Max fraction of NAV per single rebalance trade (default 0.25)")
+    # momentum
+    p.add_argument("--rebalance-threshold", type=float, default=None, help="Momentum rebalance threshold (default 0.275)")
+    p.add_argument("--momentum-exponent", type=float, default=None, help="Momentum exponent (default 3.5)")
+    p.add_argument("--allocation", type=float, default=None, help="Momentum allocation (default 0.98)")
+
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    p.add_argument("--out", type=str, default=None, help="Optional per-path CSV")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    adaptive = dict(
+        base_dca_usdc=args.base_dca, lookback_days=args.lookback, target_btc_weight=args.w_target,
+        band_delta=args.band, k_kicker=args.k, cmax_mult=args.cmax, threshold_mode=args.threshold_mode,
+        rebalance_cap_frac=args.rebalance_cap,
+    )
+    overrides = {k: v for k, v in (("rebalance_threshold", args.rebalance_threshold),
+                                   ("momentum_exponent", args.momentum_exponent),
+                                   ("allocation", args.allocation)) if v is not None}
+    t0 = time.perf_counter()
+    df = run_stress(
+        n_paths=args.paths, years=args.years, block=args.block, seed=args.seed,
+        initial_capital=args.initial_capital,
+        strategies=[s.strip() for s in args.strategies.split(",") if s.strip()],
+        adaptive=adaptive, momentum_params=overrides, since=args.since, workers=args.workers,
+    )
+    elapsed = time.perf_counter() - t0
+    if args.out:
+        df.to_csv(args.out, index=False)
+    print(f"{len(df)} paths x {args.years:g} years in {elapsed:.1f}s" + (f" -> {args.out}" if args.out else ""))
+    print(percentile_table(df).to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Process-pool parameter sweep for the adaptive DCA strategy.
+
+Prices are loaded once and placed in shared memory; every worker attaches to
+the same buffer instead of pickling or re-downloading the series. The sigma
+series of every distinct (lookback, lambda, winsor) is computed once, up
+front, into an indicator cache directory that all workers read memory-mapped
+(indicator_cache.py). Workers then take chunks of grid points and simulate
+them together with the batched engine from dca_engine.py; result rows are
+streamed into one CSV as chunks complete.
+
+Example:
+  python sweep.py --initial-capital 10000 --start 2018-01-01 --end 2025-01-01 --offline \\
+      --k 0.02,0.05,0.1,0.2 --band 0.05,0.1,0.15 --threshold-mode 0,1 --out sweep.csv
+"""
+import argparse
+import csv
+import inspect
+import itertools
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from adaptive_dca_btc import load_prices, run_backtest
+from dca_engine import simulate_adaptive_dca_batch, summarize_batch
+from indicator_cache import IndicatorCache, data_version
+from price_store import PriceStore
+
+# CLI flag -> (run_backtest keyword, type); defaults come from run_backtest itself
+SWEEP_PARAMS = {
+    "base-dca": ("base_dca_usdc", float),
+    "lookback": ("lookback_days", int),
+    "lambda-daily": ("ewma_lambda_daily", float),
+    "w-target": ("target_btc_weight", float),
+    "band": ("band_delta", float),
+    "k": ("k_kicker", float),
+    "cmax": ("cmax_mult", float),
+    "buffer-mult": ("buffer_mult", float),
+    "min-trade": ("min_trade_usd", float),
+    "winsor": ("winsorize_abs_ret", float),
+    "threshold-mode": ("threshold_mode", lambda v: str(v).lower() in ("1", "true", "yes")),
+    "rebalance-cap": ("rebalance_cap_frac", float),
+}
+
+# keywords the indicator pass depends on; the grid is ordered so these vary slowest
+INDICATOR_KEYS = ("lookback_days", "ewma_lambda_daily", "winsorize_abs_ret")
+
+RESULT_COLUMNS = ("ROI_%", "Annualized_ROI_%", "Final_Portfolio_$", "Trades", "Max_DD_%")
+# metrics.summarize figures added with risk_metrics (each config keeps its nav curve in the batch)
+RISK_COLUMNS = ("CAGR_%", "Sharpe", "Sortino", "Calmar", "Max_DD_Days", "Time_In_Market_%")
+
+
+def default_params() -> Dict[str, object]:
+    sig = inspect.signature(run_backtest)
+    return {kw: sig.parameters[kw].default for kw, _ in SWEEP_PARAMS.values()}
+
+
+def expand_grid(grid: Dict[str, List[object]]) -> List[Dict[str, object]]:
+    """Cartesian product of the grid (run_backtest keywords -> values) over the defaults."""
+    base = default_params()
+    keys = [k for k in INDICATOR_KEYS if k in grid] + [k for k in grid if k not in INDICATOR_KEYS]
+    configs = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        cfg = dict(base)
+        cfg.update(zip(keys, values))
+        configs.append(cfg)
+    return configs
+
+
+# ------------------------------
+# Worker side
+# ------------------------------
+
+_worker: Dict[str, object] = {}
+
+
+def _init_worker(shm_name: str, n: int, initial_capital: float, days: int, cache_dir: str, version: str,
+                 risk_metrics: bool) -> None:
+    # pool workers share the parent's resource tracker; the parent unlinks the segment
+    shm = shared_memory.SharedMemory(name=shm_name)
+    close = np.ndarray((n,), dtype=np.float64, buffer=shm.buf)
+    _worker.update(shm=shm, close=close, initial_capital=initial_capital, days=days,
+                   cache=IndicatorCache(directory=cache_dir), version=version, risk_metrics=risk_metrics)
+
+
+def _indicators(key: tuple):
+    return _worker["cache"].adaptive_sigma_drawdown(_worker["close"], *key, version=_worker["version"], exact=True)
+
+
+def _warm(key: tuple) -> None:
+    """Compute the indicators of one key into the shared cache directory."""
+    _indicators(key)
+
+
+def _run_batch(cfgs: List[Dict[str, object]]) -> List[Dict[str, object]]:
+    """Simulate a chunk of configs, one vectorized batch per distinct indicator key."""
+    close = _worker["close"]
+    initial = _worker["initial_capital"]
+    columns = RESULT_COLUMNS + (RISK_COLUMNS if _worker["risk_metrics"] else ())
+    rows = []
+    groups: Dict[tuple, List[Dict[str, object]]] = {}
+    for cfg in cfgs:
+        groups.setdefault(tuple(cfg[k] for k in INDICATOR_KEYS), []).append(cfg)
+    for key, group in groups.items():
+        sigma, drawdown = _indicators(key)
+        sizing = {k: np.array([c[k] for c in group]) for k in group[0] if k not in INDICATOR_KEYS}
+        res = simulate_adaptive_dca_batch(close, sigma, drawdown, initial, **sizing,
+                                          record_nav=_worker["risk_metrics"])
+        summary = summarize_batch(close, res, initial, _worker["days"])
+        for j, cfg in enumerate(group):
+            rows.append(dict(cfg, **{name: summary[name][j].item() for name in columns}))
+    return rows
+
+
+# ------------------------------
+# Driver
+# ------------------------------
+
+def run_sweep(
+    px: pd.DataFrame,
+    grid: Dict[str, List[object]],
+    initial_capital_usdc: float,
+    workers: Optional[int] = None,
+    out_csv: Optional[str] = None,
+    batch_size: int = 512,
+    progress: bool = True,
+    indicator_cache_dir: Optional[str] = None,
+    risk_metrics: bool = False,
+) -> pd.DataFrame:
+    """
+    Evaluate every grid point over the (time, close) frame `px`; returns one
+    row per config. Indicators are cached in `indicator_cache_dir` (kept for
+    later sweeps), or in a temporary directory for this sweep only.
+    risk_metrics adds RISK_COLUMNS.
+    """
+    configs = expand_grid(grid)
+    close = np.ascontiguousarray(px["close"].to_numpy(dtype=np.float64))
+    days = max(1, (px.iloc[-1]["time"] - px.iloc[0]["time"]).days)
+    workers = workers or os.cpu_count() or 1
+    keys = list(dict.fromkeys(tuple(cfg[k] for k in INDICATOR_KEYS) for cfg in configs))
+
+    tmp_dir = tempfile.TemporaryDirectory(prefix="sweep-indicators-") if indicator_cache_dir is None else None
+    cache_dir = tmp_dir.name if tmp_dir is not None else indicator_cache_dir
+    shm = shared_memory.SharedMemory(create=True, size=max(1, close.nbytes))
+    rows: List[Dict[str, object]] = []
+    out = open(out_csv, "w", newline="") if out_csv else None
+    try:
+        np.ndarray(close.shape, dtype=np.float64, buffer=shm.buf)[:] = close
+        writer = None
+        if out is not None:
+            columns = RESULT_COLUMNS + (RISK_COLUMNS if risk_metrics else ())
+            writer = csv.DictWriter(out, fieldnames=list(configs[0].keys()) + list(columns))
+            writer.writeheader()
+        t0 = time.perf_counter()
+        with mp.Pool(workers, initializer=_init_worker,
+                     initargs=(shm.name, len(close), float(initial_capital_usdc), days, cache_dir,
+                               data_version(close), risk_metrics)) as pool:
+            for _ in pool.imap_unordered(_warm, keys):
+                pass
+            if progress:
+                print(f"{len(keys)} indicator series ready ({time.perf_counter() - t0:.2f}s)", file=sys.stderr)
+            tasks = [configs[i:i + batch_size] for i in range(0, len(configs), batch_size)]
+            for batch in pool.imap_unordered(_run_batch, tasks):
+                rows.extend(batch)
+                if writer is not None:
+                    writer.writerows(batch)
+                if progress:
+                    rate = len(rows) / (time.perf_counter() - t0)
+                    print(f"{len(rows)}/{len(configs)} configs ({rate:,.0f}/s)", file=sys.stderr)
+    finally:
+        if out is not None:
+            out.close()
+        shm.close()
+        shm.unlink()
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+    return pd.DataFrame(rows)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description="Parameter sweep for Adaptive DCA + Bands. Tunables take comma-separated value lists."
+    )
+    p.add_argument("--initial-capital", type=float, required=True, help="Initial USDC capital, e.g. 10000")
+    p.add_argument("--start", type=str, required=True, help="Start date (YYYY-MM-DD)")
+    p.add_argument("--end", type=str, required=True, help="End date (YYYY-MM-DD)")
+    for flag, (kw, _) in SWEEP_PARAMS.items():
+        p.add_argument(f"--{flag}", type=str, default=None, help=f"Values for {kw}, e.g. 0.1,0.2")
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    p.add_argument("--out", type=str, default="sweep.csv", help="Output CSV (default sweep.csv)")
+    p.add_argument("--offline", action="store_true", help="Use the bundled public/data daily closes instead of Binance.")
+    p.add_argument("--indicator-cache", type=str, default=os.environ.get("INDICATOR_CACHE_DIR"),
+                   help="Directory that keeps indicator series between sweeps (default: $INDICATOR_CACHE_DIR, "
+                        "else a temporary directory)")
+    p.add_argument("--risk-metrics", action="store_true",
+                   help="Also report CAGR, Sharpe, Sortino, Calmar, drawdown duration and time in market")
+    return p.parse_args()
+
+
+def grid_from_args(args) -> Dict[str, List[object]]:
+    grid = {}
+    for flag, (kw, conv) in SWEEP_PARAMS.items():
+        raw = getattr(args, flag.replace("-", "_"))
+        if raw is not None:
+            grid[kw] = [conv(v.strip()) for v in raw.split(",") if v.strip()]
+    return grid
+
+
+def main():
+    args = parse_args()
+    px = load_prices(args.start, args.end, store=PriceStore() if args.offline else None)
+    grid = grid_from_args(args)
+    t0 = time.perf_counter()
+    df = run_sweep(px, grid, args.initial_capital, workers=args.workers, out_csv=args.out,
+                   indicator_cache_dir=args.indicator_cache, risk_metrics=args.risk_metrics)
+    elapsed = time.perf_counter() - t0
+    print(f"{len(df)} configs in {elapsed:.1f}s -> {args.out}")
+    if len(df):
+        print(df.sort_values("Annualized_ROI_%", ascending=False).head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
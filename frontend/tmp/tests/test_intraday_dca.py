@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import adaptive_dca_btc as adca
+import kline_cache
+from bars import to_ms
+from kline_cache import INTERVAL_MS, KlineCache
+from trade_sink import QuietSink
+
+START, END = "2022-01-01", "2022-04-01"
+
+
+def synthetic_cache(root, interval: str) -> KlineCache:
+    """An offline cache holding a seeded random walk of `interval` candles over START..END."""
+    iv = INTERVAL_MS[interval]
+    open_time = np.arange(to_ms(START) - 40 * 86_400_000, to_ms(END) + 86_400_000, iv, dtype=np.int64)
+    rng = np.random.default_rng(7)
+    close = 30_000.0 * np.exp(np.cumsum(rng.normal(0.0, 0.002, len(open_time))))
+    candles = {"open_time": open_time, "close_time": open_time + iv - 1,
+               "open": close, "high": close, "low": close, "close": close, "volume": np.ones(len(close))}
+    cache = KlineCache(str(root), offline=True)
+    cache.write("BTCUSDT", interval, candles,
+                {"lo_ms": int(open_time[0]), "hi_ms": int(open_time[-1]) + iv})
+    return cache
+
+
+@pytest.mark.parametrize("interval", ["1h", "15m"])
+def test_intraday_runs_trade_once_per_day(tmp_path, monkeypatch, interval):
+    cache = synthetic_cache(tmp_path, interval)
+    monkeypatch.setattr(kline_cache, "_default_cache", cache)
+
+    _, summary, dca = adca.run_backtest(10_000.0, START, END, interval=interval, verbose=False)
+    days = 90   # UTC days closing inside the window
+    assert dca["Trades"] == days
+    assert summary["Trades"] == days   # buy-only mode buys once per day
+    assert dca["Final_USDC"] == pytest.approx(10_000.0 - 50.0 * days)
+
+    s_summary, s_dca = adca.run_backtest_stream(10_000.0, START, END, interval=interval, cache=cache,
+                                                chunk_rows=500, verbose=False)
+    assert s_summary == summary
+    assert s_dca == dca
+
+
+def test_stream_checks_the_window_before_writing(tmp_path):
+    cache = synthetic_cache(tmp_path, "1h")
+    written = []
+
+    class Recorder(QuietSink):
+        def write(self, cols):
+            written.append(cols)
+
+    with pytest.raises(RuntimeError, match="Not enough data"):
+        adca.run_backtest_stream(10_000.0, START, "2022-01-10", interval="1h", cache=cache,
+                                 chunk_rows=24, sink=Recorder(), verbose=False)
+    assert written == []
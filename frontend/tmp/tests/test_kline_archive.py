@@ -0,0 +1,134 @@
+import functools
+import http.server
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from bars import DAY_MS, to_ms
+from kline_archive import ArchiveImporter, ChecksumError, archive_file, month_bounds, write_archive
+from kline_cache import COLUMNS, INTERVAL_MS, KlineCache, concat_candles
+
+HOUR_MS = INTERVAL_MS["1h"]
+MONTHS = [np.datetime64("2024-01"), np.datetime64("2024-02"), np.datetime64("2024-03")]
+DAYS = [np.datetime64("2024-04-01") + k for k in range(10)]
+NOW_MS = to_ms("2024-04-11") + HOUR_MS   # April 1..10 are published as daily files
+
+
+def hourly(a: int, b: int):
+    open_time = np.arange(a, b, HOUR_MS, dtype=np.int64)
+    close = 40_000.0 + (open_time - to_ms("2024-01-01")) / HOUR_MS
+    return {"open_time": open_time, "close_time": open_time + HOUR_MS - 1, "open": close, "high": close + 1.0,
+            "low": close - 1.0, "close": close, "volume": np.full(len(close), 2.0)}
+
+
+def day_ms(day: np.datetime64) -> int:
+    return int(day.astype("datetime64[ms]").astype(np.int64))
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """A local archive of three monthly and ten daily 1h files; returns (root, every candle)."""
+    root = str(tmp_path / "archive")
+    parts = []
+    for m in MONTHS:
+        parts.append(hourly(*month_bounds(m)))
+        write_archive(root, "BTCUSDT", "1h", str(m), parts[-1])
+    for d in DAYS:
+        parts.append(hourly(day_ms(d), day_ms(d) + DAY_MS))
+        write_archive(root, "BTCUSDT", "1h", str(d), parts[-1])
+    return root, concat_candles(*parts)
+
+
+def import_all(cache, source, **kw):
+    importer = ArchiveImporter(cache, source, workers=2, **kw)
+    return importer.import_range("BTCUSDT", "1h", to_ms("2024-01-01"), NOW_MS, now_ms=NOW_MS)
+
+
+def assert_cached(cache, expected):
+    cached, meta = cache.read("BTCUSDT", "1h")
+    for c in COLUMNS:
+        np.testing.assert_array_equal(cached[c], expected[c])
+    assert (meta["lo_ms"], meta["hi_ms"]) == (to_ms("2024-01-01"), to_ms("2024-04-11"))
+
+
+def test_import_resumes_after_a_checksum_error(tmp_path, archive):
+    root, expected = archive
+    march = os.path.join(root, archive_file("BTCUSDT", "1h", "2024-03")) + ".CHECKSUM"
+    with open(march) as f:
+        good = f.read()
+    with open(march, "w") as f:
+        f.write("0" * 64 + "\n")
+
+    cache = KlineCache(str(tmp_path / "cache"), offline=True)
+    with pytest.raises(ChecksumError):
+        import_all(cache, root, commit_rows=24 * 28)
+    _, meta = cache.read("BTCUSDT", "1h")
+    assert meta["hi_ms"] == to_ms("2024-03-01")   # January and February were committed
+
+    with open(march, "w") as f:
+        f.write(good)
+    got = import_all(cache, root, commit_rows=24 * 28)
+    assert got["rows"] == len(expected["open_time"]) - 24 * (31 + 29)
+    assert_cached(cache, expected)
+
+
+def test_current_month_only_reads_new_days(tmp_path, archive):
+    root, expected = archive
+    cache = KlineCache(str(tmp_path / "cache"), offline=True)
+    import_all(cache, root)
+
+    extra = hourly(day_ms(DAYS[-1]) + DAY_MS, day_ms(DAYS[-1]) + 2 * DAY_MS)
+    write_archive(root, "BTCUSDT", "1h", str(DAYS[-1] + 1), extra)
+    importer = ArchiveImporter(cache, root)
+    fetched = []
+    fetch = importer.source.fetch
+    importer.source.fetch = lambda rel, verify=True: fetched.append(os.path.basename(rel)) or fetch(rel, verify)
+    got = importer.import_range("BTCUSDT", "1h", to_ms("2024-01-01"), NOW_MS + DAY_MS, now_ms=NOW_MS + DAY_MS)
+
+    assert fetched == ["BTCUSDT-1h-2024-04-11.zip"]
+    assert got["rows"] == 24 and got["hi_ms"] == to_ms("2024-04-12")
+    cached, _ = cache.read("BTCUSDT", "1h")
+    np.testing.assert_array_equal(cached["close"], concat_candles(expected, extra)["close"])
+
+
+def test_older_months_are_prepended(tmp_path, archive):
+    root, expected = archive
+    cache = KlineCache(str(tmp_path / "cache"), offline=True)
+    importer = ArchiveImporter(cache, root, commit_rows=24)
+    importer.import_range("BTCUSDT", "1h", to_ms("2024-03-01"), NOW_MS, now_ms=NOW_MS)
+    importer.import_range("BTCUSDT", "1h", to_ms("2024-01-01"), NOW_MS, now_ms=NOW_MS)
+    assert_cached(cache, expected)
+
+
+def test_microsecond_timestamps_are_normalized(tmp_path):
+    root = str(tmp_path / "archive")
+    candles = hourly(*month_bounds(np.datetime64("2025-01")))
+    write_archive(root, "BTCUSDT", "1h", "2025-01", candles, micros=True)
+    cache = KlineCache(str(tmp_path / "cache"), offline=True)
+    ArchiveImporter(cache, root).import_range("BTCUSDT", "1h", to_ms("2025-01-01"), to_ms("2025-01-31"),
+                                              now_ms=to_ms("2025-02-01"))
+    cached, _ = cache.read("BTCUSDT", "1h")
+    np.testing.assert_array_equal(cached["open_time"], candles["open_time"])
+    np.testing.assert_array_equal(cached["close_time"], candles["close_time"])
+
+
+def test_http_mirror(tmp_path, archive):
+    root, expected = archive
+    handler = functools.partial(QuietHandler, directory=root)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        cache = KlineCache(str(tmp_path / "cache"), offline=True)
+        import_all(cache, f"http://127.0.0.1:{server.server_address[1]}", commit_rows=24 * 40)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert_cached(cache, expected)
+    assert os.listdir(os.path.join(cache.root, ".archive")) == []   # downloads dropped once committed
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
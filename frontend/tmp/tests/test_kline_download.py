@@ -0,0 +1,79 @@
+import http.server
+import json
+import threading
+import urllib.parse
+from collections import Counter
+
+import numpy as np
+import pytest
+import requests
+
+from kline_cache import INTERVAL_MS
+from kline_download import PAGE_LIMIT, KlineDownloader
+
+HOUR_MS = INTERVAL_MS["1h"]
+START_MS = 1_700_000_000_000 - 1_700_000_000_000 % HOUR_MS
+
+
+class StubKlines(http.server.BaseHTTPRequestHandler):
+    """/api/v3/klines over synthetic hourly candles; the first request of each page gets `fail_with`."""
+    fail_with = 429
+    seen: Counter
+
+    def do_GET(self):
+        q = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+        a, b = int(q["startTime"]), int(q["endTime"])
+        self.seen[a] += 1
+        if self.seen[a] == 1 and self.fail_with:
+            self.send_response(self.fail_with)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        open_time = range(a + (-a) % HOUR_MS, b + 1, HOUR_MS)
+        rows = [[t, "1.0", "2.0", "0.5", str(1.0 + (t - START_MS) / HOUR_MS), "3.0", t + HOUR_MS - 1,
+                 "0", 1, "0", "0", "0"] for t in list(open_time)[:int(q["limit"])]]
+        body = json.dumps(rows).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    def start(fail_with):
+        handler = type("Handler", (StubKlines,), {"fail_with": fail_with, "seen": Counter()})
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/api/v3/klines", handler.seen
+
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retries_and_reassembles_pages(stub, status):
+    url, seen = stub(status)
+    n = 2 * PAGE_LIMIT + 500
+    with KlineDownloader(max_workers=4, base_url=url) as dl:
+        got = dl("BTCUSDT", "1h", START_MS, START_MS + (n - 1) * HOUR_MS)
+    np.testing.assert_array_equal(got["open_time"], START_MS + np.arange(n) * HOUR_MS)
+    np.testing.assert_array_equal(got["close"], 1.0 + np.arange(n))
+    assert len(seen) == 3 and set(seen.values()) == {2}   # three pages, each failed once
+
+
+def test_does_not_retry_a_ban(stub):
+    url, seen = stub(418)
+    with KlineDownloader(max_workers=1, base_url=url) as dl:
+        with pytest.raises(requests.HTTPError):
+            dl("BTCUSDT", "1h", START_MS, START_MS + 10 * HOUR_MS)
+    assert sum(seen.values()) == 1
@@ -0,0 +1,29 @@
+import json
+
+import numpy as np
+import pytest
+
+from dca_engine import adaptive_sigma_drawdown, simulate_adaptive_dca
+from indicators import PERIODS_PER_YEAR_DAILY
+from live_signal import LiveParams, LiveStrategy
+
+DAY_MS = 86_400_000
+
+
+@pytest.mark.parametrize("threshold_mode", [False, True])
+def test_checkpointed_replay_matches_the_backtest(threshold_mode):
+    rng = np.random.default_rng(3)
+    close = 20_000.0 * np.exp(np.cumsum(rng.normal(0.0, 0.04, 400)))
+    times = np.arange(1, len(close) + 1, dtype=np.int64) * DAY_MS - 1
+    sigma, dd = adaptive_sigma_drawdown(close, 30, 0.94, 0.20, PERIODS_PER_YEAR_DAILY, exact=True)
+    res = simulate_adaptive_dca(close, sigma, dd, initial_capital_usdc=10_000.0, threshold_mode=threshold_mode)
+
+    strat = LiveStrategy.new(10_000.0, LiveParams(threshold_mode=threshold_mode))
+    signals = []
+    for lo in range(0, len(close), 37):   # a checkpoint round trip between every batch
+        signals += strat.catch_up(times[:lo + 37], close[:lo + 37])
+        strat = LiveStrategy.from_dict(json.loads(json.dumps(strat.to_dict())))
+
+    assert len(signals) == len(close)
+    assert sum(1 for s in signals if s.side) == res.trades_count
+    assert (strat.state.usdc, strat.state.btc) == (res.usdc, res.btc)
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+import indicators
+from bars import DAY_MS, Bars
+from momentum_basket import basket_indicators, simulate_basket
+from panel import PricePanel
+from stress_test import momentum
+
+
+def two_asset_panel(t: int = 900) -> PricePanel:
+    rng = np.random.default_rng(11)
+    close_time = (18_000 + np.arange(t, dtype=np.int64)) * DAY_MS + DAY_MS - 1
+    bars = []
+    for symbol, start, vol in (("BTCUSDT", 20_000.0, 0.035), ("ETHUSDT", 1_500.0, 0.045)):
+        close = start * np.exp(np.cumsum(rng.normal(0.0005, vol, t)))
+        bars.append(Bars.from_closes(symbol, close_time - DAY_MS + 1, close_time, close))
+    return PricePanel.from_bars(bars)
+
+
+def test_symbol_order_reproduces_the_two_asset_script():
+    panel = two_asset_panel()
+    ind = basket_indicators(panel)
+    p = momentum.Parameters
+    btc, eth = ind["close"][:, 0], ind["close"][:, 1]
+    script = momentum.simulate_momentum(
+        btc, eth, indicators.rsi(btc, p.rsi_bars, exact=True), indicators.rsi(eth, p.rsi_bars, exact=True),
+        ind["sma"], indicators.rsi(eth / btc, p.eth_btc_rsi_bars, exact=True), 200)
+
+    res = simulate_basket(ind["close"], panel.valid, ind["rsi"], ind["score"], ind["sma"], 200, order="symbol")
+    np.testing.assert_array_equal(res.equity, script.equity)
+    np.testing.assert_array_equal(res.values[:, 0], script.btc_value)
+
+    sells_first = simulate_basket(ind["close"], panel.valid, ind["rsi"], ind["score"], ind["sma"], 200)
+    assert not np.array_equal(sells_first.equity, script.equity)
+
+
+def test_unknown_order_is_rejected():
+    panel = two_asset_panel(300)
+    ind = basket_indicators(panel)
+    with pytest.raises(ValueError, match="order"):
+        simulate_basket(ind["close"], panel.valid, ind["rsi"], ind["score"], ind["sma"], 200, order="buys_first")
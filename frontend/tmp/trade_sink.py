@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Buffered, columnar trade sinks for the backtests.
+
+Engines hand over trades as dicts of equal-length columns. Sinks buffer the
+batches and only format/write them on flush: dates stored as int64 epoch-ms
+in a "time" column are converted in one vectorized step, and rows are written
+in bulk. Available sinks:
+
+  quiet            discard trades
+  memory           keep columns in memory (.frame() -> DataFrame)
+  console          print one line per trade (optionally with a custom formatter)
+  csv:<path>       buffered CSV
+  jsonl:<path>     buffered JSON lines
+  parquet:<path>   Parquet (requires pyarrow)
+"""
+import abc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+Columns = Dict[str, np.ndarray]
+
+# strftime equivalent of pd.Timestamp.isoformat() for UTC times
+ISO_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f+00:00"
+
+
+def _concat(batches: List[Columns]) -> Columns:
+    if len(batches) == 1:
+        return batches[0]
+    return {k: np.concatenate([np.asarray(b[k]) for b in batches]) for k in batches[0]}
+
+
+class TradeSink(abc.ABC):
+    """Base sink: buffers column batches and emits them in bulk on flush(); subclasses implement _emit()."""
+
+    def __init__(self, time_format: Optional[str] = "%Y-%m-%d", buffer_rows: int = 65_536):
+        self.time_format = time_format
+        self.buffer_rows = buffer_rows
+        self._pending: List[Columns] = []
+        self._pending_rows = 0
+        self.rows_written = 0
+
+    def write(self, cols: Columns) -> None:
+        if not cols:
+            return
+        n = len(next(iter(cols.values())))
+        if n == 0:
+            return
+        self._pending.append(cols)
+        self._pending_rows += n
+        if self._pending_rows >= self.buffer_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        cols = _concat(self._pending)
+        self._pending = []
+        n, self._pending_rows = self._pending_rows, 0
+        self._emit(self._format(cols))
+        self.rows_written += n
+
+    def _format(self, cols: Columns) -> Columns:
+        """Render an int64 epoch-ms "time" column with time_format (vectorized)."""
+        t = cols.get("time")
+        if self.time_format is None or t is None or not np.issubdtype(np.asarray(t).dtype, np.integer):
+            return cols
+        out = dict(cols)
+        out["time"] = pd.to_datetime(np.asarray(t), unit="ms", utc=True).strftime(self.time_format).to_numpy()
+        return out
+
+    @abc.abstractmethod
+    def _emit(self, cols: Columns) -> None:
+        """Write one formatted batch."""
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> "TradeSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class QuietSink(TradeSink):
+    """Drops every trade without buffering."""
+
+    def write(self, cols: Columns) -> None:
+        pass
+
+    def _emit(self, cols: Columns) -> None:
+        pass
+
+
+class MemorySink(TradeSink):
+    """Keeps raw (unformatted) columns in memory."""
+
+    def __init__(self):
+        super().__init__(time_format=None)
+        self._chunks: List[Columns] = []
+
+    def _emit(self, cols: Columns) -> None:
+        self._chunks.append(cols)
+
+    @property
+    def columns(self) -> Columns:
+        self.flush()
+        if not self._chunks:
+            return {}
+        if len(self._chunks) > 1:
+            self._chunks = [_concat(self._chunks)]
+        return self._chunks[0]
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.columns)
+
+
+class ConsoleSink(TradeSink):
+    """Prints a header and one line per trade; `formatter` renders a batch into lines."""
+
+    def __init__(self, header: Optional[str] = None,
+                 formatter: Optional[Callable[[Columns], List[str]]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.header = header
+        self.formatter = formatter
+        self._printed_header = False
+
+    def _emit(self, cols: Columns) -> None:
+        if not self._printed_header:
+            print(self.header if self.header is not None else ", ".join(cols))
+            self._printed_header = True
+        if self.formatter is not None:
+            lines = self.formatter(cols)
+        else:
+            values = [np.asarray(v).tolist() for v in cols.values()]
+            lines = [", ".join(str(x) for x in row) for row in zip(*values)]
+        print("\n".join(lines))
+
+
+class CsvSink(TradeSink):
+    """Appends buffered batches to a CSV file (header written once)."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._started = False
+
+    def _emit(self, cols: Columns) -> None:
+        pd.DataFrame(cols).to_csv(self.path, mode="a" if self._started else "w",
+                                  header=not self._started, index=False)
+        self._started = True
+
+    def close(self) -> None:
+        super().close()
+        if not self._started:
+            # no trades: still leave an (empty) file behind, like DataFrame([]).to_csv
+            pd.DataFrame().to_csv(self.path, index=False)
+            self._started = True
+
+
+class JsonlSink(TradeSink):
+    """Appends buffered batches as JSON lines."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        open(path, "w").close()
+
+    def _emit(self, cols: Columns) -> None:
+        text = pd.DataFrame(cols).to_json(orient="records", lines=True, double_precision=15)
+        with open(self.path, "a") as f:
+            f.write(text if text.endswith("\n") else text + "\n")
+
+
+class ParquetSink(TradeSink):
+    """Writes each flushed batch as a Parquet row group (requires pyarrow)."""
+
+    def __init__(self, path: str, **kwargs):
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as exc:
+            raise ImportError("ParquetSink requires pyarrow (pip install pyarrow)") from exc
+        super().__init__(**kwargs)
+        self.path = path
+        self._writer = None
+
+    def _emit(self, cols: Columns) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pydict({k: np.asarray(v) for k, v in cols.items()})
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        super().close()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def open_sink(spec: str, **kwargs) -> TradeSink:
+    """Build a sink from a spec such as "quiet", "console", "csv:trades.csv" or "parquet:t.parquet"."""
+    kind, _, path = spec.partition(":")
+    kind = kind.lower()
+    if kind == "quiet":
+        return QuietSink()
+    if kind == "memory":
+        return MemorySink()
+    if kind == "console":
+        return ConsoleSink(**kwargs)
+    if not path:
+        raise ValueError(f"Sink {kind!r} needs a path, e.g. {kind}:trades.{kind}")
+    if kind == "csv":
+        return CsvSink(path, **kwargs)
+    if kind == "jsonl":
+        return JsonlSink(path, **kwargs)
+    if kind == "parquet":
+        return ParquetSink(path, **kwargs)
+    raise ValueError(f"Unknown trade sink {spec!r}")
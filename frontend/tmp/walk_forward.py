@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Rolling-start (walk-forward) backtests of the adaptive DCA strategy.
+
+Answers "how would the strategy have done starting on each day?" without N
+full reruns: prices are loaded once and the volatility indicator is computed
+once over the full history and shared by every window. Each start date is then
+simulated once up to its longest horizon; shorter horizons are read off the
+same NAV path. Start dates are spread over a process pool and every
+(start, horizon) cell is compared with the simple DCA benchmark over the same
+window.
+
+Unlike a standalone run_backtest(start, end), sigma is already warmed up at
+each start (it is computed over the preceding history). The drawdown input
+restarts from each window's own running peak, as it does in run_backtest.
+
+Example:
+  python walk_forward.py --initial-capital 10000 --start 2017-01-01 --end 2025-09-01 --offline \\
+      --horizons 365,730,1460 --step 7 --metric ROI_vs_DCA_% --out walk_forward.csv
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from adaptive_dca_btc import load_prices
+from dca_engine import adaptive_sigma_drawdown, nav_series, simple_dca_holdings, simulate_adaptive_dca
+from indicators import running_drawdown
+from price_store import DAY_MS, PriceStore
+
+# sizing keywords of run_backtest that a walk-forward run accepts
+SIZING_PARAMS = ("base_dca_usdc", "target_btc_weight", "band_delta", "k_kicker", "cmax_mult",
+                 "buffer_mult", "min_trade_usd", "threshold_mode", "rebalance_cap_frac")
+
+METRICS = ("ROI_%", "CAGR_%", "Max_DD_%", "DCA_ROI_%", "DCA_CAGR_%", "DCA_Max_DD_%",
+           "ROI_vs_DCA_%", "CAGR_vs_DCA_%")
+
+
+def running_max_drawdown(nav: np.ndarray) -> np.ndarray:
+    """Max drawdown (negative fraction) of nav[:k+1] for every k."""
+    peak = np.maximum.accumulate(nav)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd = np.where(peak > 0, nav / peak - 1.0, 0.0)
+    return np.minimum.accumulate(dd)
+
+
+def _cagr(roi: float, days: int) -> float:
+    years = days / 365.0
+    return (1.0 + roi) ** (1.0 / years) - 1.0 if years > 0 else roi
+
+
+# ------------------------------
+# Worker side
+# ------------------------------
+
+_worker: Dict[str, object] = {}
+
+
+def _init_worker(close: np.ndarray, sigma: np.ndarray, times_ms: np.ndarray,
+                 horizons: Sequence[int], initial_capital: float, sizing: Dict[str, object]) -> None:
+    _worker.update(close=close, sigma=sigma, times_ms=times_ms, horizons=list(horizons),
+                   initial_capital=initial_capital, sizing=sizing)
+
+
+def _run_starts(starts: List[int]) -> List[Dict[str, object]]:
+    """All (start, horizon) cells for a chunk of start indices."""
+    close, sigma, times_ms = _worker["close"], _worker["sigma"], _worker["times_ms"]
+    initial, sizing = _worker["initial_capital"], _worker["sizing"]
+    rows = []
+    for s in starts:
+        horizons = [h for h in _worker["horizons"] if s + h < len(close)]
+        if not horizons:
+            continue
+        e = s + max(horizons) + 1
+        c = close[s:e]
+        res = simulate_adaptive_dca(c, sigma[s:e], running_drawdown(c), initial, **sizing)
+        nav = nav_series(c, res, initial)
+        mdd = running_max_drawdown(nav)
+        usdc, btc, _ = simple_dca_holdings(c, initial, sizing["base_dca_usdc"], sizing["min_trade_usd"])
+        dca_nav = usdc + btc * c
+        dca_mdd = running_max_drawdown(dca_nav)
+        for h in horizons:
+            days = max(1, int((times_ms[s + h] - times_ms[s]) // DAY_MS))
+            roi = (nav[h] - initial) / initial if initial > 0 else 0.0
+            dca_roi = (dca_nav[h] - initial) / initial if initial > 0 else 0.0
+            cagr, dca_cagr = _cagr(roi, days), _cagr(dca_roi, days)
+            rows.append({
+                "start": int(times_ms[s]),
+                "horizon_days": h,
+                "ROI_%": roi * 100.0,
+                "CAGR_%": cagr * 100.0,
+                "Max_DD_%": mdd[h] * 100.0,
+                "DCA_ROI_%": dca_roi * 100.0,
+                "DCA_CAGR_%": dca_cagr * 100.0,
+                "DCA_Max_DD_%": dca_mdd[h] * 100.0,
+                "ROI_vs_DCA_%": (roi - dca_roi) * 100.0,
+                "CAGR_vs_DCA_%": (cagr - dca_cagr) * 100.0,
+            })
+    return rows
+
+
+# ------------------------------
+# Driver
+# ------------------------------
+
+def walk_forward(
+    px: pd.DataFrame,
+    initial_capital_usdc: float,
+    horizons: Sequence[int] = (365, 730, 1460),
+    step: int = 1,
+    first_start: Optional[str] = None,
+    lookback_days: int = 30,
+    ewma_lambda_daily: float = 0.94,
+    winsorize_abs_ret: float = 0.20,
+    workers: Optional[int] = None,
+    chunk_size: int = 32,
+    progress: bool = True,
+    **sizing,
+) -> pd.DataFrame:
+    """
+    One row per (start, horizon_days) over the (time, close) frame `px`.
+    Starts are every `step` bars from `first_start` (default: once the
+    lookback window is filled); horizons are in bars (days for 1d candles).
+    `sizing` takes the run_backtest sizing keywords.
+    """
+    unknown = set(sizing) - set(SIZING_PARAMS)
+    if unknown:
+        raise TypeError(f"Unknown sizing parameters: {sorted(unknown)}")
+    defaults = dict(base_dca_usdc=50.0, target_btc_weight=0.70, band_delta=0.10, k_kicker=0.05,
+                    cmax_mult=3.0, buffer_mult=9.0, min_trade_usd=5.0, threshold_mode=False,
+                    rebalance_cap_frac=0.25)
+    sizing = dict(defaults, **sizing)
+
+    close = np.ascontiguousarray(px["close"].to_numpy(dtype=np.float64))
+    times_ms = pd.DatetimeIndex(px["time"]).as_unit("ms").asi8
+    # one indicator pass over the full history, shared by all windows
+    sigma, _ = adaptive_sigma_drawdown(close, lookback_days, ewma_lambda_daily, winsorize_abs_ret)
+
+    lo = lookback_days
+    if first_start is not None:
+        lo = max(lo, int(np.searchsorted(times_ms, pd.Timestamp(first_start, tz="UTC").value // 1_000_000)))
+    horizons = sorted(int(h) for h in horizons)
+    if not horizons or horizons[0] < 1:
+        raise ValueError(f"horizons must be one or more positive bar counts, got {horizons}")
+    starts = list(range(lo, len(close) - horizons[0], max(1, step)))
+    if not starts:
+        raise RuntimeError("Not enough data for the requested start range and horizons.")
+
+    workers = workers or os.cpu_count() or 1
+    tasks = [starts[i:i + chunk_size] for i in range(0, len(starts), chunk_size)]
+    initargs = (close, sigma, times_ms, horizons, float(initial_capital_usdc), sizing)
+    rows: List[Dict[str, object]] = []
+    t0 = time.perf_counter()
+    if workers == 1:
+        _init_worker(*initargs)
+        results = map(_run_starts, tasks)
+        pool = None
+    else:
+        pool = mp.Pool(workers, initializer=_init_worker, initargs=initargs)
+        results = pool.imap(_run_starts, tasks)
+    try:
+        for k, batch in enumerate(results, 1):
+            rows.extend(batch)
+            if progress and (k % 20 == 0 or k == len(tasks)):
+                rate = min(k * chunk_size, len(starts)) / (time.perf_counter() - t0)
+                print(f"{min(k * chunk_size, len(starts))}/{len(starts)} starts ({rate:,.0f}/s)", file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    df = pd.DataFrame(rows, columns=["start", "horizon_days", *METRICS])
+    df["start"] = pd.to_datetime(df["start"], unit="ms", utc=True).dt.strftime("%Y-%m-%d")
+    return df
+
+
+def to_matrix(df: pd.DataFrame, metric: str = "ROI_vs_DCA_%") -> pd.DataFrame:
+    """start-date x horizon matrix of one metric (for heatmaps)."""
+    return df.pivot(index="start", columns="horizon_days", values=metric)
+
+
+# ------------------------------
+# CLI
+# ------------------------------
+
+def _horizons(text: str) -> List[int]:
+    try:
+        horizons = [int(h) for h in text.split(",") if h.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a comma-separated list of days: {text!r}") from None
+    if not horizons or min(horizons) < 1:
+        raise argparse.ArgumentTypeError(f"needs one or more positive day counts, got {text!r}")
+    return horizons
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Rolling-start backtests of Adaptive DCA + Bands vs simple DCA.")
+    p.add_argument("--initial-capital", type=float, required=True, help="Initial USDC capital, e.g. 10000")
+    p.add_argument("--start", type=str, required=True, help="History start date (YYYY-MM-DD)")
+    p.add_argument("--end", type=str, required=True, help="History end date (YYYY-MM-DD)")
+    p.add_argument("--first-start", type=str, default=None, help="Earliest window start (default: after the lookback)")
+    p.add_argument("--horizons", type=_horizons, default="365,730,1460", help="Window lengths in days (default 365,730,1460)")
+    p.add_argument("--step", type=int, default=1, help="Days between window starts (default 1)")
+    p.add_argument("--base-dca", type=float, default=50.0, help="Base DCA per day in USDC (default 50)")
+    p.add_argument("--lookback", type=int, default=30, help="Lookback window (days) for rolling RV (default 30)")
+    p.add_argument("--lambda-daily", type=float, default=0.94, help="EWMA daily lambda (default 0.94)")
+    p.add_argument("--w-target", type=float, default=0.70, help="Target BTC weight (default 0.70)")
+    p.add_argument("--band", type=float, default=0.10, help="No-trade band half-width (default 0.10)")
+    p.add_argument("--k", type=float, default=0.05, help="Volatility kicker coefficient (default 0.05)")
+    p.add_argument("--cmax", type=float, default=3.0, help="Max extra buy multiple of base DCA (default 3)")
+    p.add_argument("--buffer-mult", type=float, default=9.0, help="Days of base DCA to keep as USDC buffer (default 9)")
+    p.add_argument("--min-trade", type=float, default=5.0, help="Minimum trade USD (default 5)")
+    p.add_argument("--winsor", type=float, default=0.20, help="Winsorize absolute daily log-return (default 0.20)")
+    p.add_argument("--threshold-mode", action="store_true", help="Enable true threshold rebalancing to band boundary.")
+    p.add_argument("--rebalance-cap", type=float, default=0.25, help="Max fraction of NAV per single rebalance trade (default 0.25)")
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    p.add_argument("--metric", type=str, default="ROI_vs_DCA_%", choices=METRICS, help="Metric for the printed matrix")
+    p.add_argument("--out", type=str, default="walk_forward.csv", help="Output CSV, one row per cell (default walk_forward.csv)")
+    p.add_argument("--offline", action="store_true", help="Use the bundled public/data daily closes instead of Binance.")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    px = load_prices(args.start, args.end, store=PriceStore() if args.offline else None)
+    t0 = time.perf_counter()
+    df = walk_forward(
+        px, args.initial_capital,
+        horizons=args.horizons,
+        step=args.step,
+        first_start=args.first_start,
+        lookback_days=args.lookback,
+        ewma_lambda_daily=args.lambda_daily,
+        winsorize_abs_ret=args.winsor,
+        workers=args.workers,
+        base_dca_usdc=args.base_dca,
+        target_btc_weight=args.w_target,
+        band_delta=args.band,
+        k_kicker=args.k,
+        cmax_mult=args.cmax,
+        buffer_mult=args.buffer_mult,
+        min_trade_usd=args.min_trade,
+        threshold_mode=args.threshold_mode,
+        rebalance_cap_frac=args.rebalance_cap,
+    )
+    elapsed = time.perf_counter() - t0
+    df.to_csv(args.out, index=False)
+    print(f"{len(df)} cells ({df['start'].nunique()} starts) in {elapsed:.1f}s -> {args.out}")
+    if len(df):
+        m = to_matrix(df, args.metric)
+        print(f"\n{args.metric} by start date x horizon (days):")
+        print(m.describe().loc[["mean", "min", "50%", "max"]].to_string(float_format=lambda v: f"{v:.2f}"))
+
+
+if __name__ == "__main__":
+    main()